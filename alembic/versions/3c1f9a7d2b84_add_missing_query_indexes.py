@@ -0,0 +1,32 @@
+"""add missing query indexes
+
+Revision ID: 3c1f9a7d2b84
+Revises: 666afc736a6b
+Create Date: 2026-10-19 15:21:40.551023
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c1f9a7d2b84'
+down_revision: Union[str, Sequence[str], None] = '666afc736a6b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Found by tests/query_plan_test.py:
+    # wake_up_convenor looks up users by role
+    op.create_index(op.f('ix_users_role'), 'users', ['role'], unique=False)
+    # get_all_notice reads the latest notices (ORDER BY created_at DESC LIMIT 10)
+    op.create_index(op.f('ix_notices_created_at'), 'notices', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_notices_created_at'), table_name='notices')
+    op.drop_index(op.f('ix_users_role'), table_name='users')
@@ -0,0 +1,46 @@
+"""add meal billing rollups
+
+Revision ID: 5d0c8e7f3a21
+Revises: b7e2d41c9a53
+Create Date: 2026-10-19 17:10:04.312678
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d0c8e7f3a21'
+down_revision: Union[str, Sequence[str], None] = 'b7e2d41c9a53'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('meal_billing_rollups',
+    sa.Column('billing_month', sa.Date(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('lunch_count', sa.Integer(), server_default=sa.text('0'), nullable=False),
+    sa.Column('dinner_count', sa.Integer(), server_default=sa.text('0'), nullable=False),
+    sa.Column('lunch_item_counts', postgresql.JSONB(astext_type=sa.Text()), server_default=sa.text("'{}'::jsonb"), nullable=False),
+    sa.Column('dinner_item_counts', postgresql.JSONB(astext_type=sa.Text()), server_default=sa.text("'{}'::jsonb"), nullable=False),
+    sa.Column('updated_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('billing_month', 'user_id')
+    )
+    op.create_table('rollup_watermarks',
+    sa.Column('rollup_name', sa.Text(), nullable=False),
+    sa.Column('rolled_up_through', sa.Date(), nullable=True),
+    sa.Column('updated_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('rollup_name')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('rollup_watermarks')
+    op.drop_table('meal_billing_rollups')
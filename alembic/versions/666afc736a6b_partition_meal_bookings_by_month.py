@@ -0,0 +1,108 @@
+"""partition meal_bookings by month
+
+Revision ID: 666afc736a6b
+Revises: e59f9ff8fdc6
+Create Date: 2026-10-19 14:05:12.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '666afc736a6b'
+down_revision: Union[str, Sequence[str], None] = 'e59f9ff8fdc6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Months to create ahead of the current one. `python -m app.partitions ensure`
+# keeps this window rolling forward afterwards.
+MONTHS_AHEAD = 3
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Move the old table out of the way, keeping its id sequence
+    op.execute("ALTER TABLE meal_bookings RENAME TO meal_bookings_unpartitioned")
+    op.execute("ALTER TABLE meal_bookings_unpartitioned RENAME CONSTRAINT meal_bookings_pkey TO meal_bookings_unpartitioned_pkey")
+    op.execute("ALTER TABLE meal_bookings_unpartitioned RENAME CONSTRAINT meal_bookings_user_id_booking_date_key TO meal_bookings_unpartitioned_user_id_booking_date_key")
+    op.execute("ALTER TABLE meal_bookings_unpartitioned RENAME CONSTRAINT meal_bookings_user_id_fkey TO meal_bookings_unpartitioned_user_id_fkey")
+
+    # Every unique key on a partitioned table must include the partition key,
+    # so the primary key becomes (id, booking_date).
+    op.execute("""
+        CREATE TABLE meal_bookings (
+            id INTEGER NOT NULL DEFAULT nextval('meal_bookings_id_seq'),
+            user_id INTEGER NOT NULL,
+            booking_date DATE NOT NULL,
+            lunch_pick TEXT[],
+            dinner_pick TEXT[],
+            created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+            CONSTRAINT meal_bookings_pkey PRIMARY KEY (id, booking_date),
+            CONSTRAINT meal_bookings_user_id_booking_date_key UNIQUE (user_id, booking_date),
+            CONSTRAINT meal_bookings_user_id_fkey FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+        ) PARTITION BY RANGE (booking_date)
+    """)
+    # Partitioned index: Postgres creates a matching date-leading index on every partition
+    op.create_index('ix_meal_bookings_booking_date', 'meal_bookings', ['booking_date'])
+
+    # One partition per month, from the oldest booking up to MONTHS_AHEAD months from now
+    op.execute(f"""
+        DO $$
+        DECLARE
+            month_start DATE := date_trunc('month', LEAST(
+                COALESCE((SELECT min(booking_date) FROM meal_bookings_unpartitioned), current_date),
+                current_date
+            ))::date;
+            last_month DATE := (date_trunc('month', current_date) + interval '{MONTHS_AHEAD} months')::date;
+        BEGIN
+            WHILE month_start <= last_month LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF meal_bookings FOR VALUES FROM (%L) TO (%L)',
+                    'meal_bookings_' || to_char(month_start, 'YYYY_MM'),
+                    month_start,
+                    (month_start + interval '1 month')::date
+                );
+                month_start := (month_start + interval '1 month')::date;
+            END LOOP;
+        END $$;
+    """)
+    # Safety net for dates beyond the window; `app.partitions ensure` moves rows out of it
+    op.execute("CREATE TABLE meal_bookings_default PARTITION OF meal_bookings DEFAULT")
+
+    op.execute("""
+        INSERT INTO meal_bookings (id, user_id, booking_date, lunch_pick, dinner_pick, created_at)
+        SELECT id, user_id, booking_date, lunch_pick, dinner_pick, created_at FROM meal_bookings_unpartitioned
+    """)
+    op.execute("ALTER SEQUENCE meal_bookings_id_seq OWNED BY meal_bookings.id")
+    op.drop_table('meal_bookings_unpartitioned')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("ALTER TABLE meal_bookings RENAME TO meal_bookings_partitioned")
+    op.execute("ALTER TABLE meal_bookings_partitioned RENAME CONSTRAINT meal_bookings_pkey TO meal_bookings_partitioned_pkey")
+    op.execute("ALTER TABLE meal_bookings_partitioned RENAME CONSTRAINT meal_bookings_user_id_booking_date_key TO meal_bookings_partitioned_user_id_booking_date_key")
+    op.execute("ALTER TABLE meal_bookings_partitioned RENAME CONSTRAINT meal_bookings_user_id_fkey TO meal_bookings_partitioned_user_id_fkey")
+    op.execute("ALTER INDEX ix_meal_bookings_booking_date RENAME TO ix_meal_bookings_partitioned_booking_date")
+
+    op.create_table('meal_bookings',
+    sa.Column('id', sa.Integer(), server_default=sa.text("nextval('meal_bookings_id_seq')"), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('booking_date', sa.Date(), nullable=False),
+    sa.Column('lunch_pick', sa.ARRAY(sa.Text()), nullable=True),
+    sa.Column('dinner_pick', sa.ARRAY(sa.Text()), nullable=True),
+    sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], name='meal_bookings_user_id_fkey', ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id', name='meal_bookings_pkey'),
+    sa.UniqueConstraint('user_id', 'booking_date', name='meal_bookings_user_id_booking_date_key')
+    )
+    op.execute("""
+        INSERT INTO meal_bookings (id, user_id, booking_date, lunch_pick, dinner_pick, created_at)
+        SELECT id, user_id, booking_date, lunch_pick, dinner_pick, created_at FROM meal_bookings_partitioned
+    """)
+    op.execute("ALTER SEQUENCE meal_bookings_id_seq OWNED BY meal_bookings.id")
+    # Dropping the parent drops every partition with it
+    op.drop_table('meal_bookings_partitioned')
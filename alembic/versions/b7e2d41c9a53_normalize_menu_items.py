@@ -0,0 +1,82 @@
+"""normalize menu items
+
+Revision ID: b7e2d41c9a53
+Revises: 3c1f9a7d2b84
+Create Date: 2026-10-19 16:02:37.904117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e2d41c9a53'
+down_revision: Union[str, Sequence[str], None] = '3c1f9a7d2b84'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (table, old text[] column, new integer[] column)
+COLUMNS = [
+    ('daily_menus', 'lunch_options', 'lunch_item_ids'),
+    ('daily_menus', 'dinner_options', 'dinner_item_ids'),
+    ('meal_bookings', 'lunch_pick', 'lunch_item_ids'),
+    ('meal_bookings', 'dinner_pick', 'dinner_item_ids'),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('menu_items',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    # Every dish name ever used, menus first so ids follow the order dishes appeared
+    op.execute("""
+        INSERT INTO menu_items (name)
+        SELECT name FROM (
+            SELECT unnest(lunch_options || dinner_options) AS name, menu_date FROM daily_menus
+            UNION ALL
+            SELECT unnest(coalesce(lunch_pick, '{}') || coalesce(dinner_pick, '{}')), booking_date FROM meal_bookings
+        ) AS used
+        GROUP BY name
+        ORDER BY min(menu_date), name
+    """)
+
+    # ALTER ... TYPE does not allow subqueries in USING, but it does allow a
+    # function call, and it rewrites the table so the old text is not left behind.
+    op.execute("""
+        CREATE FUNCTION pg_temp.menu_item_ids(names text[]) RETURNS integer[] LANGUAGE sql STABLE AS $$
+            SELECT CASE WHEN names IS NULL THEN NULL ELSE ARRAY(
+                SELECT mi.id FROM unnest(names) WITH ORDINALITY AS picked(name, ord)
+                JOIN menu_items mi ON mi.name = picked.name
+                ORDER BY picked.ord
+            ) END
+        $$
+    """)
+    for table, old, new in COLUMNS:
+        op.execute(f"ALTER TABLE {table} ALTER COLUMN {old} TYPE integer[] USING pg_temp.menu_item_ids({old})")
+        op.alter_column(table, old, new_column_name=new)
+    op.execute("DROP FUNCTION pg_temp.menu_item_ids(text[])")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("""
+        CREATE FUNCTION pg_temp.menu_item_names(ids integer[]) RETURNS text[] LANGUAGE sql STABLE AS $$
+            SELECT CASE WHEN ids IS NULL THEN NULL ELSE ARRAY(
+                SELECT mi.name FROM unnest(ids) WITH ORDINALITY AS picked(id, ord)
+                JOIN menu_items mi ON mi.id = picked.id
+                ORDER BY picked.ord
+            ) END
+        $$
+    """)
+    for table, old, new in COLUMNS:
+        op.execute(f"ALTER TABLE {table} ALTER COLUMN {new} TYPE text[] USING pg_temp.menu_item_names({new})")
+        op.alter_column(table, new, new_column_name=old)
+    op.execute("DROP FUNCTION pg_temp.menu_item_names(integer[])")
+    op.drop_table('menu_items')
@@ -0,0 +1,30 @@
+"""add issue thumbnails and open issues index
+
+Revision ID: c4d8e2a6f190
+Revises: 9a4b6c2e1f07
+Create Date: 2026-10-19 21:35:02.117390
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4d8e2a6f190'
+down_revision: Union[str, Sequence[str], None] = '9a4b6c2e1f07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('issue_tickets', sa.Column('thumbnail_url', sa.Text(), nullable=True))
+    op.create_index('ix_issue_tickets_unresolved_id', 'issue_tickets', ['id'], unique=False, postgresql_where=sa.text('is_resolved = false'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_issue_tickets_unresolved_id', table_name='issue_tickets', postgresql_where=sa.text('is_resolved = false'))
+    op.drop_column('issue_tickets', 'thumbnail_url')
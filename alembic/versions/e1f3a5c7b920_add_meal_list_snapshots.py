@@ -0,0 +1,36 @@
+"""add meal list snapshots
+
+Revision ID: e1f3a5c7b920
+Revises: c4d8e2a6f190
+Create Date: 2026-10-20 10:12:44.508213
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e1f3a5c7b920'
+down_revision: Union[str, Sequence[str], None] = 'c4d8e2a6f190'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('meal_list_snapshots',
+    sa.Column('booking_date', sa.Date(), nullable=False),
+    sa.Column('json_body', sa.LargeBinary(), nullable=False),
+    sa.Column('csv_body', sa.LargeBinary(), nullable=False),
+    sa.Column('json_etag', sa.Text(), nullable=False),
+    sa.Column('csv_etag', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('booking_date')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('meal_list_snapshots')
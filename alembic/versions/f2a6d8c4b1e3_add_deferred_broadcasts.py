@@ -0,0 +1,34 @@
+"""add deferred broadcasts
+
+Revision ID: f2a6d8c4b1e3
+Revises: e1f3a5c7b920
+Create Date: 2026-10-19 17:04:12.318540
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2a6d8c4b1e3'
+down_revision: Union[str, Sequence[str], None] = 'e1f3a5c7b920'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('deferred_broadcasts',
+    sa.Column('kind', sa.Text(), nullable=False),
+    sa.Column('title', sa.Text(), nullable=False),
+    sa.Column('body', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('kind')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('deferred_broadcasts')
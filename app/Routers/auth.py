@@ -5,7 +5,7 @@ from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 from datetime import timedelta
 
-from .. import models, schemas, utils, oauth2, database
+from .. import models, schemas, utils, oauth2, database, invalidation
 from ..send_email import send_verification_email, send_password_reset_email
 
 router = APIRouter(
@@ -63,6 +63,7 @@ def verify_email(token: str, db: Session = Depends(database.get_db)):
 
     try:
         user.is_active = True # type: ignore
+        invalidation.publish(db, "users", user.id)
         db.commit()
     except Exception:
         db.rollback()
@@ -141,6 +142,7 @@ def reset_password(request: schemas.PasswordReset, db: Session = Depends(databas
 
     try:
         user.hashed_password = utils.hash_password(request.new_password)
+        invalidation.publish(db, "users", user.id)
         db.commit()
     except Exception:
         db.rollback()
@@ -159,6 +161,7 @@ def update_user(updated_user: schemas.UpdatedUserIn, db: Session = Depends(datab
     try:
         user.name = updated_user.name # type: ignore
         user.room_number = updated_user.room_number # type: ignore
+        invalidation.publish(db, "users", user.id)
         db.commit()
         db.refresh(user)
     except Exception as e:
@@ -0,0 +1,128 @@
+from fastapi import APIRouter, status, HTTPException, Depends
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from datetime import date, timedelta
+import io
+import csv
+
+from .. import schemas, oauth2, models, menu_items, billing
+from ..database import get_db
+from ..responses import fast_json
+from ..partitions import add_months
+
+router = APIRouter(
+    prefix="/billing",
+    tags=['Billing']
+)
+
+
+# HELPER FUNCTION shared by the JSON and CSV endpoints
+def load_monthly_bill(db: Session, year: int, month: int) -> dict:
+    """Brings the rollup up to date and returns the month's bill, item counts keyed by name."""
+    try:
+        billing_month = date(year, month, 1)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"{year}-{month} is not a valid month.")
+
+    try:
+        rolled_up_through = billing.refresh_rollups(db)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}")
+
+    # Plain columns rather than ORM objects: a month has a row per student
+    rollup = models.MealBillingRollup
+    results = db.query(
+        rollup.user_id,
+        models.User.name.label("user_name"),
+        models.User.room_number,
+        rollup.lunch_count,
+        rollup.dinner_count,
+        rollup.lunch_item_counts,
+        rollup.dinner_item_counts
+    ).join(
+        models.User, rollup.user_id == models.User.id
+    ).filter(
+        rollup.billing_month == billing_month
+    ).order_by(
+        models.User.room_number, models.User.name
+    ).all()
+
+    if not results:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail=f"No bookings found for {billing_month:%Y-%m}.")
+
+    item_keys = set().union(*(row.lunch_item_counts for row in results), *(row.dinner_item_counts for row in results))
+    names_by_id = menu_items.names_for_ids(db, map(int, item_keys))
+    names = {key: names_by_id[int(key)] for key in item_keys}
+
+    users = [
+        {
+            "user_id": row.user_id,
+            "user_name": row.user_name,
+            "room_number": row.room_number,
+            "lunch_count": row.lunch_count,
+            "dinner_count": row.dinner_count,
+            "lunch_item_counts": {names[k]: v for k, v in row.lunch_item_counts.items()},
+            "dinner_item_counts": {names[k]: v for k, v in row.dinner_item_counts.items()},
+        }
+        for row in results
+    ]
+
+    last_day = add_months(billing_month, 1) - timedelta(days=1)
+    return {
+        "billing_month": billing_month,
+        "rolled_up_through": min(rolled_up_through, last_day) if rolled_up_through else None,
+        "total_lunch": sum(user["lunch_count"] for user in users),
+        "total_dinner": sum(user["dinner_count"] for user in users),
+        "users": users
+    }
+
+
+# ENDPOINT 1: Per-student meal counts for a month
+@router.get("/{year}/{month}", response_model=schemas.MonthlyBillOut)
+def get_monthly_bill(year: int, month: int, db: Session = Depends(get_db), current_user: models.User = Depends(oauth2.require_admin_role)):
+    """
+    Returns how many lunches and dinners every student had in the month,
+    with per-item counts. Served from meal_billing_rollups.
+    """
+    return fast_json(load_monthly_bill(db, year, month))
+
+
+#----------------------------------------------------------DOWNLOAD MONTHLY BILL--------------------------------------------------------#
+@router.get("/{year}/{month}/download")
+def download_monthly_bill(year: int, month: int, db: Session = Depends(get_db), current_user: models.User = Depends(oauth2.require_admin_role)):
+    """
+    The monthly bill as a CSV file: one row per student, with a column per dish.
+    """
+    bill = load_monthly_bill(db, year, month)
+
+    lunch_items = sorted({item for user in bill["users"] for item in user["lunch_item_counts"]})
+    dinner_items = sorted({item for user in bill["users"] for item in user["dinner_item_counts"]})
+
+    output = io.StringIO()
+    writer = csv.writer(output)
+
+    writer.writerow([f"Meal Bill for: {bill['billing_month']:%Y-%m}"])
+    writer.writerow(["Bookings up to:", bill["rolled_up_through"]])
+    writer.writerow([]) # Blank row for spacing
+    writer.writerow(["Total Lunches:", bill["total_lunch"]])
+    writer.writerow(["Total Dinners:", bill["total_dinner"]])
+    writer.writerow([]) # Blank row for spacing
+
+    writer.writerow(
+        ["Student Name", "Room Number", "Lunches", "Dinners"]
+        + [f"Lunch: {item}" for item in lunch_items]
+        + [f"Dinner: {item}" for item in dinner_items]
+    )
+    for user in bill["users"]:
+        writer.writerow(
+            [user["user_name"], user["room_number"], user["lunch_count"], user["dinner_count"]]
+            + [user["lunch_item_counts"].get(item, 0) for item in lunch_items]
+            + [user["dinner_item_counts"].get(item, 0) for item in dinner_items]
+        )
+
+    output.seek(0)
+    headers = {"Content-Disposition": f"attachment; filename=meal_bill_{bill['billing_month']:%Y_%m}.csv"}
+    return StreamingResponse(output, headers=headers, media_type="text/csv")
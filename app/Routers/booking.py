@@ -3,11 +3,12 @@ from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 from datetime import date, datetime, timedelta
 from typing import List
-import pytz
+from zoneinfo import ZoneInfo
 
 from .. import schemas, oauth2, models
-from ..database import get_db
-from .. import fcm_manager
+from ..database import get_db, get_read_db
+from .. import booking_batcher, fcm_manager, menu_items, meal_feed
+from ..responses import fast_json
 
 router = APIRouter(
     prefix="/bookings",
@@ -15,7 +16,7 @@ router = APIRouter(
 )
 
 # --- Define Timezone and Cut-off Hours ---
-IST = pytz.timezone('Asia/Kolkata')
+IST = ZoneInfo('Asia/Kolkata')
 LUNCH_CUTOFF_HOUR = 7   # 7:00 AM
 TODAY_CUTOFF_HOUR = 18  # 6:00 PM
 
@@ -85,15 +86,19 @@ def create_or_update_booking(
     # ------------------------------
     #   PART 3: Validation Logic
     # ------------------------------
-    if booking.lunch_pick:
-        if not set(booking.lunch_pick).issubset(set(menu.lunch_options)):       # type: ignore
+    lunch_options, dinner_options = menu_items.menu_options(db, menu)
+    lunch_item_ids = menu_items.picks_to_ids(booking.lunch_pick, lunch_options)
+    dinner_item_ids = menu_items.picks_to_ids(booking.dinner_pick, dinner_options)
+
+    if lunch_item_ids:
+        if not set(lunch_item_ids).issubset(menu.lunch_item_ids):       # type: ignore
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="One or more of your lunch picks are not valid options on this day."
             )
 
-    if booking.dinner_pick:
-        if not set(booking.dinner_pick).issubset(set(menu.dinner_options)):     # type: ignore
+    if dinner_item_ids:
+        if not set(dinner_item_ids).issubset(menu.dinner_item_ids):     # type: ignore
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="One or more of your dinner picks are not valid options on this day."
@@ -102,21 +107,39 @@ def create_or_update_booking(
     # ------------------------------
     #   PART 4: UPSERT (Insert or Update)
     # ------------------------------
+    if booking_batcher.enabled():
+        # Written together with the other bookings of the same few ms (see app/booking_batcher.py).
+        # The menu read is over, so give the connection back while waiting. The rollback
+        # expires current_user, and reading its id afterwards would check a connection out again.
+        user_id = current_user.id
+        db.rollback()
+        try:
+            written = booking_batcher.upsert(user_id, booking.booking_date, lunch_item_ids, dinner_item_ids)   # type: ignore
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Database error: {e}"
+            )
+        meal_feed.publish_booking_change(db, booking.booking_date, written.old_lunch, written.old_dinner, lunch_item_ids, dinner_item_ids)   # type: ignore
+        return menu_items.booking_to_dict(db, written.booking)
+
     db_booking = db.query(models.Booking).filter(
         models.Booking.user_id == current_user.id,
         models.Booking.booking_date == booking.booking_date
     ).first()
 
+    old_lunch, old_dinner = (db_booking.lunch_item_ids, db_booking.dinner_item_ids) if db_booking else (None, None)
+
     try:
         if db_booking:
-            db_booking.lunch_pick = booking.lunch_pick      # type: ignore
-            db_booking.dinner_pick = booking.dinner_pick    # type: ignore
+            db_booking.lunch_item_ids = lunch_item_ids      # type: ignore
+            db_booking.dinner_item_ids = dinner_item_ids    # type: ignore
         else:
             db_booking = models.Booking(
                 user_id=current_user.id,
                 booking_date=booking.booking_date,
-                lunch_pick=booking.lunch_pick,
-                dinner_pick=booking.dinner_pick
+                lunch_item_ids=lunch_item_ids,
+                dinner_item_ids=dinner_item_ids
             )
             db.add(db_booking)
             
@@ -129,7 +152,8 @@ def create_or_update_booking(
             detail=f"Database error: {e}"
         )
 
-    return db_booking
+    meal_feed.publish_booking_change(db, booking.booking_date, old_lunch, old_dinner, lunch_item_ids, dinner_item_ids)   # type: ignore
+    return menu_items.booking_to_dict(db, db_booking)
 
 #-------------------------------------------------------CREATE A BOOKING----------------------------------------------------#
 @router.post("/book", status_code=status.HTTP_201_CREATED, response_model=schemas.MealBookingOut)
@@ -153,18 +177,22 @@ def create_booking(booking: schemas.MealBookingCreate, db: Session = Depends(get
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"The menu for {booking.booking_date} has not been set yet. Booking is not available.")
 
     # --- VALIDATION LOGIC ---
-    if booking.lunch_pick and not set(booking.lunch_pick).issubset(set(menu.lunch_options)): # type: ignore
+    lunch_options, dinner_options = menu_items.menu_options(db, menu)
+    lunch_item_ids = menu_items.picks_to_ids(booking.lunch_pick, lunch_options)
+    dinner_item_ids = menu_items.picks_to_ids(booking.dinner_pick, dinner_options)
+
+    if lunch_item_ids and not set(lunch_item_ids).issubset(menu.lunch_item_ids): # type: ignore
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="One or more of your lunch picks are not valid options on this day.")
 
-    if booking.dinner_pick and not set(booking.dinner_pick).issubset(set(menu.dinner_options)): # type: ignore
+    if dinner_item_ids and not set(dinner_item_ids).issubset(menu.dinner_item_ids): # type: ignore
          raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="One or more of your dinner picks are not valid options on this day.")
 
     # --- Part 2: The "INSERT" Query ---
     new_booking = models.Booking(
         user_id=current_user.id,
         booking_date=booking.booking_date,
-        lunch_pick=booking.lunch_pick,
-        dinner_pick=booking.dinner_pick
+        lunch_item_ids=lunch_item_ids,
+        dinner_item_ids=dinner_item_ids
     )
 
     try:
@@ -181,11 +209,12 @@ def create_booking(booking: schemas.MealBookingCreate, db: Session = Depends(get
         db.rollback()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}")
 
-    return new_booking
+    meal_feed.publish_booking_change(db, booking.booking_date, None, None, lunch_item_ids, dinner_item_ids)   # type: ignore
+    return menu_items.booking_to_dict(db, new_booking)
 
 #-----------------------------------------------------GET MY BOOKINGS-------------------------------------------------------#
 @router.get("/me", response_model=List[schemas.MyBookingHistoryItem])
-def get_my_bookings(db: Session = Depends(get_db), current_user: models.User = Depends(oauth2.get_current_user)):
+def get_my_bookings(db: Session = Depends(get_read_db), current_user: models.User = Depends(oauth2.get_current_user)):
     
     meal_history = db.query(models.Booking).filter(
         models.Booking.user_id == current_user.id
@@ -194,7 +223,18 @@ def get_my_bookings(db: Session = Depends(get_db), current_user: models.User = D
     if not meal_history:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="You have no bookings!")
     
-    return meal_history
+    names = menu_items.names_for_ids(
+        db, [item_id for b in meal_history for item_id in [*(b.lunch_item_ids or []), *(b.dinner_item_ids or [])]]
+    )
+    return fast_json([
+        {
+            "booking_date": b.booking_date,
+            "lunch_pick": menu_items.to_names(b.lunch_item_ids, names),      # type: ignore
+            "dinner_pick": menu_items.to_names(b.dinner_item_ids, names),    # type: ignore
+            "created_at": b.created_at,
+        }
+        for b in meal_history
+    ])
 
 #-----------------------------------------------------DELETE BOOKING----------------------------------------------------------#
 @router.delete("/{booking_date}", status_code=status.HTTP_204_NO_CONTENT)
@@ -210,13 +250,16 @@ def delete_booking(booking_date: date, db: Session = Depends(get_db), current_us
     if not db_booking:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"You do not have a booking for {booking_date} to cancel.")
 
+    old_lunch, old_dinner = db_booking.lunch_item_ids, db_booking.dinner_item_ids
+
     try:
         db.delete(db_booking)
         db.commit()
     except Exception as e:
         db.rollback()
         raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database Error : {e}")
-        
+
+    meal_feed.publish_booking_change(db, booking_date, old_lunch, old_dinner, None, None)    # type: ignore
     return Response(status_code=status.HTTP_204_NO_CONTENT)
     
 #-----------------------------------------------------UPDATE LUNCH BOOKINGS------------------------------------------------------#
@@ -237,7 +280,10 @@ def update_Lunch(booking: schemas.LunchUpdate, db: Session = Depends(get_db), cu
     if not menu:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"The menu for {booking.booking_date} has not been set yet.")
 
-    if booking.lunch_pick and not set(booking.lunch_pick).issubset(set(menu.lunch_options)):        # type: ignore
+    lunch_options, _ = menu_items.menu_options(db, menu)
+    lunch_item_ids = menu_items.picks_to_ids(booking.lunch_pick, lunch_options)
+
+    if lunch_item_ids and not set(lunch_item_ids).issubset(menu.lunch_item_ids):        # type: ignore
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="One or more of your lunch picks are not valid options on this day.")
     
     db_booking = db.query(models.Booking).filter(
@@ -251,15 +297,18 @@ def update_Lunch(booking: schemas.LunchUpdate, db: Session = Depends(get_db), cu
             detail=f"No booking found for user {current_user.id} on {booking.booking_date}"
         )
 
+    old_lunch = db_booking.lunch_item_ids
+
     try:
-        db_booking.lunch_pick = booking.lunch_pick      # type: ignore
+        db_booking.lunch_item_ids = lunch_item_ids      # type: ignore
         db.commit()
         db.refresh(db_booking)
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}")
-        
-    return db_booking
+
+    meal_feed.publish_booking_change(db, booking.booking_date, old_lunch, db_booking.dinner_item_ids, lunch_item_ids, db_booking.dinner_item_ids)   # type: ignore
+    return menu_items.booking_to_dict(db, db_booking)
     
 #-----------------------------------------------------UPDATE DINNER BOOKINGS------------------------------------------------------#
 @router.patch("/update-dinner", status_code=status.HTTP_200_OK, response_model=schemas.MealBookingOut)
@@ -276,7 +325,10 @@ def update_Dinner(booking: schemas.DinnerUpdate, db: Session = Depends(get_db),
     if not menu:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"The menu for {booking.booking_date} has not been set yet.")
 
-    if booking.dinner_pick and not set(booking.dinner_pick).issubset(set(menu.dinner_options)):     # type: ignore
+    _, dinner_options = menu_items.menu_options(db, menu)
+    dinner_item_ids = menu_items.picks_to_ids(booking.dinner_pick, dinner_options)
+
+    if dinner_item_ids and not set(dinner_item_ids).issubset(menu.dinner_item_ids):     # type: ignore
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="One or more of your dinner picks are not valid options on this day.")
     
     if booking.booking_date == today_ist and now_ist.hour >= TODAY_CUTOFF_HOUR:
@@ -293,15 +345,18 @@ def update_Dinner(booking: schemas.DinnerUpdate, db: Session = Depends(get_db),
             detail=f"No booking found for user {current_user.id} on {booking.booking_date}"
         )
 
+    old_dinner = db_booking.dinner_item_ids
+
     try:
-        db_booking.dinner_pick = booking.dinner_pick        # type: ignore
+        db_booking.dinner_item_ids = dinner_item_ids        # type: ignore
         db.commit()
         db.refresh(db_booking)
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}")
-        
-    return db_booking
+
+    meal_feed.publish_booking_change(db, booking.booking_date, db_booking.lunch_item_ids, old_dinner, db_booking.lunch_item_ids, dinner_item_ids)   # type: ignore
+    return menu_items.booking_to_dict(db, db_booking)
 
 #----------------------------------------------------Wake Up Convenor------------------------------------------------------#
 @router.post("/wake-convenor", status_code=status.HTTP_200_OK)
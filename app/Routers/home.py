@@ -0,0 +1,86 @@
+import asyncio
+import logging
+from datetime import date, datetime
+from typing import Callable
+from zoneinfo import ZoneInfo
+
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from .. import schemas, oauth2, models, menu_items
+from ..database import get_read_sessions
+from ..responses import fast_json, rows_to_dicts
+from .meallist import todays_pick
+from .notice import latest_notices
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/home",
+    tags=['Home']
+)
+
+IST = ZoneInfo('Asia/Kolkata')
+
+
+def load_menu(db: Session, user: models.User, today: date):
+    return menu_items.cached_menu(db, today)
+
+
+def load_booking(db: Session, user: models.User, today: date):
+    return todays_pick(db, user.id, today)   # type: ignore
+
+
+def load_notices(db: Session, user: models.User, today: date):
+    return latest_notices(db)
+
+
+# name in the response -> (loader, value when it fails)
+HOME_PARTS = {
+    "menu": (load_menu, None),
+    "booking": (load_booking, None),
+    "notices": (load_notices, []),
+}
+
+
+def _load_part(loader, open_session: Callable[[], Session], user: models.User, today: date):
+    db = open_session()
+    try:
+        return loader(db, user, today)
+    finally:
+        db.close()
+
+
+async def load_home(open_session: Callable[[], Session], user: models.User, today: date) -> dict:
+    """
+    Runs every part of the home screen at the same time, each in a worker
+    thread with its own session. A part that raises is logged and reported
+    under `errors`; the others are still returned.
+    """
+    results = await asyncio.gather(
+        *(run_in_threadpool(_load_part, loader, open_session, user, today) for loader, _ in HOME_PARTS.values()),
+        return_exceptions=True
+    )
+    home: dict = {"errors": {}}
+    for (name, (_, fallback)), result in zip(HOME_PARTS.items(), results):
+        if isinstance(result, Exception):
+            logger.error(f"Home screen part '{name}' failed for user {user.id}", exc_info=result)
+            home[name] = fallback
+            home["errors"][name] = f"Could not load {name}."
+        else:
+            home[name] = result
+    return home
+
+
+#-----------------------------------------HOME SCREEN-----------------------------------------#
+# One request for what the app shows on launch: the user, today's menu, the
+# user's booking for today and the latest notices.
+@router.get("", response_model=schemas.HomeOut)
+async def get_home(open_session: Callable[[], Session] = Depends(get_read_sessions), current_user: models.User = Depends(oauth2.get_current_user)):
+
+    today_ist = datetime.now(IST).date()
+    home = await load_home(open_session, current_user, today_ist)
+    home["user"] = rows_to_dicts([current_user], schemas.UserOut)[0]
+
+    return fast_json(home)
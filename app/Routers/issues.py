@@ -0,0 +1,164 @@
+import logging
+import os
+import uuid
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, status, Response, BackgroundTasks, File, Form, Query, UploadFile
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from .. import schemas, oauth2, models, database, blob_store, thumbnails
+from ..responses import fast_json, rows_to_dicts
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/issues", tags=["Issues"])
+
+# Larger photos are rejected with a 413 while they are being stored
+ISSUE_IMAGE_MAX_BYTES = int(os.getenv("ISSUE_IMAGE_MAX_BYTES", str(10 * 1024 * 1024)))
+ISSUES_PAGE_DEFAULT = 20
+ISSUES_PAGE_MAX = 100
+IMAGE_EXTENSIONS = {"image/jpeg": ".jpg", "image/png": ".png", "image/webp": ".webp", "image/heic": ".heic"}
+
+
+def issues_page_query(db: Session, resolved: bool, before_id: int | None, limit: int):
+    """
+    Keyset pagination, newest first: the next page starts below the last id
+    of this one, so deep pages cost the same as the first.
+    Open tickets are read from the partial index ix_issue_tickets_unresolved_id.
+    """
+    query = db.query(models.IssueTicket).filter(models.IssueTicket.is_resolved == resolved)
+    if before_id is not None:
+        query = query.filter(models.IssueTicket.id < before_id)
+    return query.order_by(models.IssueTicket.id.desc()).limit(limit)
+
+
+def issues_page(db: Session, resolved: bool, before_id: int | None, limit: int) -> list[models.IssueTicket]:
+    return issues_page_query(db, resolved, before_id, limit).all()
+
+
+def thumbnail_key(image_key: str) -> str:
+    directory, name = os.path.split(image_key)
+    return f"{directory}/thumbnails/{os.path.splitext(name)[0]}.jpg"
+
+
+def _set_thumbnail(ticket_id: int, key: str):
+    store = blob_store.get_blob_store()
+    db = database.SessionLocal()
+    try:
+        updated = db.query(models.IssueTicket).filter(models.IssueTicket.id == ticket_id).update(
+            {models.IssueTicket.thumbnail_url: store.url(key)}
+        )
+        db.commit()
+    finally:
+        db.close()
+    if not updated:
+        # The ticket was deleted while its thumbnail was being made
+        store.delete(key)
+
+
+async def make_ticket_thumbnail(ticket_id: int, image_key: str):
+    """Background task: the resizing runs in app.thumbnails' process pool."""
+    key = thumbnail_key(image_key)
+    try:
+        await thumbnails.render(image_key, key)
+        await run_in_threadpool(_set_thumbnail, ticket_id, key)
+    except Exception as e:
+        logger.warning(f"Could not make a thumbnail for issue {ticket_id}: {e}")
+
+
+#----------------------------------------------------REPORT AN ISSUE-----------------------------------------------------#
+@router.post("/", status_code=status.HTTP_201_CREATED, response_model=schemas.IssueOut)
+def create_issue(background_tasks: BackgroundTasks, title: str = Form(..., max_length=255), description: str = Form(..., max_length=255),
+                 image: UploadFile = File(...), db: Session = Depends(database.get_db), current_user: models.User = Depends(oauth2.get_current_user)):
+
+    extension = IMAGE_EXTENSIONS.get(image.content_type or "")
+    if extension is None:
+        raise HTTPException(status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail=f"The image must be one of: {', '.join(IMAGE_EXTENSIONS)}")
+
+    # The multipart parser has already spooled a large upload to a temporary
+    # file; it is copied to the store in chunks rather than read into memory.
+    store = blob_store.get_blob_store()
+    image_key = f"issues/{uuid.uuid4().hex}{extension}"
+    try:
+        store.save(image_key, image.file, max_bytes=ISSUE_IMAGE_MAX_BYTES)
+    except blob_store.BlobTooLarge:
+        raise HTTPException(status.HTTP_413_CONTENT_TOO_LARGE, detail=f"The image must be at most {ISSUE_IMAGE_MAX_BYTES // (1024 * 1024)} MB")
+
+    new_issue = models.IssueTicket(title=title, description=description, image_url=store.url(image_key), posted_by=current_user.id)
+    try:
+        db.add(new_issue)
+        db.commit()
+        db.refresh(new_issue)
+    except Exception as e:
+        db.rollback()
+        store.delete(image_key)
+        raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database Error: {e}")
+
+    if thumbnails.available():
+        background_tasks.add_task(make_ticket_thumbnail, new_issue.id, image_key)
+
+    return new_issue
+
+#------------------------------------------------------LIST ISSUES-------------------------------------------------------#
+@router.get("/", response_model=List[schemas.IssueOut])
+def list_issues(resolved: bool = False, before: Optional[int] = Query(None, description="Return issues with an id below this one (the last id of the previous page)"),
+                limit: int = Query(ISSUES_PAGE_DEFAULT, ge=1, le=ISSUES_PAGE_MAX),
+                db: Session = Depends(database.get_read_db), current_user: models.User = Depends(oauth2.get_current_user)):
+
+    return fast_json(rows_to_dicts(issues_page(db, resolved, before, limit), schemas.IssueOut))
+
+#-----------------------------------------------------RESOLVE ISSUE------------------------------------------------------#
+@router.patch("/{issue_id}/resolve", response_model=schemas.IssueOut)
+def resolve_issue(issue_id: int, db: Session = Depends(database.get_db), current_user: models.User = Depends(oauth2.require_admin_role)):
+
+    issue = db.query(models.IssueTicket).filter(models.IssueTicket.id == issue_id).first()
+
+    if not issue:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, detail=f"Issue with id {issue_id} not found")
+
+    if issue.is_resolved: # type: ignore
+        return issue
+
+    try:
+        issue.is_resolved = True # type: ignore
+        issue.resolved_at = func.now() # type: ignore
+        issue.resolved_by = current_user.id
+        db.commit()
+        db.refresh(issue)
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database Error: {e}")
+
+    return issue
+
+#------------------------------------------------------DELETE ISSUE------------------------------------------------------#
+@router.delete("/{issue_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_issue(issue_id: int, db: Session = Depends(database.get_db), current_user: models.User = Depends(oauth2.get_current_user)):
+
+    issue = db.query(models.IssueTicket).filter(models.IssueTicket.id == issue_id).first()
+
+    if not issue:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, detail=f"Issue with id {issue_id} not found")
+
+    # Students can only delete their own issues. Convenors and the Mess Committee can delete any.
+    if current_user.role not in ['convenor', 'mess_committee'] and issue.posted_by != current_user.id: # type: ignore
+        raise HTTPException(status.HTTP_403_FORBIDDEN, detail="You can't delete this issue!")
+
+    store = blob_store.get_blob_store()
+    keys = [store.key_for_url(url) for url in (issue.image_url, issue.thumbnail_url) if url] # type: ignore
+
+    try:
+        db.delete(issue)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database Error: {e}")
+
+    # Files are removed only once the row is gone, so a failed delete leaves a complete ticket
+    for key in keys:
+        if key is not None:
+            store.delete(key)
+
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
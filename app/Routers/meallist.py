@@ -1,184 +1,393 @@
-from fastapi import APIRouter, status, HTTPException, Depends
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, status, HTTPException, Depends, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy import TextClause, case, or_, text
 from sqlalchemy.orm import Session
 from datetime import date, datetime
-from typing import List
-import pytz
+from typing import Callable, List, Literal
+from zoneinfo import ZoneInfo
 from collections import Counter # Used for efficiently counting items
+from itertools import chain
+from operator import attrgetter
 import io  # Used for creating an in-memory file
 import csv # Python's built-in CSV library
 
-from .. import schemas, oauth2, models
-from ..database import get_db
+from .. import schemas, oauth2, models, menu_items, meal_feed, export, snapshots
+from ..database import get_db, get_read_db, get_read_sessions
+from ..responses import fast_json
 
 router = APIRouter(
     prefix="/meallist",
     tags=['Meal List']
 )
 
-IST = pytz.timezone('Asia/Kolkata')
+IST = ZoneInfo('Asia/Kolkata')
+
+MEALS = ("lunch", "dinner")
 
 # HELPER FUNCTION to avoid repeating code for processing database results
-def process_meal_list_results(results: list, booking_date: date):
+def process_meal_list_results(db: Session, results: list, booking_date: date):
     """Takes raw DB results and processes them into the final response structure."""
     if not results:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail=f"No bookings found for {booking_date}.")
+    return meal_list_payload(db, results, booking_date)
+
+def meal_list_payload(db: Session, results: list, booking_date: date, meals: tuple = MEALS) -> dict:
+    """The response for rows that carry the `{meal}_item_ids` of each of `meals` only."""
+    picks = {meal: [ids for ids in map(attrgetter(f"{meal}_item_ids"), results) if ids] for meal in meals}
+
+    # Count on the integer item ids; names are only looked up once per distinct item
+    item_counts = {meal: Counter(chain.from_iterable(picks[meal])) for meal in meals}
+
+    names = menu_items.names_for_ids(db, list(chain.from_iterable(item_counts.values())))
+    # A day only has a few dozen distinct pick combinations, so translate each once
+    picks_as_names = {}
+    for ids in chain(*picks.values(), ([],)):
+        key = tuple(ids)
+        if key not in picks_as_names:
+            picks_as_names[key] = menu_items.to_names(ids, names)
 
-    lunch_bookings_count = 0
-    dinner_bookings_count = 0
-    all_lunch_items = []
-    all_dinner_items = []
-    formatted_bookings = []
-
-    # Process results to get counts and item lists using ORM attribute access
-    for row in results:
-        formatted_bookings.append({
-            "user_name": row.user_name,
-            "room_number": row.room_number,
-            "lunch_pick": row.lunch_pick,
-            "dinner_pick": row.dinner_pick
-        })
-        
-        if row.lunch_pick:
-            lunch_bookings_count += 1
-            all_lunch_items.extend(row.lunch_pick)
-        if row.dinner_pick:
-            dinner_bookings_count += 1
-            all_dinner_items.extend(row.dinner_pick)
-
-    # Use Counter to get the counts of each unique item
-    lunch_item_counts = Counter(all_lunch_items)
-    dinner_item_counts = Counter(all_dinner_items)
+    def as_names(ids):
+        return None if ids is None else picks_as_names[tuple(ids)]
+
+    if meals == MEALS:
+        formatted_bookings = [
+            {
+                "user_name": row.user_name,
+                "room_number": row.room_number,
+                "lunch_pick": as_names(row.lunch_item_ids),
+                "dinner_pick": as_names(row.dinner_item_ids)
+            }
+            for row in results
+        ]
+    else:
+        pick = f"{meals[0]}_pick"
+        ids_of = attrgetter(f"{meals[0]}_item_ids")
+        formatted_bookings = [
+            {"user_name": row.user_name, "room_number": row.room_number, pick: as_names(ids_of(row))}
+            for row in results
+        ]
 
     # Structure the final response to match the Pydantic schema
     return {
         "booking_date": booking_date,
-        "total_lunch_bookings": lunch_bookings_count,
-        "total_dinner_bookings": dinner_bookings_count,
-        "lunch_item_counts": dict(lunch_item_counts),
-        "dinner_item_counts": dict(dinner_item_counts),
+        **{f"total_{meal}_bookings": len(picks[meal]) for meal in meals},
+        **{f"{meal}_item_counts": {names[item_id]: count for item_id, count in item_counts[meal].items()} for meal in meals},
         "bookings": formatted_bookings
     }
 
-# ENDPOINT 1: Get the meal list for TODAY (admin based Endpoint)
-@router.get("/today", response_model=schemas.MealListOut)
-def get_todays_meal_list(db: Session = Depends(get_db), current_user: models.User = Depends(oauth2.get_current_user)):
-    
-    now_ist = datetime.now(IST)
-    today_ist = now_ist.date()
-
-    results = db.query(
+def meal_list_query(db: Session, booking_date: date):
+    """Every booking of the day with the student's name and room, by name."""
+    return db.query(
         models.User.name.label("user_name"),
         models.User.room_number,
-        models.Booking.lunch_pick,
-        models.Booking.dinner_pick
+        models.Booking.lunch_item_ids,
+        models.Booking.dinner_item_ids
     ).join(
         models.User, models.Booking.user_id == models.User.id
     ).filter(
-        models.Booking.booking_date == today_ist
-    ).all()
-    
-    return process_meal_list_results(results, today_ist)
+        models.Booking.booking_date == booking_date
+    ).order_by(
+        models.User.name, models.User.id
+    )
 
-# ENDPOINT 2: Get the meal list for a SPECIFIC date
-@router.get("/{booking_date}", response_model=schemas.MealListOut)
-def get_meal_list_for_date(booking_date: date, db: Session = Depends(get_db), current_user: models.User = Depends(oauth2.get_current_user)):
+def meal_list_rows(db: Session, booking_date: date) -> list:
+    return meal_list_query(db, booking_date).all()
+
+#----------------------------------------------------------FILTERS--------------------------------------------------------#
+# Only the meals asked for are read, and only the matching rooms and picks,
+# so ?meal= and ?item= are not applied to a full list after the fact.
+SUMMARY_SQL = """
+    SELECT picked.meal,
+           picked.item_id,
+           CASE WHEN GROUPING(picked.item_id) = 1 THEN count(DISTINCT b.user_id) ELSE count(*) END AS n
+    FROM meal_bookings b{join}
+    CROSS JOIN LATERAL ({picked}) AS picked
+    WHERE b.booking_date = :booking_date{where}
+    GROUP BY GROUPING SETS ((picked.meal), (picked.meal, picked.item_id))
+"""
+NO_FILTERS = schemas.MealListQuery()
+
+def selected_meals(filters: schemas.MealListQuery) -> tuple:
+    return (filters.meal,) if filters.meal else MEALS
+
+def item_id_for_name(db: Session, name: str) -> int | None:
+    """The id of a dish, or None if it has never been on a menu."""
+    return db.query(models.MenuItem.id).filter(models.MenuItem.name == name).scalar()
+
+def filtered_meal_list_query(db: Session, booking_date: date, filters: schemas.MealListQuery, item_id: int | None):
     """
-    Retrieves the detailed meal list and summary for a specific chosen date.
+    The bookings of the day that match `filters`, with the pick columns of the
+    selected meals only. With an item, a meal whose pick does not include it is null.
     """
-    results = db.query(
+    columns, booked = [], []
+    for meal in selected_meals(filters):
+        item_ids = getattr(models.Booking, f"{meal}_item_ids")
+        if item_id is None:
+            columns.append(item_ids)
+            booked.append(item_ids.isnot(None))
+        else:
+            has_item = item_ids.contains([item_id])
+            columns.append(case((has_item, item_ids)).label(f"{meal}_item_ids"))
+            booked.append(has_item)
+
+    query = db.query(
         models.User.name.label("user_name"),
         models.User.room_number,
-        models.Booking.lunch_pick,
-        models.Booking.dinner_pick
+        *columns
     ).join(
         models.User, models.Booking.user_id == models.User.id
     ).filter(
         models.Booking.booking_date == booking_date
-    ).all()
+    )
+    if filters.meal or item_id is not None:
+        query = query.filter(or_(*booked))
+    if filters.room_from is not None:
+        query = query.filter(models.User.room_number >= filters.room_from)
+    if filters.room_to is not None:
+        query = query.filter(models.User.room_number <= filters.room_to)
+    if filters.sort == "room":
+        return query.order_by(models.User.room_number, models.User.name, models.User.id)
+    return query.order_by(models.User.name, models.User.id)
+
+def meal_list_summary_statement(booking_date: date, filters: schemas.MealListQuery, item_id: int | None) -> TextClause:
+    """
+    One aggregate over the day's bookings: the number of bookings per selected
+    meal and the number of picks per dish, without reading any booking row into Python.
+    """
+    picked, where = [], ""
+    for meal in selected_meals(filters):
+        has_item = f" WHERE b.{meal}_item_ids @> ARRAY[:item_id]" if item_id is not None else ""
+        picked.append(f"SELECT '{meal}' AS meal, unnest(b.{meal}_item_ids) AS item_id{has_item}")
+    params = {"booking_date": booking_date}
+    if item_id is not None:
+        params["item_id"] = item_id
+    if filters.room_from is not None:
+        where += " AND u.room_number >= :room_from"
+        params["room_from"] = filters.room_from
+    if filters.room_to is not None:
+        where += " AND u.room_number <= :room_to"
+        params["room_to"] = filters.room_to
+    # users is only joined when rooms are filtered on
+    join = "\n    JOIN users u ON u.id = b.user_id" if where else ""
+    sql = SUMMARY_SQL.format(join=join, picked=" UNION ALL ".join(picked), where=where)
+    return text(sql).bindparams(**params)
+
+def meal_list_summary(db: Session, booking_date: date, filters: schemas.MealListQuery, item_id: int | None) -> dict:
+    meals = selected_meals(filters)
+    totals = dict.fromkeys(meals, 0)
+    item_counts = {meal: {} for meal in meals}
+    for meal, picked_item_id, n in db.execute(meal_list_summary_statement(booking_date, filters, item_id)):
+        if picked_item_id is None:
+            totals[meal] = n
+        else:
+            item_counts[meal][picked_item_id] = n
+
+    names = menu_items.names_for_ids(db, list(chain.from_iterable(item_counts.values())))
+    return {
+        "booking_date": booking_date,
+        **{f"total_{meal}_bookings": totals[meal] for meal in meals},
+        **{f"{meal}_item_counts": {names[i]: n for i, n in item_counts[meal].items()} for meal in meals},
+    }
+
+def filtered_meal_list(db: Session, booking_date: date, filters: schemas.MealListQuery) -> dict:
+    """The meal list of the day as narrowed by `filters`; no matches is an empty list, not a 404."""
+    if filters.room_from is not None and filters.room_to is not None and filters.room_to < filters.room_from:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="'room_to' must not be below 'room_from'.")
+
+    item_id = None
+    if filters.item is not None:
+        item_id = item_id_for_name(db, filters.item)
+        if item_id is None:
+            # Never on a menu, so nobody picked it
+            meal_list = meal_list_payload(db, [], booking_date, selected_meals(filters))
+            if filters.summary_only:
+                del meal_list["bookings"]
+            return meal_list
+
+    if filters.summary_only:
+        return meal_list_summary(db, booking_date, filters, item_id)
+    results = filtered_meal_list_query(db, booking_date, filters, item_id).all()
+    return meal_list_payload(db, results, booking_date, selected_meals(filters))
+
+def serve_meal_list(request: Request, db: Session, primary_db: Session, booking_date: date,
+                    filters: schemas.MealListQuery, now: datetime | None = None) -> Response:
+    # After dinner's cutoff the day's list, narrowed or not, is final
+    frozen = snapshots.is_frozen(booking_date, now)
+    if filters == NO_FILTERS:
+        if frozen:
+            return snapshots.respond(request, frozen_meal_list(db, primary_db, booking_date), "json", "application/json")
+        results = meal_list_rows(db, booking_date)
+        return fast_json(process_meal_list_results(db, results, booking_date))
+
+    meal_list = filtered_meal_list(db, booking_date, filters)
+    if frozen:
+        return snapshots.respond_json(request, meal_list)
+    return fast_json(meal_list)
+
+def meal_list_csv(meal_list: dict) -> bytes:
+    """The CSV download of a process_meal_list_results() payload, with the total counts on top."""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    
+    # Write the summary rows at the top
+    writer.writerow([f"Meal List Summary for: {meal_list['booking_date']}"])
+    writer.writerow([]) # Blank row for spacing
+    writer.writerow(["Total Lunch Bookings:", meal_list["total_lunch_bookings"]])
+    writer.writerow(["Total Dinner Bookings:", meal_list["total_dinner_bookings"]])
+    writer.writerow([]) # Blank row for spacing
     
-    return process_meal_list_results(results, booking_date)
+    # Write the main header row
+    writer.writerow(["Student Name", "Room Number", "Lunch Selection", "Dinner Selection"])
+    
+    # Write the data rows
+    for booking in meal_list["bookings"]:
+        lunch_picks = ', '.join(booking["lunch_pick"] or [])
+        dinner_picks = ', '.join(booking["dinner_pick"] or [])
+        writer.writerow([booking["user_name"], booking["room_number"], lunch_picks, dinner_picks])
+    return output.getvalue().encode()
 
-# ENDPOINT 3: Get the meal list for TODAY (user based Endpoint)
-@router.get("/me/today", response_model=schemas.MealListItem)
-def my_meal(db: Session = Depends(get_db), current_user: models.User = Depends(oauth2.get_current_user)):
+def freeze_meal_list(db: Session, booking_date: date) -> dict | None:
+    """
+    Stores the final meal list of a closed day in meal_list_snapshots (see
+    app/snapshots.py) and returns it; None if nobody booked that day.
+    """
+    results = meal_list_rows(db, booking_date)
+    if not results:
+        return None
+    meal_list = process_meal_list_results(db, results, booking_date)
+    try:
+        snapshot = snapshots.store(db, booking_date, meal_list, meal_list_csv(meal_list))
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database Error: {e}")
+    return snapshot
+
+def frozen_meal_list(db: Session, primary_db: Session, booking_date: date) -> dict:
+    """The snapshot of a closed day, stored now from the primary if this is its first read."""
+    snapshot = snapshots.get(db, booking_date) or freeze_meal_list(primary_db, booking_date)
+    if snapshot is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail=f"No bookings found for {booking_date}.")
+    return snapshot
 
+# ENDPOINT 1: Get the meal list for TODAY (admin based Endpoint)
+@router.get("/today", response_model=schemas.MealListOut)
+def get_todays_meal_list(request: Request, filters: schemas.MealListQuery = Depends(), db: Session = Depends(get_read_db), primary_db: Session = Depends(get_db), current_user: models.User = Depends(oauth2.get_current_user)):
+    
     now_ist = datetime.now(IST)
     today_ist = now_ist.date()
 
+    return serve_meal_list(request, db, primary_db, today_ist, filters, now_ist)
+
+# ENDPOINT 1b: Live counts for TODAY as Server-Sent Events, instead of polling /today
+# (see app/meal_feed.py for the event format)
+@router.get("/today/live")
+async def live_meal_counts(open_session: Callable[[], Session] = Depends(get_read_sessions), current_user: models.User = Depends(oauth2.get_current_user)):
+
+    return StreamingResponse(
+        meal_feed.stream(open_session),
+        media_type="text/event-stream",
+        # X-Accel-Buffering stops nginx from holding events back
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+#----------------------------------------------------------EXPORT--------------------------------------------------------#
+# Declared before /{booking_date} so that "export" is not read as a date
+@router.get("/export")
+def export_meal_lists(from_date: date = Query(alias="from"), to_date: date = Query(alias="to"),
+                      format: Literal["csv", "parquet"] = "csv",
+                      open_session: Callable[[], Session] = Depends(get_read_sessions),
+                      current_user: models.User = Depends(oauth2.require_admin_role)):
+    """
+    Every booking from `from` to `to` (inclusive), one row per student and day,
+    streamed as CSV or Parquet (see app/export.py).
+    """
+    if to_date < from_date:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="'to' must not be before 'from'.")
+    if (to_date - from_date).days + 1 > export.EXPORT_MAX_DAYS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"At most {export.EXPORT_MAX_DAYS} days can be exported at once.")
+    if format == "parquet" and not export.parquet_available():
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail="Parquet export needs pyarrow on the server.")
+
+    headers = {"Content-Disposition": f"attachment; filename=meal_bookings_{from_date}_{to_date}.{format}"}
+    return StreamingResponse(export.export_chunks(open_session, from_date, to_date, format),
+                             headers=headers, media_type=export.MEDIA_TYPES[format])
+
+# ENDPOINT 2: Get the meal list for a SPECIFIC date
+@router.get("/{booking_date}", response_model=schemas.MealListOut)
+def get_meal_list_for_date(request: Request, booking_date: date, filters: schemas.MealListQuery = Depends(), db: Session = Depends(get_read_db), primary_db: Session = Depends(get_db), current_user: models.User = Depends(oauth2.get_current_user)):
+    """
+    Retrieves the detailed meal list and summary for a specific chosen date.
+    Closed days are served from their snapshot and can be cached for good.
+    ?summary_only, ?meal, ?item, ?room_from / ?room_to and ?sort narrow the
+    list down in SQL (see schemas.MealListQuery).
+    """
+    return serve_meal_list(request, db, primary_db, booking_date, filters)
+
+# ENDPOINT 2b: Expected final counts for a date whose booking is still open (see app/forecast.py)
+@router.get("/{booking_date}/forecast", response_model=schemas.MealForecastOut)
+def get_meal_forecast(booking_date: date, db: Session = Depends(get_read_db), current_user: models.User = Depends(oauth2.require_admin_role)):
+    # NumPy is only imported when a forecast is first asked for
+    from .. import forecast
+
+    return fast_json(forecast.forecast(db, booking_date))
+
+def todays_pick(db: Session, user_id: int, today: date) -> dict | None:
+    """The user's booking for `today` in the shape of schemas.MealListItem, or None."""
     result = db.query(
         models.User.name.label("user_name"),
         models.User.room_number,
-        models.Booking.lunch_pick,
-        models.Booking.dinner_pick
+        models.Booking.lunch_item_ids,
+        models.Booking.dinner_item_ids
     ).join(
         models.User, models.Booking.user_id == models.User.id
     ).filter(
-        models.Booking.booking_date == today_ist,
-        models.User.id == current_user.id
+        models.Booking.booking_date == today,
+        models.User.id == user_id
     ).first()
-    
+
     if result is None:
-        raise HTTPException(status.HTTP_404_NOT_FOUND, detail="You have not booked a meal for today yet!")
-    
+        return None
+
+    names = menu_items.names_for_ids(db, [*(result.lunch_item_ids or []), *(result.dinner_item_ids or [])])
     return {
         "user_name": result.user_name,
         "room_number": result.room_number,
-        "lunch_pick": result.lunch_pick,
-        "dinner_pick": result.dinner_pick
+        "lunch_pick": menu_items.to_names(result.lunch_item_ids, names),
+        "dinner_pick": menu_items.to_names(result.dinner_item_ids, names)
     }
 
+# ENDPOINT 3: Get the meal list for TODAY (user based Endpoint)
+@router.get("/me/today", response_model=schemas.MealListItem)
+def my_meal(db: Session = Depends(get_read_db), current_user: models.User = Depends(oauth2.get_current_user)):
+
+    now_ist = datetime.now(IST)
+    today_ist = now_ist.date()
+
+    pick = todays_pick(db, current_user.id, today_ist)   # type: ignore
+
+    if pick is None:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, detail="You have not booked a meal for today yet!")
+
+    return fast_json(pick)
+
 #----------------------------------------------------------DOWNLOAD MEAL LIST--------------------------------------------------------#
 @router.get("/{booking_date}/download")
-def download_meal_list_for_date(booking_date: date, db: Session = Depends(get_db), current_user: models.User = Depends(oauth2.get_current_user)):
+def download_meal_list_for_date(request: Request, booking_date: date, db: Session = Depends(get_read_db), primary_db: Session = Depends(get_db), current_user: models.User = Depends(oauth2.get_current_user)):
     """
     Generates and returns a CSV file of all meal bookings for a specific date,
     including a summary of total counts.
     """
-    # 1. Fetch the data with an ORM JOIN and order by student name
-    results = db.query(
-        models.User.name.label("user_name"),
-        models.User.room_number,
-        models.Booking.lunch_pick,
-        models.Booking.dinner_pick
-    ).join(
-        models.User, models.Booking.user_id == models.User.id
-    ).filter(
-        models.Booking.booking_date == booking_date
-    ).order_by(
-        models.User.name
-    ).all()
+    headers = {"Content-Disposition": f"attachment; filename=meal_list_{booking_date}.csv"}
+    if snapshots.is_frozen(booking_date):
+        return snapshots.respond(request, frozen_meal_list(db, primary_db, booking_date), "csv", "text/csv", headers)
 
+    results = meal_list_rows(db, booking_date)
     if not results:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail=f"No bookings found for {booking_date} to download.")
 
-    # 2. Calculate the total counts using the ORM results
-    total_lunch = sum(1 for row in results if row.lunch_pick)
-    total_dinner = sum(1 for row in results if row.dinner_pick)
-
-    # 3. Create a CSV file in memory
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Write the summary rows at the top
-    writer.writerow([f"Meal List Summary for: {booking_date}"])
-    writer.writerow([]) # Blank row for spacing
-    writer.writerow(["Total Lunch Bookings:", total_lunch])
-    writer.writerow(["Total Dinner Bookings:", total_dinner])
-    writer.writerow([]) # Blank row for spacing
-    
-    # Write the main header row
-    writer.writerow(["Student Name", "Room Number", "Lunch Selection", "Dinner Selection"])
-    
-    # Write the data rows
-    for row in results:
-        lunch_picks = ', '.join(row.lunch_pick or [])
-        dinner_picks = ', '.join(row.dinner_pick or [])
-        writer.writerow([row.user_name, row.room_number, lunch_picks, dinner_picks])
-    
-    # 4. Prepare and return the response
-    output.seek(0)
-    headers = {"Content-Disposition": f"attachment; filename=meal_list_{booking_date}.csv"}
-    return StreamingResponse(output, headers=headers, media_type="text/csv")
\ No newline at end of file
+    output = meal_list_csv(process_meal_list_results(db, results, booking_date))
+    return Response(content=output, headers=headers, media_type="text/csv")
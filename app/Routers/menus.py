@@ -1,10 +1,16 @@
-from fastapi import APIRouter, status, HTTPException, Depends, BackgroundTasks
+from fastapi import APIRouter, status, HTTPException, Depends, BackgroundTasks, Query, Request
 from sqlalchemy.orm import Session
 from datetime import date
+from typing import List
+import os
 
 from .. import schemas, oauth2, models
-from ..database import get_db
-from .. import fcm_manager
+from ..database import get_db, get_read_db
+from .. import broadcasts, menu_items, invalidation
+from ..responses import cached_json
+
+# Longest range (in days, both ends included) GET /menus returns at once
+MENU_RANGE_MAX_DAYS = int(os.getenv("MENU_RANGE_MAX_DAYS", "31"))
 
 router = APIRouter(
     prefix="/menus",
@@ -19,21 +25,26 @@ def set_daily_menu(menu: schemas.DailyMenuCreate, background_tasks: BackgroundTa
     db_menu = db.query(models.Menu).filter(models.Menu.menu_date == menu.menu_date).first()
 
     try:
+        # Dishes are stored as menu_items ids; new dish names get a row here
+        lunch_item_ids = menu_items.ids_for_names(db, menu.lunch_options)
+        dinner_item_ids = menu_items.ids_for_names(db, menu.dinner_options)
+
         if db_menu:
             # UPDATE existing menu
-            db_menu.lunch_options = menu.lunch_options # type: ignore
-            db_menu.dinner_options = menu.dinner_options # type: ignore
+            db_menu.lunch_item_ids = lunch_item_ids # type: ignore
+            db_menu.dinner_item_ids = dinner_item_ids # type: ignore
             db_menu.set_by_user_id = current_user.id
         else:
             # INSERT new menu
             db_menu = models.Menu(
                 menu_date=menu.menu_date,
-                lunch_options=menu.lunch_options,
-                dinner_options=menu.dinner_options,
+                lunch_item_ids=lunch_item_ids,
+                dinner_item_ids=dinner_item_ids,
                 set_by_user_id=current_user.id
             )
             db.add(db_menu)
-            
+
+        invalidation.publish(db, "menus", menu.menu_date)
         db.commit()
         db.refresh(db_menu)
     except Exception as e:
@@ -44,19 +55,32 @@ def set_daily_menu(menu: schemas.DailyMenuCreate, background_tasks: BackgroundTa
     menu_date_str = str(db_menu.menu_date)
     
     # After setting the menu, send a notification to all users.
+    # Edits of the same day's menu in quick succession go out as one (see app/broadcasts.py)
     notification_title = "Menu Updated !!!"
     notification_body = f"The meal menu for {menu_date_str} has been set."
     background_tasks.add_task(
-        fcm_manager.send_notification_to_all, notification_title, notification_body
+        broadcasts.schedule, f"menu:{menu_date_str}", notification_title, notification_body
     )
     
-    return db_menu
+    return menu_items.menu_to_dict(db, db_menu)
+
+# ENDPOINT 2: Get the menus for a range of days, e.g. a week (Any logged-in user)
+# Days without a menu are left out. Declared before /{menu_date} so "" is not read as a date.
+@router.get("", response_model=List[schemas.DailyMenuOut])
+def get_menus_in_range(request: Request, from_date: date = Query(alias="from"), to_date: date = Query(alias="to"), db: Session = Depends(get_read_db), current_user: models.User = Depends(oauth2.get_current_user)):
+
+    if to_date < from_date:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="'to' must not be before 'from'.")
+    if (to_date - from_date).days + 1 > MENU_RANGE_MAX_DAYS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"At most {MENU_RANGE_MAX_DAYS} days can be requested at once.")
+
+    return cached_json(request, menu_items.menus_in_range(db, from_date, to_date))
 
-# ENDPOINT 2: Get the menu for a specific day (Any logged-in user)
+# ENDPOINT 3: Get the menu for a specific day (Any logged-in user)
 @router.get("/{menu_date}", response_model=schemas.DailyMenuOut)
-def get_daily_menu(menu_date: date, db: Session = Depends(get_db), current_user: models.User = Depends(oauth2.get_current_user)):
+def get_daily_menu(menu_date: date, db: Session = Depends(get_read_db), current_user: models.User = Depends(oauth2.get_current_user)):
         
-    menu = db.query(models.Menu).filter(models.Menu.menu_date == menu_date).first()
+    menu = menu_items.cached_menu(db, menu_date)
 
     if not menu:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"No menu has been set for {menu_date}.")
@@ -1,12 +1,35 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Response, BackgroundTasks
 from sqlalchemy.orm import Session
 from typing import List
+import os
 
 from .. import database, schemas, oauth2, models
-from .. import fcm_manager
+from .. import broadcasts, invalidation
+from ..cache import TTLCache
+from ..responses import rows_to_dicts
 
 router = APIRouter(prefix='/notices', tags=['Notices'])
 
+# How long the latest notices are served from memory. Posting or deleting a
+# notice evicts them in every worker through app.invalidation.
+NOTICE_CACHE_SECONDS = float(os.getenv("NOTICE_CACHE_SECONDS", "300"))
+LATEST_NOTICES = 10
+
+# "latest" -> the newest LATEST_NOTICES notices as schemas.NoticeOut dicts
+_latest_notices = TTLCache(NOTICE_CACHE_SECONDS, max_entries=1, fallback_ttl_seconds=invalidation.CACHE_FALLBACK_SECONDS)
+invalidation.register("notices", _latest_notices)
+
+
+def latest_notices(db: Session) -> list[dict]:
+    notices = _latest_notices.get("latest")
+    if notices is None:
+        # SQLAlchemy equivalent of: ORDER BY created_at DESC LIMIT 10
+        rows = db.query(models.Notice).order_by(models.Notice.created_at.desc()).limit(LATEST_NOTICES).all()
+        notices = rows_to_dicts(rows, schemas.NoticeOut)
+        _latest_notices.set("latest", notices)
+    return notices
+
+
 #----------------------------------------------------------POST NOTICE-------------------------------------------------------------#
 @router.post("/", status_code=status.HTTP_201_CREATED, response_model=schemas.NoticeOut)
 def create_notice(notice: schemas.NoticeCreate, background_tasks: BackgroundTasks, db: Session = Depends(database.get_db), current_user: models.User = Depends(oauth2.require_admin_role)):
@@ -20,6 +43,7 @@ def create_notice(notice: schemas.NoticeCreate, background_tasks: BackgroundTask
 
     try:
         db.add(new_notice)
+        invalidation.publish(db, "notices")
         db.commit()
         db.refresh(new_notice)
     except Exception as e:
@@ -33,20 +57,18 @@ def create_notice(notice: schemas.NoticeCreate, background_tasks: BackgroundTask
     # After the notice is created, send a notification to all users.
     notification_title = f"New Notice: {notice_title}"
     notification_body = notice_content[:120] # Send the first 120 chars
+    # Keyed by notice: two notices posted close together are two announcements, not edits of one
     background_tasks.add_task(
-        fcm_manager.send_notification_to_all, notification_title, notification_body
+        broadcasts.schedule, f"notice:{new_notice.id}", notification_title, notification_body
     )
     
     return new_notice
 
 #-----------------------------------------------------------GET NOTICE------------------------------------------------------------#
 @router.get("/", response_model=List[schemas.NoticeOut])
-def get_all_notice(db: Session = Depends(database.get_db), current_user: models.User = Depends(oauth2.get_current_user)):
+def get_all_notice(db: Session = Depends(database.get_read_db), current_user: models.User = Depends(oauth2.get_current_user)):
     
-    # SQLAlchemy equivalent of: ORDER BY created_at DESC LIMIT 10
-    notices = db.query(models.Notice).order_by(models.Notice.created_at.desc()).limit(10).all()
-
-    return notices
+    return latest_notices(db)
 
 #-------------------------------------------------DELETE NOTICE------------------------------------------------------#
 @router.delete("/{notice_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -63,6 +85,7 @@ def delete_notice(notice_id: int, db: Session = Depends(database.get_db), curren
     
     try:
         db.delete(notice_to_delete)
+        invalidation.publish(db, "notices")
         db.commit()
     except Exception as e:
         db.rollback()
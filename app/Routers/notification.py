@@ -1,7 +1,7 @@
 from fastapi import APIRouter, status, HTTPException, Depends, Response
 from sqlalchemy.orm import Session
 
-from .. import schemas, oauth2, database, models
+from .. import schemas, oauth2, database, models, invalidation
 
 router = APIRouter(
     prefix="/notifications",
@@ -25,6 +25,7 @@ def register_push_token(
     
     try:
         user.push_token = token_data.token # type: ignore
+        invalidation.publish(db, "users", user.id)
         db.commit()
     except Exception as e:
         db.rollback()
@@ -1,14 +1,20 @@
 from fastapi import APIRouter, Depends, BackgroundTasks
+from sqlalchemy import and_
 from sqlalchemy.orm import Session
+from datetime import date, datetime, timedelta
+from itertools import chain
+from zoneinfo import ZoneInfo
 
 from .. import database, oauth2, models
-from .. import fcm_manager
+from .. import broadcasts, fcm_manager, menu_items
 
 router = APIRouter(
     prefix='/reminders',
     tags=['Reminders']
 )
 
+IST = ZoneInfo('Asia/Kolkata')
+
 @router.get("/remind")
 def send_reminder(
     background_tasks: BackgroundTasks, 
@@ -18,8 +24,61 @@ def send_reminder(
     notification_title = "Reminder!"
     notification_body = "Please book your meal for tomorrow before going to bed."
     
+    # Asked for right now, so not held back by quiet hours
     background_tasks.add_task(
-        fcm_manager.send_notification_to_all, notification_title, notification_body
+        broadcasts.schedule, "reminder", notification_title, notification_body, urgent=True
     )
     
-    return {"message": "Reminder notifications are being sent in the background."}
\ No newline at end of file
+    return {"message": "Reminder notifications are being sent in the background."}
+
+def personal_reminders(db: Session, booking_date: date) -> list[fcm_manager.PersonalMessage]:
+    """
+    One message per user who gets notifications, telling them what they booked
+    for `booking_date` or that they have not booked yet. Every user and their
+    booking come from a single query.
+    """
+    rows = db.query(
+        models.User.push_token,
+        models.Booking.lunch_item_ids,
+        models.Booking.dinner_item_ids
+    ).outerjoin(
+        models.Booking,
+        and_(models.Booking.user_id == models.User.id, models.Booking.booking_date == booking_date)
+    ).filter(
+        *fcm_manager.active_token_filters()
+    ).all()
+
+    names = menu_items.names_for_ids(db, set(chain.from_iterable(
+        chain(row.lunch_item_ids or [], row.dinner_item_ids or []) for row in rows
+    )))
+    title = f"Your meals for {booking_date:%A}"
+    data = {"type": "meal_reminder", "booking_date": booking_date.isoformat()}
+
+    def line(meal: str, ids: list[int] | None) -> str:
+        if ids is None:
+            return f"You haven't booked {meal}."
+        return f"Your {meal}: {', '.join(menu_items.to_names(ids, names)) or 'no dishes picked'}."
+
+    return [
+        (row.push_token, title, f"{line('lunch', row.lunch_item_ids)} {line('dinner', row.dinner_item_ids)}", data)
+        for row in rows
+    ]
+
+async def _send_personal_reminders(messages: list[fcm_manager.PersonalMessage]):
+    # Runs after the response, when the request's session is already closed
+    with database.SessionLocal() as db:
+        await fcm_manager.send_personalized(messages, db)
+
+@router.get("/tomorrow")
+def send_personal_reminders(
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(oauth2.require_admin_role)
+):
+    """Tells every user what they booked for tomorrow, or which meal they still have to book."""
+    tomorrow = datetime.now(IST).date() + timedelta(days=1)
+    messages = personal_reminders(db, tomorrow)
+
+    background_tasks.add_task(_send_personal_reminders, messages)
+
+    return {"message": f"{len(messages)} personal reminders are being sent in the background."}
@@ -2,17 +2,18 @@ from fastapi import APIRouter, Depends, HTTPException, status, Response
 from sqlalchemy.orm import Session
 from typing import List
 
-from .. import schemas, oauth2, database, models
+from .. import schemas, oauth2, database, models, invalidation
+from ..responses import fast_json, rows_to_dicts
 
 router = APIRouter(prefix="/users", tags=["User Management"])
 
 #-----------------------------------Get All Users' Info--------------------------------------#
 @router.get("/", response_model=List[schemas.UserOut])
-def get_all_users(db: Session = Depends(database.get_db), current_user: models.User = Depends(oauth2.require_mess_committee_role)):
+def get_all_users(db: Session = Depends(database.get_read_db), current_user: models.User = Depends(oauth2.require_mess_committee_role)):
     
     users = db.query(models.User).order_by(models.User.id).all()
     
-    return users
+    return fast_json(rows_to_dicts(users, schemas.UserOut))
 
 #---------------------------------UPDATE ROLE-------------------------------#
 @router.patch("/{user_id}", response_model=schemas.UserOut)
@@ -29,6 +30,7 @@ def update_role(user_id: int, role_update: schemas.UserRoleUpdate, db: Session =
     try:
         # Assuming role_update.role is an Enum, we use .value to store the string
         user_to_update.role = role_update.role.value    # type: ignore
+        invalidation.publish(db, "users", user_id)
         db.commit()
         db.refresh(user_to_update)
     except Exception as e:
@@ -55,6 +57,9 @@ def delete_user(user_id: int, db: Session = Depends(database.get_db), current_us
 
     try:
         db.delete(user_to_delete)
+        invalidation.publish(db, "users", user_id)
+        # Their notices now have no posted_by_user_id
+        invalidation.publish(db, "notices")
         db.commit()
     except Exception as e:
         db.rollback()
@@ -74,6 +79,7 @@ def update_mess_status(user_id: int, status_update: schemas.UserMessStatusUpdate
 
     try:
         user_to_update.is_mess_active = status_update.is_mess_active    # type: ignore
+        invalidation.publish(db, "users", user_id)
         db.commit()
         db.refresh(user_to_update)
     except Exception as e:
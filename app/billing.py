@@ -0,0 +1,195 @@
+"""
+Monthly meal billing rollups.
+
+meal_billing_rollups keeps one row per (month, user) with lunch/dinner
+counts and per-item counts. refresh_rollups() folds in the days that
+closed since the last refresh (tracked in rollup_watermarks), reading
+only those days' bookings with a single aggregate. Past days cannot be
+booked or cancelled any more, so a closed day never has to be read twice.
+
+    python -m app.billing refresh
+    python -m app.billing rebuild 2026-09
+
+`rebuild` recomputes one month from scratch, for when bookings were
+corrected directly in the database.
+"""
+import argparse
+import logging
+import os
+from collections import Counter
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from . import models
+from .partitions import add_months
+
+logger = logging.getLogger(__name__)
+
+IST = ZoneInfo('Asia/Kolkata')
+ROLLUP_NAME = "meal_billing"
+
+# One pass over the bookings of the days being rolled up. The first grouping
+# set counts meals per user (one booking per user and day, so distinct dates
+# are meals), the second counts how often each item was picked.
+AGGREGATE_SQL = text("""
+    SELECT date_trunc('month', b.booking_date)::date AS billing_month,
+           b.user_id,
+           picked.meal,
+           picked.item_id,
+           CASE WHEN GROUPING(picked.item_id) = 1 THEN count(DISTINCT b.booking_date) ELSE count(*) END AS n
+    FROM meal_bookings b
+    CROSS JOIN LATERAL (
+        SELECT 'lunch' AS meal, unnest(b.lunch_item_ids) AS item_id
+        UNION ALL
+        SELECT 'dinner', unnest(b.dinner_item_ids)
+    ) AS picked
+    WHERE b.booking_date > :after AND b.booking_date <= :through
+    GROUP BY GROUPING SETS (
+        (1, b.user_id, picked.meal),
+        (1, b.user_id, picked.meal, picked.item_id)
+    )
+""")
+
+
+def closed_through(today: date | None = None) -> date:
+    """The last day whose bookings can no longer change."""
+    today = today or datetime.now(IST).date()
+    return today - timedelta(days=1)
+
+
+def _empty_rollup() -> dict:
+    return {"lunch_count": 0, "dinner_count": 0, "lunch_item_counts": Counter(), "dinner_item_counts": Counter()}
+
+
+def _aggregate(db: Session, after: date, through: date) -> dict[tuple[date, int], dict]:
+    """Returns {(billing_month, user_id): counts} for bookings in (after, through]."""
+    rollups: dict[tuple[date, int], dict] = {}
+    rows = db.execute(AGGREGATE_SQL, {"after": after, "through": through})
+    for billing_month, user_id, meal, item_id, n in rows:
+        rollup = rollups.setdefault((billing_month, user_id), _empty_rollup())
+        if item_id is None:
+            rollup[f"{meal}_count"] += n
+        else:
+            rollup[f"{meal}_item_counts"][str(item_id)] += n
+    return rollups
+
+
+def _merge_existing(db: Session, rollups: dict[tuple[date, int], dict]):
+    """Adds the counts already stored for the same (month, user) rows."""
+    months = {billing_month for billing_month, _ in rollups}
+    existing = db.query(models.MealBillingRollup).filter(models.MealBillingRollup.billing_month.in_(months)).all()
+    for row in existing:
+        rollup = rollups.get((row.billing_month, row.user_id))   # type: ignore
+        if rollup is None:
+            continue
+        rollup["lunch_count"] += row.lunch_count
+        rollup["dinner_count"] += row.dinner_count
+        rollup["lunch_item_counts"].update(row.lunch_item_counts)
+        rollup["dinner_item_counts"].update(row.dinner_item_counts)
+
+
+def _write(db: Session, rollups: dict[tuple[date, int], dict]):
+    if not rollups:
+        return
+    values = [
+        {"billing_month": billing_month, "user_id": user_id, **counts}
+        for (billing_month, user_id), counts in rollups.items()
+    ]
+    statement = insert(models.MealBillingRollup)
+    db.execute(statement.on_conflict_do_update(
+        index_elements=["billing_month", "user_id"],
+        set_={
+            "lunch_count": statement.excluded.lunch_count,
+            "dinner_count": statement.excluded.dinner_count,
+            "lunch_item_counts": statement.excluded.lunch_item_counts,
+            "dinner_item_counts": statement.excluded.dinner_item_counts,
+            "updated_at": text("now()"),
+        },
+    ), values)
+
+
+def refresh_rollups(db: Session, today: date | None = None) -> date | None:
+    """
+    Folds every closed day not yet rolled up into meal_billing_rollups and
+    returns the new watermark. The watermark row is locked for the duration,
+    so concurrent refreshes queue up instead of counting a day twice.
+    Does not commit; the caller's commit releases the lock.
+    """
+    through = closed_through(today)
+    db.execute(
+        insert(models.RollupWatermark).values(rollup_name=ROLLUP_NAME)
+        .on_conflict_do_nothing(index_elements=["rollup_name"])
+    )
+    watermark = db.query(models.RollupWatermark).filter(
+        models.RollupWatermark.rollup_name == ROLLUP_NAME
+    ).with_for_update().one()
+
+    after = watermark.rolled_up_through
+    if after is None:
+        first_booking = db.execute(text("SELECT min(booking_date) FROM meal_bookings")).scalar()
+        if first_booking is None or first_booking > through:
+            return None
+        after = first_booking - timedelta(days=1)
+    if after >= through:
+        return after    # type: ignore
+
+    rollups = _aggregate(db, after, through)   # type: ignore
+    _merge_existing(db, rollups)
+    _write(db, rollups)
+
+    watermark.rolled_up_through = through   # type: ignore
+    watermark.updated_at = datetime.now(IST)    # type: ignore
+    logger.info(f"Rolled up meal billing for {after + timedelta(days=1)} to {through} ({len(rollups)} rows)")
+    return through
+
+
+def rebuild_month(db: Session, month_start: date, today: date | None = None) -> int:
+    """
+    Recomputes one month from meal_bookings, up to the current watermark.
+    Returns the number of (month, user) rows written. Does not commit.
+    """
+    watermark = db.query(models.RollupWatermark).filter(
+        models.RollupWatermark.rollup_name == ROLLUP_NAME
+    ).with_for_update().first()
+    if watermark is None or watermark.rolled_up_through is None:
+        return 0
+
+    through = min(watermark.rolled_up_through, add_months(month_start, 1) - timedelta(days=1))    # type: ignore
+    db.query(models.MealBillingRollup).filter(
+        models.MealBillingRollup.billing_month == month_start
+    ).delete(synchronize_session=False)
+    rollups = _aggregate(db, month_start - timedelta(days=1), through)
+    _write(db, rollups)
+    logger.info(f"Rebuilt meal billing for {month_start:%Y-%m} ({len(rollups)} rows)")
+    return len(rollups)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("refresh", help="roll up the days closed since the last refresh")
+    rebuild = commands.add_parser("rebuild", help="recompute one month from meal_bookings")
+    rebuild.add_argument("month", type=lambda value: datetime.strptime(value, "%Y-%m").date(), help="YYYY-MM")
+
+    args = parser.parse_args()
+    if not args.database_url:
+        parser.error("--database-url or DATABASE_URL is required")
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    engine = create_engine(args.database_url)
+    with Session(engine) as db, db.begin():
+        if args.command == "refresh":
+            through = refresh_rollups(db)
+            print(f"Rolled up through {through or '-'}")
+        else:
+            written = rebuild_month(db, args.month)
+            print(f"Rebuilt {written} row(s) for {args.month:%Y-%m}")
+
+
+if __name__ == "__main__":
+    main()
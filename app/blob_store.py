@@ -0,0 +1,112 @@
+"""
+Where uploaded files (issue ticket photos and their thumbnails) are kept.
+
+Routes only talk to the BlobStore interface returned by get_blob_store().
+BLOB_STORE picks the backend; "local" (the default) writes under
+BLOB_STORE_DIR and serves the files from BLOB_BASE_URL (see main.py).
+Another backend, e.g. an object store, is added by subclassing BlobStore
+and listing it in BACKENDS.
+"""
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from typing import BinaryIO
+
+BLOB_STORE = os.getenv("BLOB_STORE", "local")
+BLOB_STORE_DIR = os.getenv("BLOB_STORE_DIR", "uploads")
+BLOB_BASE_URL = os.getenv("BLOB_BASE_URL", "/uploads").rstrip("/")
+# Uploads are copied in pieces of this size, so a large photo is never held in memory
+CHUNK_SIZE = 64 * 1024
+
+
+class BlobTooLarge(Exception):
+    pass
+
+
+class BlobStore(ABC):
+    @abstractmethod
+    def save(self, key: str, source: BinaryIO, max_bytes: int | None = None) -> int:
+        """
+        Copies `source` to `key` in CHUNK_SIZE pieces and returns the size.
+        Raises BlobTooLarge, and keeps nothing, if it is over max_bytes.
+        """
+
+    @abstractmethod
+    def open(self, key: str) -> BinaryIO:
+        """A file-like object to read the blob from; close it when done."""
+
+    @abstractmethod
+    def delete(self, key: str):
+        """Deleting a missing key is not an error."""
+
+    @abstractmethod
+    def url(self, key: str) -> str:
+        """Where clients fetch the blob from."""
+
+    @abstractmethod
+    def key_for_url(self, url: str) -> str | None:
+        """The key behind a URL returned by url(), or None if this store did not make it."""
+
+
+class LocalBlobStore(BlobStore):
+    def __init__(self, root: str, base_url: str):
+        self.root = os.path.abspath(root)
+        self.base_url = base_url
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Invalid blob key: {key}")
+        return path
+
+    def save(self, key: str, source: BinaryIO, max_bytes: int | None = None) -> int:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Written next to the target and renamed at the end, so a reader never sees half a file
+        fd, partial = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".upload-")
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as out:
+                while chunk := source.read(CHUNK_SIZE):
+                    size += len(chunk)
+                    if max_bytes is not None and size > max_bytes:
+                        raise BlobTooLarge(f"Upload is larger than {max_bytes} bytes")
+                    out.write(chunk)
+            os.replace(partial, path)
+        except BaseException:
+            os.unlink(partial)
+            raise
+        return size
+
+    def open(self, key: str) -> BinaryIO:
+        return open(self._path(key), "rb")
+
+    def delete(self, key: str):
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def url(self, key: str) -> str:
+        return f"{self.base_url}/{key}"
+
+    def key_for_url(self, url: str) -> str | None:
+        prefix = self.base_url + "/"
+        return url[len(prefix):] if url.startswith(prefix) else None
+
+
+BACKENDS = {
+    "local": lambda: LocalBlobStore(BLOB_STORE_DIR, BLOB_BASE_URL),
+}
+
+_store: BlobStore | None = None
+
+
+def get_blob_store() -> BlobStore:
+    global _store
+    if _store is None:
+        if BLOB_STORE not in BACKENDS:
+            raise RuntimeError(f"Unknown BLOB_STORE '{BLOB_STORE}', expected one of {sorted(BACKENDS)}")
+        _store = BACKENDS[BLOB_STORE]()
+    return _store
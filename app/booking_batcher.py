@@ -0,0 +1,202 @@
+"""
+Group commit for POST /bookings/ (opt-in).
+
+In the minutes before a cutoff hundreds of students upsert their booking at
+once, and each request would run its own transaction and wait for its own
+commit to reach the disk. With BOOKING_BATCH_WINDOW_MS set, a request hands
+its upsert to the worker's batcher instead. A batch is opened by the first
+upsert and stays open for that many milliseconds (or until it holds
+BOOKING_BATCH_MAX_ROWS). It is then written with one multi-row
+INSERT ... ON CONFLICT DO UPDATE in one transaction, and every waiting
+request gets its own row back.
+
+If the batch statement fails, its upserts are retried one by one, each in a
+savepoint of the same transaction, so one bad row only fails its own request.
+When one student's booking is sent twice in the same batch, the later
+request wins, as if they had been written one after the other.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from datetime import date
+from typing import Any, Callable, NamedTuple
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from .models import Booking
+
+logger = logging.getLogger(__name__)
+
+# 0 (the default) writes every booking in its own transaction, as before
+BOOKING_BATCH_WINDOW_MS = float(os.getenv("BOOKING_BATCH_WINDOW_MS", "0"))
+BOOKING_BATCH_MAX_ROWS = int(os.getenv("BOOKING_BATCH_MAX_ROWS", "500"))
+# How long a request waits for its batch before giving up (the booking may still be written)
+BOOKING_BATCH_TIMEOUT_SECONDS = float(os.getenv("BOOKING_BATCH_TIMEOUT_SECONDS", "10"))
+
+_STOP = object()
+
+
+class Upsert(NamedTuple):
+    user_id: int
+    booking_date: date
+    lunch_item_ids: list[int] | None
+    dinner_item_ids: list[int] | None
+
+
+class Written(NamedTuple):
+    """The booking as stored, and its picks before this upsert (None if it is new)."""
+    booking: Any
+    old_lunch: list[int] | None
+    old_dinner: list[int] | None
+
+
+class BookingBatcher:
+    """Collects upserts from request threads and writes them from a thread of its own."""
+    def __init__(self, open_session: Callable[[], Session], window_seconds: float, max_rows: int = BOOKING_BATCH_MAX_ROWS):
+        self.open_session = open_session
+        self.window_seconds = window_seconds
+        self.max_rows = max_rows
+        self.pending: queue.Queue = queue.Queue()
+        # Transactions committed, for the benchmark and the tests
+        self.commits = 0
+        self.thread = threading.Thread(target=self._run, name="booking-batcher", daemon=True)
+        self.thread.start()
+
+    def upsert(self, upsert: Upsert) -> Written:
+        """Blocks until the batch holding `upsert` is committed; raises its error otherwise."""
+        future: Future = Future()
+        self.pending.put((upsert, future))
+        return future.result(timeout=BOOKING_BATCH_TIMEOUT_SECONDS)
+
+    def close(self):
+        """Writes what is still queued and stops the thread."""
+        self.pending.put(_STOP)
+        self.thread.join()
+
+    def _run(self):
+        while True:
+            item = self.pending.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            closes_at = time.monotonic() + self.window_seconds
+            while len(batch) < self.max_rows:
+                try:
+                    item = self.pending.get(timeout=max(0.0, closes_at - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    self._flush_or_fail(batch)
+                    return
+                batch.append(item)
+            self._flush_or_fail(batch)
+
+    def _flush_or_fail(self, batch: list[tuple[Upsert, Future]]):
+        # The thread has to outlive a failed batch: while enabled() is True, every booking comes here
+        try:
+            self._flush(batch)
+        except Exception as e:
+            logger.exception(f"Batch of {len(batch)} booking upserts could not be written")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+    def _flush(self, batch: list[tuple[Upsert, Future]]):
+        upserts = [upsert for upsert, _ in batch]
+        db = None
+        try:
+            db = self.open_session()
+            try:
+                results = _write(db, upserts)
+            except Exception as e:
+                logger.warning(f"Batch of {len(batch)} booking upserts failed, retrying them one by one: {e}")
+                db.rollback()
+                results = [_write_alone(db, upsert) for upsert in upserts]
+            db.commit()
+            self.commits += 1
+        except Exception as e:
+            results = [e] * len(batch)
+            if db is not None:
+                db.rollback()
+        finally:
+            if db is not None:
+                db.close()
+
+        for (_, future), result in zip(batch, results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+def _write(db: Session, upserts: list[Upsert]) -> list[Written]:
+    keys = list(dict.fromkeys((upsert.user_id, upsert.booking_date) for upsert in upserts))
+
+    # The rows are locked so that the old picks stay right for the live meal feed
+    current = {
+        (row.user_id, row.booking_date): (row.lunch_item_ids, row.dinner_item_ids)
+        for row in db.execute(
+            select(Booking.user_id, Booking.booking_date, Booking.lunch_item_ids, Booking.dinner_item_ids)
+            .where(tuple_(Booking.user_id, Booking.booking_date).in_(keys))
+            .with_for_update()
+        )
+    }
+    # A second upsert of the same booking sees the first as its old picks
+    old = []
+    latest = {}
+    for upsert in upserts:
+        key = (upsert.user_id, upsert.booking_date)
+        old.append(current.get(key, (None, None)))
+        current[key] = (upsert.lunch_item_ids, upsert.dinner_item_ids)
+        latest[key] = upsert
+
+    stmt = insert(Booking).values([upsert._asdict() for upsert in latest.values()])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Booking.user_id, Booking.booking_date],
+        set_={"lunch_item_ids": stmt.excluded.lunch_item_ids, "dinner_item_ids": stmt.excluded.dinner_item_ids},
+    ).returning(*Booking.__table__.c)
+    rows = {(row.user_id, row.booking_date): row for row in db.execute(stmt)}
+
+    return [
+        Written(rows[(upsert.user_id, upsert.booking_date)], old_lunch, old_dinner)
+        for upsert, (old_lunch, old_dinner) in zip(upserts, old)
+    ]
+
+
+def _write_alone(db: Session, upsert: Upsert) -> Written | Exception:
+    try:
+        with db.begin_nested():
+            return _write(db, [upsert])[0]
+    except Exception as e:
+        return e
+
+
+_batcher: BookingBatcher | None = None
+
+
+def enabled() -> bool:
+    return _batcher is not None
+
+
+def start(open_session: Callable[[], Session]):
+    """Called from the app's lifespan; does nothing unless BOOKING_BATCH_WINDOW_MS is set."""
+    global _batcher
+    if BOOKING_BATCH_WINDOW_MS > 0 and _batcher is None:
+        _batcher = BookingBatcher(open_session, BOOKING_BATCH_WINDOW_MS / 1000)
+
+
+def stop():
+    global _batcher
+    if _batcher is not None:
+        _batcher.close()
+        _batcher = None
+
+
+def upsert(user_id: int, booking_date: date, lunch_item_ids: list[int] | None, dinner_item_ids: list[int] | None) -> Written:
+    assert _batcher is not None, "booking_batcher.start() was not called"
+    return _batcher.upsert(Upsert(user_id, booking_date, lunch_item_ids, dinner_item_ids))
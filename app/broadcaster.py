@@ -0,0 +1,73 @@
+import asyncio
+import threading
+from typing import Any
+
+# Returned by Subscription.get() in place of the messages a subscriber missed because it fell behind
+RESYNC = object()
+
+
+class Subscription:
+    """One listener's queue. Created and read on the event loop."""
+    def __init__(self, max_queued: int):
+        self.loop = asyncio.get_running_loop()
+        self.max_queued = max_queued
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.resync_pending = False
+
+    def _deliver(self, message: Any):
+        if self.resync_pending:
+            return
+        if self.queue.qsize() >= self.max_queued:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.resync_pending = True
+            message = RESYNC
+        self.queue.put_nowait(message)
+
+    async def get(self) -> Any:
+        message = await self.queue.get()
+        if message is RESYNC:
+            self.resync_pending = False
+        return message
+
+
+class Broadcaster:
+    """
+    Fans messages out to every subscriber in this process.
+
+    publish() may be called from any thread (sync route handlers run in the
+    thread pool) and hands each message to the subscriber's event loop with
+    call_soon_threadsafe. A subscriber that has `max_queued` messages
+    waiting has them replaced by a single RESYNC, and gets nothing more
+    until it has read it, so one slow client cannot hold memory or slow
+    down the others.
+    """
+    def __init__(self, max_queued: int = 100):
+        self.max_queued = max_queued
+        self._subscriptions: set[Subscription] = set()
+        self._lock = threading.Lock()
+
+    @property
+    def has_subscribers(self) -> bool:
+        return bool(self._subscriptions)
+
+    def subscribe(self) -> Subscription:
+        """Must be called from the event loop that will read the subscription."""
+        subscription = Subscription(self.max_queued)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, message: Any):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription._deliver, message)
+            except RuntimeError:
+                # The loop has been closed; the subscriber is gone
+                self.unsubscribe(subscription)
@@ -0,0 +1,201 @@
+"""
+Coalescing of broadcast push notifications.
+
+Routers hand broadcasts to schedule() instead of calling
+fcm_manager.send_notification_to_all() straight away. Broadcasts of the
+same kind (e.g. "menu:2026-10-20", or "notice:42") that come in less than
+BROADCAST_WINDOW_SECONDS apart are merged into one send with the latest
+title and body: a convenor fixing a typo three times sends one
+notification, and the token table is read once. A burst of edits is
+sent at most BROADCAST_MAX_DELAY_SECONDS after its first broadcast.
+
+During QUIET_HOURS (IST, e.g. "22:00-07:00"; unset means none) broadcasts
+that are not urgent wait until the quiet hours are over.
+
+Pending broadcasts are kept in the worker that received them. On
+shutdown they are sent right away, except those waiting for the end of
+quiet hours: these are stored in deferred_broadcasts and scheduled again
+by resume() when a worker next starts.
+"""
+import asyncio
+import logging
+import os
+from contextlib import suppress
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import delete
+from sqlalchemy.dialects.postgresql import insert
+from starlette.concurrency import run_in_threadpool
+
+from . import database, fcm_manager, models
+from .metrics import BROADCASTS_DEFERRED, BROADCASTS_MERGED
+
+logger = logging.getLogger(__name__)
+
+IST = ZoneInfo('Asia/Kolkata')
+
+BROADCAST_WINDOW_SECONDS = float(os.getenv("BROADCAST_WINDOW_SECONDS", "60"))
+BROADCAST_MAX_DELAY_SECONDS = float(os.getenv("BROADCAST_MAX_DELAY_SECONDS", "300"))
+
+
+class _Pending:
+    """The latest content of a broadcast waiting to be sent; times are event loop times."""
+    def __init__(self, title: str, body: str, urgent: bool, now: float):
+        self.title = title
+        self.body = body
+        self.urgent = urgent
+        self.first = self.last = now
+        self.task: asyncio.Task | None = None
+        # Set when an urgent broadcast merges in, to end a wait for quiet hours
+        self.became_urgent = asyncio.Event()
+        if urgent:
+            self.became_urgent.set()
+
+    def due(self) -> float:
+        return min(self.last + BROADCAST_WINDOW_SECONDS, self.first + BROADCAST_MAX_DELAY_SECONDS)
+
+
+# kind -> the broadcast of that kind waiting to be sent
+_pending: dict[str, _Pending] = {}
+
+
+def parse_quiet_hours(spec: str) -> tuple[time, time] | None:
+    """"22:00-07:00" -> (22:00, 07:00); an empty spec means no quiet hours."""
+    if not spec.strip():
+        return None
+    try:
+        start, end = (time.fromisoformat(part.strip()) for part in spec.split("-"))
+    except ValueError:
+        raise ValueError(f"QUIET_HOURS must look like 22:00-07:00, got {spec!r}") from None
+    return start, end
+
+
+# Parsed once, so a malformed value stops the app from starting instead of every send
+QUIET_HOURS = parse_quiet_hours(os.getenv("QUIET_HOURS", ""))
+
+
+def quiet_hours_end(now: datetime, spec: str | None = None) -> datetime | None:
+    """When the quiet hours `now` falls in end, or None if it is not in quiet hours."""
+    quiet_hours = QUIET_HOURS if spec is None else parse_quiet_hours(spec)
+    if quiet_hours is None:
+        return None
+    start, end = quiet_hours
+    current = now.time()
+    # A range like 22:00-07:00 wraps around midnight
+    in_quiet_hours = start <= current < end if start <= end else current >= start or current < end
+    if not in_quiet_hours:
+        return None
+    ends = now.replace(hour=end.hour, minute=end.minute, second=0, microsecond=0)
+    return ends if ends > now else ends + timedelta(days=1)
+
+
+async def schedule(kind: str, title: str, body: str, urgent: bool = False):
+    """
+    Queues a broadcast to every user, merged with any other of the same
+    `kind` still waiting. Urgent broadcasts are not held back by quiet hours.
+    Pass it to BackgroundTasks.add_task so it runs on the event loop.
+    """
+    now = asyncio.get_running_loop().time()
+    pending = _pending.get(kind)
+    if pending is not None:
+        BROADCASTS_MERGED.inc()
+        pending.title, pending.body, pending.last = title, body, now
+        if urgent:
+            pending.urgent = True
+            pending.became_urgent.set()
+        return
+
+    pending = _pending[kind] = _Pending(title, body, urgent, now)
+    pending.task = asyncio.create_task(_send_when_due(kind, pending))
+
+
+async def _send_when_due(kind: str, pending: _Pending):
+    loop = asyncio.get_running_loop()
+    try:
+        # Every merged broadcast pushes the send back, up to BROADCAST_MAX_DELAY_SECONDS
+        while (delay := pending.due() - loop.time()) > 0:
+            await asyncio.sleep(delay)
+
+        quiet_until = None if pending.urgent else quiet_hours_end(datetime.now(IST))
+        if quiet_until is not None:
+            BROADCASTS_DEFERRED.inc()
+            logger.info(f"Broadcast {kind!r} held back until {quiet_until:%H:%M} (quiet hours)")
+            # Edits made meanwhile still replace the content; an urgent one sends it right away
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(pending.became_urgent.wait(), (quiet_until - datetime.now(IST)).total_seconds())
+    except Exception:
+        logger.exception(f"Broadcast {kind!r} could not be scheduled")
+        return
+    finally:
+        # Broadcasts from here on start a new burst, also when this one failed or was flushed
+        if _pending.get(kind) is pending:
+            del _pending[kind]
+    await _send(pending.title, pending.body)
+
+
+async def _send(title: str, body: str):
+    try:
+        with database.SessionLocal() as db:
+            await fcm_manager.send_notification_to_all(db, title, body)
+    except Exception:
+        logger.exception(f"Broadcast {title!r} failed")
+
+
+async def flush():
+    """Sends what is still pending, from the app's lifespan on shutdown."""
+    in_quiet_hours = quiet_hours_end(datetime.now(IST)) is not None
+    held = []
+    for kind, pending in list(_pending.items()):
+        del _pending[kind]
+        if pending.task is not None:
+            pending.task.cancel()
+            with suppress(asyncio.CancelledError):
+                await pending.task
+        if in_quiet_hours and not pending.urgent:
+            held.append((kind, pending.title, pending.body))
+        else:
+            await _send(pending.title, pending.body)
+    if not held:
+        return
+    try:
+        await run_in_threadpool(_store_deferred, held)
+        logger.info(f"Stored {len(held)} broadcasts held for quiet hours until the next start")
+    except Exception:
+        # Better a notification during quiet hours than none at all
+        logger.exception("Could not store the broadcasts held for quiet hours; sending them now")
+        for _, title, body in held:
+            await _send(title, body)
+
+
+def _store_deferred(held: list[tuple[str, str, str]]):
+    with database.SessionLocal() as db:
+        stmt = insert(models.DeferredBroadcast).values([{"kind": k, "title": t, "body": b} for k, t, b in held])
+        # Another worker may have stored an older version of the same broadcast
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[models.DeferredBroadcast.kind],
+            set_={"title": stmt.excluded.title, "body": stmt.excluded.body},
+        ))
+        db.commit()
+
+
+def _claim_deferred() -> list[tuple[str, str, str]]:
+    # DELETE ... RETURNING, so each stored broadcast is taken by one worker only
+    with database.SessionLocal() as db:
+        rows = db.execute(delete(models.DeferredBroadcast).returning(
+            models.DeferredBroadcast.kind, models.DeferredBroadcast.title, models.DeferredBroadcast.body
+        )).all()
+        db.commit()
+    return [tuple(row) for row in rows]
+
+
+async def resume():
+    """Schedules the broadcasts a stopped worker held for quiet hours, from the app's lifespan on start."""
+    try:
+        held = await run_in_threadpool(_claim_deferred)
+    except Exception:
+        # They stay stored for the next worker that starts
+        logger.exception("Could not load the broadcasts held for quiet hours")
+        return
+    for kind, title, body in held:
+        await schedule(kind, title, body)
@@ -0,0 +1,64 @@
+import threading
+import time
+from typing import Any, Hashable
+
+
+class TTLCache:
+    """
+    A small thread-safe dict whose entries expire ttl_seconds after they
+    were stored. When it holds max_entries, expired entries are dropped
+    first and then the oldest ones.
+    The cache is per process, so each worker has its own copy.
+
+    Caches registered with app.invalidation start out degraded: entries live
+    for fallback_ttl_seconds only, until the invalidation listener is
+    connected and can evict them when another worker writes.
+    """
+    def __init__(self, ttl_seconds: float, max_entries: int = 1024, fallback_ttl_seconds: float | None = None):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.fallback_ttl_seconds = ttl_seconds if fallback_ttl_seconds is None else min(fallback_ttl_seconds, ttl_seconds)
+        self.degraded = fallback_ttl_seconds is not None
+        self._entries: dict[Hashable, tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires <= time.monotonic():
+            self.delete(key)
+            return None
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        now = time.monotonic()
+        ttl = self.fallback_ttl_seconds if self.degraded else self.ttl_seconds
+        with self._lock:
+            self._entries.pop(key, None)
+            if len(self._entries) >= self.max_entries:
+                for stale in [k for k, (expires, _) in self._entries.items() if expires <= now]:
+                    del self._entries[stale]
+                while len(self._entries) >= self.max_entries:
+                    del self._entries[next(iter(self._entries))]
+            self._entries[key] = (now + ttl, value)
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def set_degraded(self, degraded: bool):
+        """
+        Switches between the normal and the fallback TTL. Entries stored with
+        the normal TTL are dropped on the way into degraded mode; entries
+        stored while degraded already expire soon and are kept.
+        """
+        with self._lock:
+            if degraded and not self.degraded:
+                self._entries.clear()
+            self.degraded = degraded
@@ -0,0 +1,102 @@
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.middleware.gzip import GZipResponder, IdentityResponder
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Brotli is optional. Without it we still negotiate gzip.
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+
+# Content codings this middleware applies, see _tag_encoded_body()
+ENCODED_ETAG_CODINGS = ("br", "gzip")
+
+
+def _tag_encoded_body(send: Send) -> Send:
+    """
+    A strong ETag names one exact body, so a compressed body gets its own
+    tag, e.g. "abc" becomes "abc-gzip" (as Apache does). Weak tags are left alone.
+    """
+    async def send_with_tag(message: Message) -> None:
+        if message["type"] == "http.response.start":
+            headers = MutableHeaders(raw=message["headers"])
+            encoding, etag = headers.get("content-encoding"), headers.get("etag")
+            if encoding in ENCODED_ETAG_CODINGS and etag and not etag.startswith("W/"):
+                headers["etag"] = f'{etag[:-1]}-{encoding}"'
+        await send(message)
+    return send_with_tag
+
+
+def _accepted_codings(accept_encoding: str) -> set[str]:
+    """
+    The codings an Accept-Encoding header allows. "gzip;q=0" forbids gzip
+    (RFC 9110, 12.5.3), and "*" stands for every coding not listed.
+    """
+    weights = {}
+    for part in accept_encoding.split(","):
+        coding, *params = (piece.strip() for piece in part.split(";"))
+        if not coding:
+            continue
+        weight = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding.lower()] = weight
+    wildcard = weights.pop("*", 0.0)
+    accepted = {coding for coding, weight in weights.items() if weight > 0}
+    if wildcard > 0:
+        accepted.update(coding for coding in ENCODED_ETAG_CODINGS if coding not in weights)
+    return accepted
+
+
+class BrotliResponder(IdentityResponder):
+    content_encoding = "br"
+
+    def __init__(self, app: ASGIApp, minimum_size: int, quality: int = 4) -> None:
+        super().__init__(app, minimum_size)
+        self.compressor = brotli.Compressor(quality=quality)  # type: ignore
+
+    def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        data = self.compressor.process(body)
+        if more_body:
+            return data + self.compressor.flush()
+        return data + self.compressor.finish()
+
+
+class CompressionMiddleware:
+    """
+    Compresses responses larger than `minimum_size` bytes.
+    Prefers brotli when the client accepts it (and the package is installed),
+    then gzip, otherwise the body is sent as-is.
+    Paths starting with one of `excluded_prefixes` (e.g. already compressed
+    photos) are never compressed.
+    """
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4,
+                 excluded_prefixes: tuple[str, ...] = ()) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.excluded_prefixes = excluded_prefixes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or (self.excluded_prefixes and scope["path"].startswith(self.excluded_prefixes)):
+            await self.app(scope, receive, send)
+            return
+
+        accepted = _accepted_codings(Headers(scope=scope).get("Accept-Encoding", ""))
+
+        responder: ASGIApp
+        if brotli is not None and "br" in accepted:
+            responder = BrotliResponder(self.app, self.minimum_size, quality=self.brotli_quality)
+        elif "gzip" in accepted:
+            responder = GZipResponder(self.app, self.minimum_size, compresslevel=self.gzip_level)
+        else:
+            responder = IdentityResponder(self.app, self.minimum_size)
+
+        await responder(scope, receive, _tag_encoded_body(send))
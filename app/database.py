@@ -1,17 +1,93 @@
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+import time
+from typing import Callable
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from sqlalchemy.pool import QueuePool
+from fastapi import Depends, Request
 from dotenv import load_dotenv
 
+from .metrics import DB_POOL_CHECKOUT_WAIT, DB_READS
+from .query_stats import record_query
+from .read_routing import wrote_recently, writer_key
+
 load_dotenv()
 
 
-SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL")
-if SQLALCHEMY_DATABASE_URL is None:
-    raise ValueError("DATABASE_URL environment variable is not set")
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a free connection."""
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - start)
+
+
+# Per-request SQL instrumentation (see app/query_stats.py). The start time is
+# kept on the statement's execution context, which is discarded with the
+# statement whether it succeeds or raises.
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    context.query_start_time = time.perf_counter()
+
+
+def _record_query_time(conn, cursor, statement, parameters, context, executemany):
+    record_query(statement, parameters, time.perf_counter() - context.query_start_time)
+
+
+def _record_failed_query_time(exception_context):
+    # after_cursor_execute is skipped when a statement raises (errors, statement_timeout, cancels)
+    start = getattr(exception_context.execution_context, "query_start_time", None)
+    if start is not None:
+        record_query(exception_context.statement, exception_context.parameters, time.perf_counter() - start, failed=True)
+
+
+def _create_engine(url: str):
+    new_engine = create_engine(url, poolclass=TimedQueuePool)
+    event.listen(new_engine, "before_cursor_execute", _start_query_timer)
+    event.listen(new_engine, "after_cursor_execute", _record_query_time)
+    event.listen(new_engine, "handle_error", _record_failed_query_time)
+    return new_engine
+
+
+# Engines are created by init_engines() from the app's lifespan, i.e. in each
+# worker process after any fork, never at import time. Connection pools must
+# not be shared across a fork.
+engine = None
+replica_engine = None
+
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+ReplicaSessionLocal = None
+
+
+def init_engines():
+    """Creates the primary (and optional replica) engine and binds the session factories."""
+    global engine, replica_engine, ReplicaSessionLocal
+    if engine is not None:
+        return
+
+    database_url = os.getenv("DATABASE_URL")
+    if database_url is None:
+        raise ValueError("DATABASE_URL environment variable is not set")
+    # Optional streaming replica. GET routes that use get_read_db read from it.
+    replica_url = os.getenv("REPLICA_DATABASE_URL")
+
+    engine = _create_engine(database_url)
+    SessionLocal.configure(bind=engine)
+    if replica_url:
+        replica_engine = _create_engine(replica_url)
+        ReplicaSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=replica_engine)
+
+
+def dispose_engines():
+    """Closes every pooled connection. Called when the worker shuts down."""
+    global engine, replica_engine, ReplicaSessionLocal
+    for current in (engine, replica_engine):
+        if current is not None:
+            current.dispose()
+    engine = replica_engine = ReplicaSessionLocal = None
+    SessionLocal.configure(bind=None)
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
@@ -24,6 +100,40 @@ def get_db():
         db.close()
 
 
+def _read_sessionmaker(request: Request) -> tuple[str, sessionmaker]:
+    if ReplicaSessionLocal is None or wrote_recently(writer_key(request.headers.get("authorization"))):
+        return "primary", SessionLocal
+    return "replica", ReplicaSessionLocal
+
+
+# Dependency for read-only GET routes. Uses the replica when one is configured,
+# unless the caller wrote something in the last READ_YOUR_WRITES_SECONDS.
+# Reads on the primary share the request's get_db session instead of opening a second one.
+def get_read_db(request: Request, db: Session = Depends(get_db)):
+    target, session_factory = _read_sessionmaker(request)
+    DB_READS.labels(target).inc()
+    if target == "primary":
+        yield db
+        return
+    replica_db = session_factory()
+    try:
+        yield replica_db
+    finally:
+        replica_db.close()
+
+
+# Dependency for read-only routes that query from several threads at once.
+# Returns a function that opens a new read session (same routing as
+# get_read_db) on each call; the caller closes the sessions it opens.
+def get_read_sessions(request: Request) -> Callable[[], Session]:
+    target, session_factory = _read_sessionmaker(request)
+
+    def open_session() -> Session:
+        DB_READS.labels(target).inc()
+        return session_factory()
+    return open_session
+
+
 
 
 # import psycopg2
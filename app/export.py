@@ -0,0 +1,236 @@
+"""
+Bulk export of meal bookings for GET /meallist/export.
+
+Postgres formats the rows as CSV itself (COPY ... TO STDOUT) and the bytes
+are passed on to the response as they arrive, so no Python row objects are
+made and an export of any length holds only a few chunks in memory.
+Parquet is converted from the same CSV stream with pyarrow (optional), one
+row group of at most EXPORT_ROW_GROUP_ROWS rows at a time.
+
+COPY runs in a thread of its own and hands chunks to the response through
+a bounded queue: a slow client slows the query down instead of filling
+memory, and a client that goes away stops it.
+"""
+import io
+import logging
+import os
+import queue
+import threading
+from datetime import date
+from functools import partial
+from importlib.util import find_spec
+from typing import BinaryIO, Callable, Iterator
+
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+EXPORT_MAX_DAYS = int(os.getenv("EXPORT_MAX_DAYS", "366"))
+EXPORT_ROW_GROUP_ROWS = int(os.getenv("EXPORT_ROW_GROUP_ROWS", "65536"))
+# For the export's own transaction only: lets Postgres hash the pick lists and
+# sort the rows in memory instead of on disk
+EXPORT_WORK_MEM = os.getenv("EXPORT_WORK_MEM", "64MB")
+CHUNK_SIZE = 64 * 1024
+# Chunks waiting for a slow client, per export
+QUEUE_CHUNKS = 16
+
+MEDIA_TYPES = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+
+# Dish names are filled in by SQL so rows never pass through Python. There
+# are only a few hundred distinct pick lists, so each is turned into names
+# once and hash-joined back. A meal that was not booked is NULL (an empty
+# field in CSV), one booked without dishes is "".
+EXPORT_SQL = """
+    COPY (
+        WITH picks AS (
+            SELECT ids, string_agg(m.name, ', ' ORDER BY p.n) AS names
+            FROM (
+                SELECT lunch_item_ids FROM meal_bookings WHERE booking_date BETWEEN %(start)s AND %(end)s
+                UNION
+                SELECT dinner_item_ids FROM meal_bookings WHERE booking_date BETWEEN %(start)s AND %(end)s
+            ) AS d(ids)
+            CROSS JOIN LATERAL unnest(d.ids) WITH ORDINALITY AS p(item_id, n)
+            JOIN menu_items m ON m.id = p.item_id
+            GROUP BY ids
+        )
+        SELECT b.booking_date, u.name AS student_name, u.room_number,
+               CASE WHEN b.lunch_item_ids IS NOT NULL THEN coalesce(lunch.names, '') END AS lunch_selection,
+               CASE WHEN b.dinner_item_ids IS NOT NULL THEN coalesce(dinner.names, '') END AS dinner_selection
+        FROM meal_bookings b
+        JOIN users u ON u.id = b.user_id
+        LEFT JOIN picks lunch ON lunch.ids = b.lunch_item_ids
+        LEFT JOIN picks dinner ON dinner.ids = b.dinner_item_ids
+        WHERE b.booking_date BETWEEN %(start)s AND %(end)s
+        ORDER BY b.booking_date, u.name
+    ) TO STDOUT WITH (FORMAT csv, HEADER true)
+"""
+
+_DONE = object()
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+def parquet_available() -> bool:
+    return find_spec("pyarrow") is not None
+
+
+class _QueueWriter(io.RawIOBase):
+    """A write-only file that puts every write on `chunks`."""
+    def __init__(self, chunks: queue.Queue, cancelled: threading.Event):
+        self.chunks = chunks
+        self.cancelled = cancelled
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        _put(self.chunks, self.cancelled, bytes(data))
+        return len(data)
+
+
+class _IteratorReader(io.RawIOBase):
+    """A read-only file over an iterator of bytes."""
+    def __init__(self, chunks: Iterator[bytes]):
+        self.chunks = chunks
+        self.pending = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self.pending:
+            self.pending = next(self.chunks, b"")
+            if not self.pending:
+                return 0
+        n = min(len(buffer), len(self.pending))
+        buffer[:n] = self.pending[:n]
+        self.pending = self.pending[n:]
+        return n
+
+
+def _put(chunks: queue.Queue, cancelled: threading.Event, item):
+    # Waits in short steps so that a client going away is noticed
+    while not cancelled.is_set():
+        try:
+            chunks.put(item, timeout=1)
+            return
+        except queue.Full:
+            continue
+    raise ExportCancelled()
+
+
+class _Stream:
+    """
+    Runs write(file) in a thread and iterates over what it writes, in chunks
+    of about CHUNK_SIZE. close() stops it and may be called from any thread.
+    """
+    def __init__(self, write: Callable[[BinaryIO], None]):
+        self.chunks: queue.Queue = queue.Queue(QUEUE_CHUNKS)
+        self.cancelled = threading.Event()
+        # _DONE or the exception that ended the stream; every later read ends the same way
+        self.end = None
+        threading.Thread(target=self._produce, args=(write,), name="meal-export", daemon=True).start()
+
+    def _produce(self, write: Callable[[BinaryIO], None]):
+        try:
+            with io.BufferedWriter(_QueueWriter(self.chunks, self.cancelled), CHUNK_SIZE) as sink:
+                write(sink)
+            _put(self.chunks, self.cancelled, _DONE)
+        except ExportCancelled:
+            pass
+        except BaseException as e:
+            try:
+                _put(self.chunks, self.cancelled, e)
+            except ExportCancelled:
+                pass
+
+    def __iter__(self) -> "_Stream":
+        return self
+
+    def __next__(self) -> bytes:
+        while self.end is None and not self.cancelled.is_set():
+            try:
+                item = self.chunks.get(timeout=1)
+            except queue.Empty:
+                continue
+            if item is _DONE or isinstance(item, BaseException):
+                self.end = item
+            else:
+                return item
+        if self.end is _DONE:
+            raise StopIteration
+        raise self.end or ExportCancelled()
+
+    def close(self):
+        self.cancelled.set()
+
+
+def _copy(open_session: Callable[[], Session], start: date, end: date, sink: BinaryIO):
+    db = open_session()
+    try:
+        cursor = db.connection().connection.cursor()
+        cursor.execute("SELECT set_config('work_mem', %s, true)", (EXPORT_WORK_MEM,))
+        cursor.copy_expert(cursor.mogrify(EXPORT_SQL, {"start": start, "end": end}).decode(), sink)
+    except BaseException:
+        # An interrupted COPY leaves the connection in the middle of the protocol
+        db.connection().invalidate()
+        raise
+    finally:
+        db.close()
+
+
+def csv_chunks(open_session: Callable[[], Session], start: date, end: date) -> _Stream:
+    return _Stream(partial(_copy, open_session, start, end))
+
+
+def _csv_to_parquet(open_session: Callable[[], Session], start: date, end: date, sink: BinaryIO):
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("booking_date", pa.date32()), ("student_name", pa.string()), ("room_number", pa.int32()),
+        ("lunch_selection", pa.string()), ("dinner_selection", pa.string()),
+    ])
+    chunks = csv_chunks(open_session, start, end)
+    try:
+        reader = pa_csv.open_csv(
+            io.BufferedReader(_IteratorReader(chunks), CHUNK_SIZE),
+            read_options=pa_csv.ReadOptions(column_names=schema.names, skip_rows=1),
+            convert_options=pa_csv.ConvertOptions(
+                column_types=schema, strings_can_be_null=True, quoted_strings_can_be_null=False,
+            ),
+        )
+        writer = pq.ParquetWriter(sink, schema)
+        batches, rows = [], 0
+        for batch in reader:
+            batches.append(batch)
+            rows += batch.num_rows
+            while rows >= EXPORT_ROW_GROUP_ROWS:
+                table = pa.Table.from_batches(batches, schema)
+                writer.write_table(table.slice(0, EXPORT_ROW_GROUP_ROWS), row_group_size=EXPORT_ROW_GROUP_ROWS)
+                rest = table.slice(EXPORT_ROW_GROUP_ROWS)
+                batches, rows = rest.to_batches(), rest.num_rows
+        if rows:
+            writer.write_table(pa.Table.from_batches(batches, schema), row_group_size=EXPORT_ROW_GROUP_ROWS)
+        # Only closed (which writes the footer) on success, so a failed export is never a valid file
+        writer.close()
+    finally:
+        chunks.close()
+
+
+def parquet_chunks(open_session: Callable[[], Session], start: date, end: date) -> _Stream:
+    return _Stream(partial(_csv_to_parquet, open_session, start, end))
+
+
+def export_chunks(open_session: Callable[[], Session], start: date, end: date, format: str) -> Iterator[bytes]:
+    chunks = parquet_chunks if format == "parquet" else csv_chunks
+    try:
+        # When the client goes away this generator is closed, and yield from closes the stream
+        yield from chunks(open_session, start, end)
+    except Exception:
+        # The response has already started, so the client only sees it cut short
+        logger.exception("Export of meal bookings %s..%s as %s failed", start, end, format)
+        raise
@@ -1,42 +1,94 @@
+import asyncio
 import logging
 import os
+import threading
+import time
+from functools import partial
+from typing import Callable
 
-import firebase_admin
-from firebase_admin import credentials, messaging
 from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 
+from . import invalidation
 from .models import User
+from .metrics import FCM_BATCH_LATENCY, FCM_FAILURES
 
 logger = logging.getLogger(__name__)
 
+# The most messages or tokens one send_each call accepts
+FCM_BATCH_SIZE = 500
+# send_each batches of personalized messages in flight at once
+FCM_CONCURRENT_BATCHES = int(os.getenv("FCM_CONCURRENT_BATCHES", "4"))
+
+# (token, title, body, data) of one personalized message; FCM data values must be strings
+PersonalMessage = tuple[str, str, str, dict[str, str] | None]
+
 # --- FCM Initialization ---
 cred_path = "/etc/secrets/firebase-credentials.json"
+_firebase_app = None
 _firebase_ready = False
+_init_attempted = False
+_init_lock = threading.Lock()
 
-if os.path.exists(cred_path):
-    try:
-        cred = credentials.Certificate(cred_path)
-        firebase_admin.initialize_app(cred)
-        _firebase_ready = True
-        logger.info("Firebase Admin SDK initialized successfully.")
-    except Exception as e:
-        logger.error(f"FATAL: Firebase Admin SDK failed to initialize: {e}")
-else:
-    logger.warning("Firebase credentials file not found. Push notifications disabled.")
 
-
-def get_all_user_tokens(db: Session) -> list[str]:
+def init_firebase() -> bool:
     """
-    Fetch all active user tokens using SQLAlchemy ORM.
-    Sync/blocking — always call via run_in_threadpool from async code.
+    Imports and initializes the Firebase Admin SDK on the first notification,
+    in the worker process that sends it. Importing firebase_admin and loading
+    the credentials is the slowest part of a cold start, and most requests
+    never notify anyone. Returns whether push notifications are available.
+    Blocking — call via run_in_threadpool from async code.
     """
-    results = db.query(User.push_token).filter(
+    global _firebase_app, _firebase_ready, _init_attempted
+    with _init_lock:
+        if _init_attempted:
+            return _firebase_ready
+        _init_attempted = True
+
+        if not os.path.exists(cred_path):
+            logger.warning("Firebase credentials file not found. Push notifications disabled.")
+            return False
+
+        try:
+            import firebase_admin
+            from firebase_admin import credentials
+            cred = credentials.Certificate(cred_path)
+            _firebase_app = firebase_admin.initialize_app(cred)
+            _firebase_ready = True
+            logger.info("Firebase Admin SDK initialized successfully.")
+        except Exception as e:
+            logger.error(f"FATAL: Firebase Admin SDK failed to initialize: {e}")
+        return _firebase_ready
+
+
+def shutdown_firebase():
+    """Called from the app's lifespan on shutdown."""
+    global _firebase_app, _firebase_ready, _init_attempted
+    with _init_lock:
+        if _firebase_app is not None:
+            import firebase_admin
+            firebase_admin.delete_app(_firebase_app)
+        _firebase_app = None
+        _firebase_ready = False
+        _init_attempted = False
+
+
+def active_token_filters() -> tuple:
+    """Users who should get notifications: active, eating at the mess, with a token."""
+    return (
         User.push_token.isnot(None),
         User.push_token != '',
         User.is_active == True,
         User.is_mess_active == True
-    ).all()
+    )
+
+
+def get_all_user_tokens(db: Session) -> list[str]:
+    """
+    Fetch all active user tokens using SQLAlchemy ORM.
+    Sync/blocking — always call via run_in_threadpool from async code.
+    """
+    results = db.query(User.push_token).filter(*active_token_filters()).all()
 
     return [row[0] for row in results]
 
@@ -59,6 +111,9 @@ def deactivate_invalid_tokens(db: Session, invalid_tokens: list[str]) -> int:
     updated = db.query(User).filter(
         User.push_token.in_(invalid_tokens)
     ).update({User.push_token: None}, synchronize_session=False)
+    if updated:
+        # The user ids are not known here, so drop every cached user
+        invalidation.publish(db, "users")
     db.commit()
     return updated
 
@@ -69,7 +124,7 @@ async def send_notification_to_all(db: Session, title: str, body: str) -> dict:
     Used for general announcements (e.g., new notices, updated menus).
     Takes a DB session to query all active tokens.
     """
-    if not _firebase_ready:
+    if not await run_in_threadpool(init_firebase):
         logger.error("FCM Error: Firebase app not initialized.")
         return {"success": 0, "failure": 0, "invalid_tokens": []}
 
@@ -108,46 +163,110 @@ async def send_notification(tokens: list[str], title: str, body: str) -> dict:
             "invalid_tokens": list[str],  # tokens FCM reports as dead/unregistered
         }
     """
-    if not _firebase_ready:
+    if not await run_in_threadpool(init_firebase):
         logger.error("FCM Error: Firebase app not initialized.")
         return {"success": 0, "failure": len(tokens), "invalid_tokens": []}
+    from firebase_admin import messaging
 
     if not tokens:
         logger.info("No tokens provided for notification.")
         return {"success": 0, "failure": 0, "invalid_tokens": []}
 
-    MAX_TOKENS_PER_BATCH = 500
     success_count = 0
     failure_count = 0
     invalid_tokens: list[str] = []
 
-    def chunked(iterable, size):
-        for i in range(0, len(iterable), size):
-            yield iterable[i:i + size]
+    for chunk in _chunked(tokens, FCM_BATCH_SIZE):
+        multicast = messaging.MulticastMessage(
+            notification=messaging.Notification(title=title, body=body),
+            tokens=chunk
+        )
+        result = await _send_batch(partial(messaging.send_each_for_multicast, multicast), chunk)
+        success_count += result["success"]
+        failure_count += result["failure"]
+        invalid_tokens += result["invalid_tokens"]
+
+    logger.info(f"Successfully sent notification to {success_count} users. Failed: {failure_count}")
+    return {"success": success_count, "failure": failure_count, "invalid_tokens": invalid_tokens}
 
-    for chunk in chunked(tokens, MAX_TOKENS_PER_BATCH):
-        try:
-            multicast = messaging.MulticastMessage(
-                notification=messaging.Notification(title=title, body=body),
-                tokens=chunk
-            )
-            resp = await run_in_threadpool(messaging.send_each_for_multicast, multicast)
-            success_count += resp.success_count
-            failure_count += resp.failure_count
-
-            for token, single_resp in zip(chunk, resp.responses):
-                if not single_resp.success:
-                    exc = single_resp.exception
-                    logger.warning(f"FCM send failed for token {token}: {exc}")
-                    if isinstance(exc, messaging.UnregisteredError):
-                        invalid_tokens.append(token)
 
+# --- 3. Personalized Notifications (Own Title and Body per User) ---
+async def send_personalized(messages: list[PersonalMessage], db: Session | None = None) -> dict:
+    """
+    Used for per-user alerts (e.g., 'Your lunch tomorrow: Paneer, Rice').
+    The messages go out in send_each batches of FCM_BATCH_SIZE, with up to
+    FCM_CONCURRENT_BATCHES batches in flight at once. With a DB session,
+    tokens FCM reports as dead are cleared like in send_notification_to_all().
+
+    Returns the same counts as send_notification().
+    """
+    if not messages:
+        logger.info("No personalized messages to send.")
+        return {"success": 0, "failure": 0, "invalid_tokens": []}
+    if not await run_in_threadpool(init_firebase):
+        logger.error("FCM Error: Firebase app not initialized.")
+        return {"success": 0, "failure": len(messages), "invalid_tokens": []}
+    from firebase_admin import messaging
+
+    semaphore = asyncio.Semaphore(FCM_CONCURRENT_BATCHES)
+
+    async def send_chunk(chunk: list[PersonalMessage]) -> dict:
+        def send():
+            return messaging.send_each([
+                messaging.Message(token=token, notification=messaging.Notification(title=title, body=body), data=data)
+                for token, title, body, data in chunk
+            ])
+        async with semaphore:
+            return await _send_batch(send, [message[0] for message in chunk])
+
+    results = await asyncio.gather(*(send_chunk(chunk) for chunk in _chunked(messages, FCM_BATCH_SIZE)))
+    result = {
+        "success": sum(r["success"] for r in results),
+        "failure": sum(r["failure"] for r in results),
+        "invalid_tokens": [token for r in results for token in r["invalid_tokens"]],
+    }
+    logger.info(f"Sent {result['success']} personalized notifications. Failed: {result['failure']}")
+
+    if db is not None and result["invalid_tokens"]:
+        try:
+            await run_in_threadpool(deactivate_invalid_tokens, db, result["invalid_tokens"])
         except Exception as e:
-            # This chunk failed outright (e.g. network/auth error). Count it
-            # as failed but keep the results already collected from chunks
-            # that succeeded, instead of discarding everything.
-            logger.error(f"FCM batch error for a chunk of {len(chunk)} tokens: {e}")
-            failure_count += len(chunk)
+            logger.error(f"Failed to deactivate invalid tokens: {e}")
+    return result
 
-    logger.info(f"Successfully sent notification to {success_count} users. Failed: {failure_count}")
-    return {"success": success_count, "failure": failure_count, "invalid_tokens": invalid_tokens}
\ No newline at end of file
+
+def _chunked(items: list, size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+async def _send_batch(send: Callable, tokens: list[str]) -> dict:
+    """
+    Runs send() (one send_each call for `tokens`, in order) in a thread and
+    counts its results. A batch that fails outright (e.g. network/auth
+    error) counts as failed for every token instead of raising, so the
+    results of other batches are kept.
+    """
+    from firebase_admin import messaging
+
+    start = time.perf_counter()
+    try:
+        resp = await run_in_threadpool(send)
+    except Exception as e:
+        logger.error(f"FCM batch error for a chunk of {len(tokens)} tokens: {e}")
+        FCM_BATCH_LATENCY.observe(time.perf_counter() - start)
+        FCM_FAILURES.labels("batch").inc(len(tokens))
+        return {"success": 0, "failure": len(tokens), "invalid_tokens": []}
+
+    FCM_BATCH_LATENCY.observe(time.perf_counter() - start)
+    if resp.failure_count:
+        FCM_FAILURES.labels("token").inc(resp.failure_count)
+
+    invalid_tokens = []
+    for token, single_resp in zip(tokens, resp.responses):
+        if not single_resp.success:
+            exc = single_resp.exception
+            logger.warning(f"FCM send failed for token {token}: {exc}")
+            if isinstance(exc, messaging.UnregisteredError):
+                invalid_tokens.append(token)
+    return {"success": resp.success_count, "failure": resp.failure_count, "invalid_tokens": invalid_tokens}
@@ -0,0 +1,252 @@
+"""
+Kitchen demand forecast for GET /meallist/{date}/forecast.
+
+Bookings for a day keep arriving until its cutoff (see
+Routers/booking.validate_booking_time), so the kitchen plans from partial
+counts. The forecast adds to the bookings made so far the part of a
+typical day that usually still arrives after this point:
+
+    expected = booked so far + (weekday level) * (share booked after this lead time)
+
+Both factors come from the same weekday in past weeks, weighted towards
+recent weeks (FORECAST_HALF_LIFE_WEEKS). Dishes get the remaining bookings
+in proportion to how often they are picked: today's picks, smoothed
+towards the dish's pick rate in the past.
+
+The history is kept per worker as dense NumPy arrays, loaded with one
+aggregate query over FORECAST_HISTORY_DAYS closed days and extended by
+the new days only, once a day. Closed days cannot be booked any more, so
+they are never read twice.
+"""
+import itertools
+import os
+import threading
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from . import menu_items, models
+from .cache import TTLCache
+from .Routers.booking import LUNCH_CUTOFF_HOUR, TODAY_CUTOFF_HOUR
+
+IST = ZoneInfo('Asia/Kolkata')
+
+FORECAST_HISTORY_DAYS = int(os.getenv("FORECAST_HISTORY_DAYS", "365"))
+FORECAST_HALF_LIFE_WEEKS = float(os.getenv("FORECAST_HALF_LIFE_WEEKS", "8"))
+# Forecasts are recomputed at most this often per date, as bookings come in
+FORECAST_CACHE_SECONDS = float(os.getenv("FORECAST_CACHE_SECONDS", "60"))
+# How many bookings the past pick rate of a dish is worth against today's picks
+PRIOR_BOOKINGS = 20
+
+MEALS = ("lunch", "dinner")
+CUTOFF_HOURS = (LUNCH_CUTOFF_HOUR, TODAY_CUTOFF_HOUR)
+# Lead time = hours between a booking and its meal's cutoff. Hourly buckets for
+# the last two days, daily ones up to a week, then one bucket for anything earlier.
+LEAD_EDGES_HOURS = [*range(1, 49), 72, 96, 120, 144, 168]
+# Lower edge of every bucket; bucket 0 also holds bookings made within the last hour
+LEAD_LOWER_EDGES = np.array([0, *LEAD_EDGES_HOURS], dtype=np.float64)
+
+# One pass over the bookings of [start, end]. The grouping sets count the
+# bookings of each meal per lead-time bucket, and each distinct list of
+# dishes picked per day; only those few lists are unnested into dishes.
+# IST has no daylight saving, so a day's cutoff is its midnight plus the
+# cutoff hour, and lead times are plain arithmetic on epoch seconds.
+# Missing values are -1 so the rows load straight into an integer array.
+HISTORY_SQL = text("""
+    WITH grouped AS (
+        SELECT day, lunch_lead, dinner_lead, lunch, dinner,
+               GROUPING(lunch_lead) = 0 AS by_lunch_lead, GROUPING(dinner_lead) = 0 AS by_dinner_lead,
+               GROUPING(lunch) = 0 AS by_lunch, GROUPING(dinner) = 0 AS by_dinner,
+               count(*) AS n
+        FROM (
+            SELECT day, lunch, dinner,
+                   CASE WHEN lunch IS NOT NULL THEN width_bucket(hours_before_day + :lunch_cutoff, CAST(:edges AS double precision[])) END AS lunch_lead,
+                   CASE WHEN dinner IS NOT NULL THEN width_bucket(hours_before_day + :dinner_cutoff, CAST(:edges AS double precision[])) END AS dinner_lead
+            FROM (
+                SELECT booking_date - CAST(:start AS date) AS day,
+                       CASE WHEN cardinality(lunch_item_ids) > 0 THEN lunch_item_ids END AS lunch,
+                       CASE WHEN cardinality(dinner_item_ids) > 0 THEN dinner_item_ids END AS dinner,
+                       ((booking_date - CAST(:start AS date)) * 86400 + CAST(:start_epoch AS double precision) - date_part('epoch', created_at)) / 3600 AS hours_before_day
+                FROM meal_bookings
+                WHERE booking_date BETWEEN :start AND :end
+            ) AS b
+        ) AS c
+        GROUP BY GROUPING SETS ((day, lunch_lead), (day, dinner_lead), (day, lunch), (day, dinner))
+    )
+    SELECT day, 0, -1, lunch_lead, n FROM grouped WHERE by_lunch_lead AND lunch_lead IS NOT NULL
+    UNION ALL
+    SELECT day, 1, -1, dinner_lead, n FROM grouped WHERE by_dinner_lead AND dinner_lead IS NOT NULL
+    UNION ALL
+    SELECT day, 0, item_id, -1, CAST(sum(n) AS bigint) FROM grouped CROSS JOIN LATERAL unnest(lunch) AS item_id WHERE by_lunch GROUP BY day, item_id
+    UNION ALL
+    SELECT day, 1, item_id, -1, CAST(sum(n) AS bigint) FROM grouped CROSS JOIN LATERAL unnest(dinner) AS item_id WHERE by_dinner GROUP BY day, item_id
+""")
+
+
+def load_counts(db: Session, start: date, end: date) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Returns (bookings, picks, item_ids) for the days start..end:
+    bookings[day, meal, lead bucket] and picks[day, meal, column], where
+    column i holds the dish item_ids[i] (sorted).
+    """
+    start_epoch = datetime(start.year, start.month, start.day, tzinfo=IST).timestamp()
+    rows = db.execute(HISTORY_SQL, {
+        "start": start, "start_epoch": start_epoch, "end": end, "edges": LEAD_EDGES_HOURS,
+        "lunch_cutoff": CUTOFF_HOURS[0], "dinner_cutoff": CUTOFF_HOURS[1],
+    }).all()
+    # np.array() on Row objects goes through the generic sequence protocol, ~100x slower
+    data = np.fromiter(itertools.chain.from_iterable(rows), dtype=np.int64, count=len(rows) * 5).reshape(-1, 5)
+    day, meal, item_id, lead, n = data.T
+    days = (end - start).days + 1
+
+    bookings = np.zeros((days, len(MEALS), len(LEAD_LOWER_EDGES)), dtype=np.int32)
+    is_booking = item_id == -1
+    bookings[day[is_booking], meal[is_booking], lead[is_booking]] = n[is_booking]
+
+    item_ids, column = np.unique(item_id[~is_booking], return_inverse=True)
+    picks = np.zeros((days, len(MEALS), len(item_ids)), dtype=np.int32)
+    picks[day[~is_booking], meal[~is_booking], column] = n[~is_booking]
+    return bookings, picks, item_ids
+
+
+def _with_columns(picks: np.ndarray, item_ids: np.ndarray, all_item_ids: np.ndarray) -> np.ndarray:
+    """picks with one column per id in all_item_ids (a sorted superset of item_ids)."""
+    out = np.zeros(picks.shape[:2] + (len(all_item_ids),), dtype=picks.dtype)
+    out[:, :, np.searchsorted(all_item_ids, item_ids)] = picks
+    return out
+
+
+class BookingHistory:
+    """The counts of the last `history_days` closed days, as returned by load_counts()."""
+    def __init__(self, history_days: int):
+        self.history_days = history_days
+        self.start: date | None = None
+        self.bookings = np.zeros((0, len(MEALS), len(LEAD_LOWER_EDGES)), dtype=np.int32)
+        self.picks = np.zeros((0, len(MEALS), 0), dtype=np.int32)
+        self.item_ids = np.zeros(0, dtype=np.int64)
+        self.lock = threading.Lock()
+
+    def refresh(self, db: Session, through: date):
+        """Loads the days after the last one held, up to `through`, and drops days that fell out of the window."""
+        first = through - timedelta(days=self.history_days - 1)
+        with self.lock:
+            if self.start is None or self.start + timedelta(days=len(self.bookings)) < first:
+                self.start = first
+                self.bookings = self.bookings[:0]
+                self.picks = self.picks[:0]
+
+            load_from = self.start + timedelta(days=len(self.bookings))
+            if load_from <= through:
+                bookings, picks, item_ids = load_counts(db, load_from, through)
+                all_item_ids = np.union1d(self.item_ids, item_ids)
+                self.bookings = np.concatenate([self.bookings, bookings])
+                self.picks = np.concatenate([
+                    _with_columns(self.picks, self.item_ids, all_item_ids),
+                    _with_columns(picks, item_ids, all_item_ids),
+                ])
+                self.item_ids = all_item_ids
+
+            if self.start < first:
+                drop = (first - self.start).days
+                self.bookings = self.bookings[drop:]
+                self.picks = self.picks[drop:]
+                self.start = first
+
+
+_history = BookingHistory(FORECAST_HISTORY_DAYS)
+# booking date -> forecast dict (schemas.MealForecastOut)
+_forecasts = TTLCache(FORECAST_CACHE_SECONDS, max_entries=64)
+
+
+def forecast_meal(history: BookingHistory, meal: int, booking_date: date, lead_hours: float,
+                  booked: int, booked_picks: np.ndarray, item_ids: np.ndarray) -> tuple[float, np.ndarray, int]:
+    """
+    Returns (expected bookings, expected picks per dish in item_ids, number of
+    past days used) for one meal. Call with history.lock held.
+    """
+    days = len(history.bookings)
+    if lead_hours <= 0 or days == 0:
+        return float(booked), booked_picks.astype(np.float64), 0
+
+    meal_bookings = history.bookings[:, meal, :]
+    final = meal_bookings.sum(axis=1)
+    booked_by_now = meal_bookings[:, LEAD_LOWER_EDGES >= lead_hours].sum(axis=1)
+
+    # Past days on the same weekday; days without this meal (mess closed, before the data starts) do not count
+    offsets = np.arange(days)
+    similar = ((history.start.weekday() + offsets) % 7 == booking_date.weekday()) & (final > 0)  # type: ignore
+    age_weeks = ((booking_date - history.start).days - offsets) / 7  # type: ignore
+    weights = np.where(similar, 0.5 ** (age_weeks / FORECAST_HALF_LIFE_WEEKS), 0.0)
+    weighted_final = weights @ final
+    if weighted_final == 0:
+        return float(booked), booked_picks.astype(np.float64), 0
+
+    level = weighted_final / weights.sum()
+    remaining = level * (1 - (weights @ booked_by_now) / weighted_final)
+
+    # Past pick rate of each dish, on the days it was picked at all (i.e. on the menu)
+    known = np.isin(item_ids, history.item_ids)
+    columns = np.searchsorted(history.item_ids, item_ids[known])
+    meal_picks = history.picks[:, meal, columns]
+    offered = weights[:, None] * (meal_picks > 0) * final[:, None]
+    picked = (weights[:, None] * meal_picks).sum(axis=0)
+    past_rate = np.full(len(item_ids), np.nan)
+    past_rate[known] = np.divide(picked, offered.sum(axis=0), out=np.full(len(picked), np.nan), where=offered.sum(axis=0) > 0)
+    # A new dish is assumed to be picked as often as the others
+    fallback = np.nanmean(past_rate) if np.isfinite(past_rate).any() else 1 / max(len(item_ids), 1)
+    past_rate = np.where(np.isnan(past_rate), fallback, past_rate)
+
+    rate = (booked_picks + PRIOR_BOOKINGS * past_rate) / (booked + PRIOR_BOOKINGS)
+    return booked + remaining, booked_picks + remaining * rate, int(similar.sum())
+
+
+def forecast(db: Session, booking_date: date, now: datetime | None = None) -> dict:
+    """The forecast for booking_date in the shape of schemas.MealForecastOut."""
+    cached = _forecasts.get(booking_date)
+    if cached is not None:
+        return cached
+
+    now = now or datetime.now(IST)
+    _history.refresh(db, now.astimezone(IST).date() - timedelta(days=1))
+
+    bookings, picks, booked_ids = load_counts(db, booking_date, booking_date)
+    menu = db.query(models.Menu.lunch_item_ids, models.Menu.dinner_item_ids).filter(models.Menu.menu_date == booking_date).first()
+
+    result: dict = {"booking_date": booking_date}
+    with _history.lock:
+        for meal, name in enumerate(MEALS):
+            # The dishes on the menu, plus any picked before the menu was changed
+            picked = picks[0, meal] > 0
+            menu_ids = np.array((menu[meal] if menu else None) or [], dtype=np.int64)
+            item_ids = np.union1d(booked_ids[picked], menu_ids)
+            booked_picks = np.zeros(len(item_ids), dtype=np.int64)
+            booked_picks[np.searchsorted(item_ids, booked_ids[picked])] = picks[0, meal, picked]
+            booked = int(bookings[0, meal].sum())
+
+            cutoff = datetime(booking_date.year, booking_date.month, booking_date.day, CUTOFF_HOURS[meal], tzinfo=IST)
+            lead_hours = (cutoff - now).total_seconds() / 3600
+            expected, expected_picks, similar_days = forecast_meal(_history, meal, booking_date, lead_hours, booked, booked_picks, item_ids)
+
+            names = menu_items.names_for_ids(db, item_ids.tolist())
+            result[name] = {
+                "booked": booked,
+                "expected": int(np.rint(expected)),
+                "closed": lead_hours <= 0,
+                "similar_days": similar_days,
+                "item_counts": {
+                    names[item_id]: {"booked": int(b), "expected": int(e)}
+                    for item_id, b, e in zip(item_ids.tolist(), booked_picks, np.rint(expected_picks))
+                },
+            }
+
+    _forecasts.set(booking_date, result)
+    return result
+
+
+def clear_cache():
+    global _history
+    _history = BookingHistory(FORECAST_HISTORY_DAYS)
+    _forecasts.clear()
@@ -0,0 +1,209 @@
+"""
+Idempotency-Key support for the POST routes mobile clients retry.
+
+The first request with a given key claims a row in idempotency_keys and
+runs normally. If it succeeds (2xx), its response is stored as soon as the
+body has been sent, before any background task (e.g. a broadcast) runs.
+A retry with the same key gets the stored response back with an
+`Idempotent-Replayed: true` header, without running the route again.
+A retry that arrives while the first request is still running waits for
+it, for up to IDEMPOTENCY_WAIT_SECONDS.
+
+Keys are scoped to the caller's Authorization header and the path, so two
+users cannot collide. Reusing a key with a different body is a 422.
+Non-2xx responses are not stored, so the client can retry them for real.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import time
+
+import orjson
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from . import database
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENT_PATHS = {"/bookings/", "/bookings/book", "/notices/", "/bookings/wake-convenor"}
+# Stored responses are replayed for this long
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+# How long a duplicate waits for the first request before giving up with a 409
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "10"))
+# A claim with no response after this long belongs to a worker that died, and is taken over
+IDEMPOTENCY_STALE_SECONDS = 60
+POLL_SECONDS = 0.1
+MAX_KEY_LENGTH = 255
+# Expired rows are deleted by a worker at most this often
+PURGE_INTERVAL_SECONDS = 3600
+
+# Inserts the claim, or takes over a row that has expired or whose owner died.
+# Returns a row only if this request now owns the key.
+CLAIM_SQL = text("""
+    INSERT INTO idempotency_keys (key_hash, request_hash) VALUES (:key_hash, :request_hash)
+    ON CONFLICT (key_hash) DO UPDATE
+        SET request_hash = EXCLUDED.request_hash, response_status = NULL,
+            response_headers = NULL, response_body = NULL, created_at = now()
+        WHERE idempotency_keys.created_at < now() - make_interval(secs => :ttl)
+           OR (idempotency_keys.response_status IS NULL
+               AND idempotency_keys.created_at < now() - make_interval(secs => :stale))
+    RETURNING key_hash
+""")
+
+
+def _claim(key_hash: str, request_hash: str) -> bool:
+    with database.engine.begin() as connection:  # type: ignore
+        return connection.execute(CLAIM_SQL, {
+            "key_hash": key_hash, "request_hash": request_hash,
+            "ttl": IDEMPOTENCY_TTL_SECONDS, "stale": IDEMPOTENCY_STALE_SECONDS,
+        }).first() is not None
+
+
+def _fetch(key_hash: str):
+    with database.engine.begin() as connection:  # type: ignore
+        return connection.execute(text(
+            "SELECT request_hash, response_status, response_headers, response_body FROM idempotency_keys WHERE key_hash = :key_hash"
+        ), {"key_hash": key_hash}).first()
+
+
+def _complete(key_hash: str, status: int, headers: list, body: bytes):
+    with database.engine.begin() as connection:  # type: ignore
+        connection.execute(text("""
+            UPDATE idempotency_keys
+            SET response_status = :status, response_headers = CAST(:headers AS jsonb), response_body = :body
+            WHERE key_hash = :key_hash
+        """), {"key_hash": key_hash, "status": status, "headers": orjson.dumps(headers).decode(), "body": body})
+
+
+def _release(key_hash: str):
+    with database.engine.begin() as connection:  # type: ignore
+        connection.execute(text(
+            "DELETE FROM idempotency_keys WHERE key_hash = :key_hash AND response_status IS NULL"
+        ), {"key_hash": key_hash})
+
+
+def _purge_expired() -> int:
+    with database.engine.begin() as connection:  # type: ignore
+        return connection.execute(text(
+            "DELETE FROM idempotency_keys WHERE created_at < now() - make_interval(secs => :ttl)"
+        ), {"ttl": IDEMPOTENCY_TTL_SECONDS}).rowcount
+
+
+async def _read_body(receive: Receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            return b"".join(chunks)
+
+
+class IdempotencyMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self._last_purge = time.monotonic()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in IDEMPOTENT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        key = headers.get("idempotency-key")
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+        if not key or len(key) > MAX_KEY_LENGTH:
+            await JSONResponse({"detail": f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters."}, status_code=400)(scope, receive, send)
+            return
+
+        body = await _read_body(receive)
+        key_hash = hashlib.sha256("\0".join([headers.get("authorization", ""), scope["path"], key]).encode()).hexdigest()
+        request_hash = hashlib.sha256(body).hexdigest()
+
+        deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+        while True:
+            if await run_in_threadpool(_claim, key_hash, request_hash):
+                await self._run_first(scope, receive, send, body, key_hash)
+                return
+
+            stored = await run_in_threadpool(_fetch, key_hash)
+            if stored is None:
+                # The first request failed and released the key in the meantime
+                continue
+            if stored.request_hash != request_hash:
+                await JSONResponse({"detail": "This Idempotency-Key was already used with a different request."}, status_code=422)(scope, receive, send)
+                return
+            if stored.response_status is not None:
+                await self._replay(send, stored)
+                return
+            if time.monotonic() >= deadline:
+                await JSONResponse({"detail": "A request with this Idempotency-Key is still being processed."}, status_code=409)(scope, receive, send)
+                return
+            await asyncio.sleep(POLL_SECONDS)
+
+    async def _run_first(self, scope: Scope, receive: Receive, send: Send, body: bytes, key_hash: str):
+        body_sent = False
+
+        async def replay_body() -> Message:
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        response_start: Message = {}
+        chunks: list[bytes] = []
+        finished = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal finished
+            if message["type"] == "http.response.start":
+                response_start.update(message)
+            elif message["type"] == "http.response.body" and not finished:
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body", False):
+                    finished = True
+                    await store_or_release()
+            await send(message)
+
+        async def store_or_release():
+            # Stored before the client sees the response, so an immediate retry finds it.
+            # The route's work is done either way, so a failure here must not keep the
+            # response from the client.
+            if 200 <= response_start["status"] < 300:
+                headers = [[name.decode("latin-1"), value.decode("latin-1")] for name, value in response_start.get("headers", [])]
+                try:
+                    await run_in_threadpool(_complete, key_hash, response_start["status"], headers, b"".join(chunks))
+                    return
+                except Exception:
+                    logger.exception("Could not store the response for an Idempotency-Key; releasing the key")
+            try:
+                await run_in_threadpool(_release, key_hash)
+            except Exception:
+                logger.exception("Could not release an Idempotency-Key")
+
+        try:
+            await self.app(scope, replay_body, send_wrapper)
+        finally:
+            if not finished:
+                try:
+                    await run_in_threadpool(_release, key_hash)
+                except Exception:
+                    logger.exception("Could not release an Idempotency-Key")
+
+        if time.monotonic() - self._last_purge >= PURGE_INTERVAL_SECONDS:
+            self._last_purge = time.monotonic()
+            purged = await run_in_threadpool(_purge_expired)
+            logger.info(f"Deleted {purged} expired idempotency key(s)")
+
+    async def _replay(self, send: Send, stored):
+        headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in stored.response_headers]
+        headers.append((b"idempotent-replayed", b"true"))
+        await send({"type": "http.response.start", "status": stored.response_status, "headers": headers})
+        await send({"type": "http.response.body", "body": bytes(stored.response_body)})
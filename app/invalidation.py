@@ -0,0 +1,182 @@
+"""
+Cross-worker cache invalidation over Postgres LISTEN/NOTIFY.
+
+Write paths call publish(db, cache_name, key) before committing. It
+queues a NOTIFY in the same transaction, so it is only delivered if the
+write commits, and it evicts the key from this worker's cache on commit.
+Every worker runs an InvalidationListener thread on its own connection
+to the primary, and evicts the keys other workers publish.
+
+While the listener is not connected (at startup, or after losing the
+connection) nothing tells this worker about writes, so every registered
+cache keeps entries for CACHE_FALLBACK_SECONDS only. Once the listener
+is connected again, new entries get the cache's normal TTL.
+"""
+import logging
+import os
+import select
+import threading
+import time
+from typing import Callable, Hashable
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from .cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "cache_invalidation"
+# TTL of every registered cache while the listener is disconnected
+CACHE_FALLBACK_SECONDS = float(os.getenv("CACHE_FALLBACK_SECONDS", "5"))
+# Reconnect attempts back off up to this many seconds
+LISTEN_RECONNECT_MAX_SECONDS = 30
+# An idle listener runs SELECT 1 this often, so a dead connection is noticed
+LISTEN_KEEPALIVE_SECONDS = 30
+
+# name -> (cache, function turning the key in a notification back into the cache's key)
+_caches: dict[str, tuple[TTLCache, Callable[[str], Hashable]]] = {}
+_listener: "InvalidationListener | None" = None
+
+
+def register(name: str, cache: TTLCache, parse_key: Callable[[str], Hashable] = str):
+    _caches[name] = (cache, parse_key)
+
+
+def set_degraded(degraded: bool):
+    for cache, _ in _caches.values():
+        cache.set_degraded(degraded)
+
+
+def clear_all():
+    for cache, _ in _caches.values():
+        cache.clear()
+
+
+def evict(payload: str):
+    """Handles a payload of the form "<cache name>:<key>"; an empty key clears the whole cache."""
+    name, _, key = payload.partition(":")
+    registered = _caches.get(name)
+    if registered is None:
+        logger.warning(f"Invalidation for unknown cache '{name}'")
+        return
+    cache, parse_key = registered
+    if key:
+        cache.delete(parse_key(key))
+    else:
+        cache.clear()
+
+
+def publish(db: Session, name: str, key: object = None):
+    """
+    Evicts `key` (or the whole cache when key is None) from cache `name` in
+    every worker once db's transaction commits. Call it before the commit.
+    """
+    payload = f"{name}:{'' if key is None else key}"
+    db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": CHANNEL, "payload": payload})
+    event.listen(db, "after_commit", lambda session: evict(payload), once=True)
+
+
+class InvalidationListener:
+    """
+    Background thread holding a LISTEN connection taken out of `engine`'s pool.
+    evict_again_after: when reads go to a replica, a key is evicted a
+    second time this many seconds later, in case a read on a lagging
+    replica put the old value back in the meantime.
+    """
+    def __init__(self, engine, evict_again_after: float = 0.0):
+        self.engine = engine
+        self.evict_again_after = evict_again_after
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="cache-invalidation", daemon=True)
+        self._pending: list[tuple[float, str]] = []
+        self.connected = threading.Event()
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=5)
+
+    def _connect(self):
+        connection = self.engine.raw_connection()
+        # Take it out of the pool: it stays open and in LISTEN mode for the worker's lifetime
+        connection.detach()
+        dbapi_connection = connection.dbapi_connection
+        dbapi_connection.autocommit = True
+        with dbapi_connection.cursor() as cursor:
+            cursor.execute(f"LISTEN {CHANNEL}")
+        return dbapi_connection
+
+    def _handle(self, payload: str):
+        evict(payload)
+        if self.evict_again_after:
+            self._pending.append((time.monotonic() + self.evict_again_after, payload))
+
+    def _evict_pending(self):
+        now = time.monotonic()
+        due = [payload for at, payload in self._pending if at <= now]
+        if due:
+            self._pending = [(at, payload) for at, payload in self._pending if at > now]
+            for payload in due:
+                evict(payload)
+
+    def _listen(self, connection):
+        last_activity = time.monotonic()
+        while not self._stop.is_set():
+            if select.select([connection], [], [], 1.0)[0]:
+                connection.poll()
+                while connection.notifies:
+                    self._handle(connection.notifies.pop(0).payload)
+                last_activity = time.monotonic()
+            elif time.monotonic() - last_activity >= LISTEN_KEEPALIVE_SECONDS:
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                last_activity = time.monotonic()
+            self._evict_pending()
+
+    def _run(self):
+        backoff = 1.0
+        while not self._stop.is_set():
+            connection = None
+            try:
+                connection = self._connect()
+                set_degraded(False)
+                self.connected.set()
+                backoff = 1.0
+                logger.info("Cache invalidation listener connected")
+                self._listen(connection)
+            except Exception as e:
+                if self.connected.is_set() or backoff == 1.0:
+                    logger.warning(f"Cache invalidation listener disconnected, caches fall back to a {CACHE_FALLBACK_SECONDS}s TTL: {e}")
+            finally:
+                self.connected.clear()
+                # Writes from now on go unnoticed, so drop long-lived entries
+                set_degraded(True)
+                if connection is not None:
+                    try:
+                        connection.close()
+                    except Exception:
+                        pass
+            self._stop.wait(backoff)
+            backoff = min(backoff * 2, LISTEN_RECONNECT_MAX_SECONDS)
+
+
+def start_listener(engine, evict_again_after: float = 0.0):
+    global _listener
+    if _listener is None:
+        _listener = InvalidationListener(engine, evict_again_after)
+        _listener.start()
+
+
+def wait_until_connected(timeout: float) -> bool:
+    return _listener is not None and _listener.connected.wait(timeout)
+
+
+def stop_listener():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    set_degraded(True)
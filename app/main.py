@@ -1,36 +1,136 @@
+import asyncio
+from contextlib import asynccontextmanager, suppress
 from fastapi import FastAPI,Depends,status,HTTPException,APIRouter,Response
 from psycopg2.errors import UniqueViolation # type: ignore
 import psycopg2 # type: ignore
 from . import schemas
 from fastapi.security import OAuth2PasswordRequestForm
 from . import oauth2, utils
-from .Routers import auth,menus,booking,notice,users,meallist,notification,reminder
+from . import database, booking_batcher, broadcasts, fcm_manager, send_email, menu_items, warmup, invalidation, read_routing, blob_store, thumbnails, snapshots
+from .Routers import auth,menus,booking,notice,users,meallist,notification,reminder,billing,home,issues
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+from fastapi.staticfiles import StaticFiles
+from .compression import CompressionMiddleware
+from .metrics import MetricsMiddleware, render_metrics
+from .query_stats import QueryStatsMiddleware
+from .read_routing import ReadYourWritesMiddleware
+from .idempotency import IdempotencyMiddleware
+import os
 
-# Create an instance of the FastAPI application
-app = FastAPI(title="MessBook - Hostel Management System API")
+# Responses smaller than this many bytes are sent uncompressed
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # Accept requests from any domain/IP
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
 
+# Everything that holds sockets, threads or per-process state is created in
+# the worker after it has been forked, and released here when it stops.
+# Importing this module (e.g. gunicorn --preload) only builds the app object.
+# Firebase and SendGrid are created on first use (see fcm_manager and
+# send_email) so a cold start does not wait for them.
+# Warm-up runs in the background while the worker already accepts requests;
+# GET /ready tells the load balancer when it has finished.
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    database.init_engines()
+    # Fails fast on an unknown BLOB_STORE, and creates the local upload directory
+    blob_store.get_blob_store()
+    # With a replica, a read may put an old row back in a cache right after an
+    # eviction, so keys are evicted again once the replica has caught up
+    replica_lag = read_routing.READ_YOUR_WRITES_SECONDS if database.replica_engine is not None else 0.0
+    invalidation.start_listener(database.engine, evict_again_after=replica_lag)
+    booking_batcher.start(database.SessionLocal)
+    await broadcasts.resume()
+    warmup_task = asyncio.create_task(warmup.run_warmup())
+    snapshot_task = asyncio.create_task(snapshots.run_at_cutoff(meallist.freeze_meal_list))
+    try:
+        yield
+    finally:
+        for task in (warmup_task, snapshot_task):
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+        warmup.reset()
+        await broadcasts.flush()
+        booking_batcher.stop()
+        invalidation.stop_listener()
+        invalidation.clear_all()
+        send_email.close_email_client()
+        fcm_manager.shutdown_firebase()
+        thumbnails.shutdown_pool()
+        menu_items.clear_cache()
+        snapshots.clear_cache()
+        database.dispose_engines()
 
-app.include_router(auth.router)
-app.include_router(menus.router)
-app.include_router(booking.router)
-app.include_router(notice.router)
-app.include_router(users.router)
-app.include_router(meallist.router)
-app.include_router(notification.router)
-app.include_router(reminder.router)
 
+def create_app() -> FastAPI:
+    # orjson is used for every JSON response instead of the stdlib encoder
+    app = FastAPI(
+        title="MessBook - Hostel Management System API",
+        default_response_class=ORJSONResponse,
+        lifespan=lifespan
+    )
 
+    # Innermost, so it stores uncompressed bodies and replays still get CORS headers
+    app.add_middleware(IdempotencyMiddleware)
 
-# A simple root endpoint
-@app.head("/",tags=["Testing"])
-def root():
-    return {"message": "Welcome to the Hostel Management API. The service is running."}
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],  # Accept requests from any domain/IP
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    # Uploaded photos are already compressed
+    app.add_middleware(CompressionMiddleware, minimum_size=COMPRESSION_MIN_SIZE, excluded_prefixes=(blob_store.BLOB_BASE_URL + "/",))
+    app.add_middleware(QueryStatsMiddleware)
+    app.add_middleware(ReadYourWritesMiddleware)
+    app.add_middleware(MetricsMiddleware)
+
+
+    app.include_router(auth.router)
+    app.include_router(menus.router)
+    app.include_router(booking.router)
+    app.include_router(notice.router)
+    app.include_router(users.router)
+    app.include_router(meallist.router)
+    app.include_router(notification.router)
+    app.include_router(reminder.router)
+    app.include_router(billing.router)
+    app.include_router(home.router)
+    app.include_router(issues.router)
+
+    # Files in the local blob store (issue photos) are served by the app itself.
+    # Other stores hand out their own URLs.
+    if blob_store.BLOB_STORE == "local":
+        app.mount(blob_store.BLOB_BASE_URL, StaticFiles(directory=blob_store.BLOB_STORE_DIR, check_dir=False), name="uploads")
+
+
+
+    # A simple root endpoint
+    @app.head("/",tags=["Testing"])
+    def root():
+        return {"message": "Welcome to the Hostel Management API. The service is running."}
+
+
+    # Readiness probe for the load balancer: 503 until this worker has warmed up
+    # (see app/warmup.py). HEAD / only says the process is up.
+    @app.get("/ready", tags=["Testing"])
+    def ready(response: Response):
+        if not warmup.is_ready():
+            response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+            return {"status": "warming up"}
+        return {"status": "ready"}
+
+
+    # Prometheus scrape endpoint
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics_endpoint():
+        return await render_metrics()
+
+    return app
+
+
+# `uvicorn app.main:app` / `gunicorn app.main:app -k uvicorn.workers.UvicornWorker`,
+# or `uvicorn app.main:create_app --factory`
+app = create_app()
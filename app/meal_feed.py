@@ -0,0 +1,126 @@
+"""
+Live meal counts for GET /meallist/today/live (Server-Sent Events).
+
+A listener gets a `snapshot` event with today's totals and per-dish counts,
+then a `delta` event for every booking created, changed or cancelled today.
+Deltas have the same keys as the snapshot and hold the change to add to it.
+
+Deltas are published by the booking routes of this worker only. With
+several workers, each listener also gets a fresh snapshot every
+LIVE_RESYNC_SECONDS, which picks up bookings made through other workers
+and corrects any delta that raced the snapshot.
+"""
+import asyncio
+import os
+import time
+from collections import Counter
+from datetime import date, datetime
+from typing import AsyncIterator, Callable
+from zoneinfo import ZoneInfo
+
+import orjson
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from . import menu_items, models
+from .broadcaster import RESYNC, Broadcaster
+
+IST = ZoneInfo('Asia/Kolkata')
+
+# An SSE comment is sent after this many idle seconds so proxies keep the connection open
+LIVE_HEARTBEAT_SECONDS = float(os.getenv("LIVE_HEARTBEAT_SECONDS", "15"))
+# Every listener gets a fresh snapshot this often
+LIVE_RESYNC_SECONDS = float(os.getenv("LIVE_RESYNC_SECONDS", "60"))
+
+broadcaster = Broadcaster()
+
+
+def today_ist() -> date:
+    return datetime.now(IST).date()
+
+
+def counts_for_day(db: Session, day: date) -> dict:
+    """The summary part of schemas.MealListOut for `day`, without the per-student list."""
+    rows = db.query(models.Booking.lunch_item_ids, models.Booking.dinner_item_ids).filter(
+        models.Booking.booking_date == day
+    ).all()
+    lunch, dinner = Counter(), Counter()
+    total_lunch = total_dinner = 0
+    for lunch_item_ids, dinner_item_ids in rows:
+        if lunch_item_ids:
+            total_lunch += 1
+            lunch.update(lunch_item_ids)
+        if dinner_item_ids:
+            total_dinner += 1
+            dinner.update(dinner_item_ids)
+
+    names = menu_items.names_for_ids(db, [*lunch, *dinner])
+    return {
+        "booking_date": day,
+        "total_lunch_bookings": total_lunch,
+        "total_dinner_bookings": total_dinner,
+        "lunch_item_counts": {names[item_id]: n for item_id, n in lunch.items()},
+        "dinner_item_counts": {names[item_id]: n for item_id, n in dinner.items()},
+    }
+
+
+def _item_changes(old: list[int] | None, new: list[int] | None, names: dict[int, str]) -> dict[str, int]:
+    changes = Counter(new or [])
+    changes.subtract(old or [])
+    return {names[item_id]: n for item_id, n in changes.items() if n}
+
+
+def publish_booking_change(db: Session, booking_date: date, old_lunch: list[int] | None, old_dinner: list[int] | None,
+                           new_lunch: list[int] | None, new_dinner: list[int] | None):
+    """
+    Sends the count change of one booking to the live listeners. Call it
+    after the change has been committed. Does nothing when nobody is
+    listening or the booking is not for today.
+    """
+    if not broadcaster.has_subscribers or booking_date != today_ist():
+        return
+
+    names = menu_items.names_for_ids(db, [*(old_lunch or []), *(old_dinner or []), *(new_lunch or []), *(new_dinner or [])])
+    broadcaster.publish({
+        "booking_date": booking_date,
+        "total_lunch_bookings": bool(new_lunch) - bool(old_lunch),
+        "total_dinner_bookings": bool(new_dinner) - bool(old_dinner),
+        "lunch_item_counts": _item_changes(old_lunch, new_lunch, names),
+        "dinner_item_counts": _item_changes(old_dinner, new_dinner, names),
+    })
+
+
+def _snapshot(open_session: Callable[[], Session]) -> dict:
+    db = open_session()
+    try:
+        return counts_for_day(db, today_ist())
+    finally:
+        db.close()
+
+
+def _event(name: str, data: dict) -> bytes:
+    return b"event: " + name.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+
+
+async def stream(open_session: Callable[[], Session]) -> AsyncIterator[bytes]:
+    """The SSE body. Subscribes before reading the snapshot so no change is missed in between."""
+    subscription = broadcaster.subscribe()
+    try:
+        while True:
+            snapshot = await run_in_threadpool(_snapshot, open_session)
+            yield _event("snapshot", snapshot)
+            resync_at = time.monotonic() + LIVE_RESYNC_SECONDS
+
+            while time.monotonic() < resync_at and snapshot["booking_date"] == today_ist():
+                timeout = min(LIVE_HEARTBEAT_SECONDS, resync_at - time.monotonic())
+                try:
+                    message = await asyncio.wait_for(subscription.get(), timeout)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+                    continue
+                if message is RESYNC:
+                    break
+                if message["booking_date"] == snapshot["booking_date"]:
+                    yield _event("delta", message)
+    finally:
+        broadcaster.unsubscribe(subscription)
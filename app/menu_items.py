@@ -0,0 +1,136 @@
+import os
+import threading
+from datetime import date
+from typing import Iterable
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from . import invalidation
+from .cache import TTLCache
+from .models import Menu, MenuItem
+
+# How long a daily menu (already turned into names) is served from memory.
+# set_daily_menu evicts the date in every worker through app.invalidation.
+MENU_CACHE_SECONDS = float(os.getenv("MENU_CACHE_SECONDS", "300"))
+
+# id -> name. A menu item id always refers to the same name, so entries never
+# go stale and the cache is safe to share between requests and threads.
+_names_by_id: dict[int, str] = {}
+_lock = threading.Lock()
+
+# menu_date -> menu_to_dict() of that day's menu
+_menus = TTLCache(MENU_CACHE_SECONDS, max_entries=64, fallback_ttl_seconds=invalidation.CACHE_FALLBACK_SECONDS)
+invalidation.register("menus", _menus, date.fromisoformat)
+
+
+def clear_cache():
+    with _lock:
+        _names_by_id.clear()
+    _menus.clear()
+
+
+def ids_for_names(db: Session, names: list[str]) -> list[int]:
+    """
+    Returns the menu_items id of every name (same order), creating rows for
+    names that are new. Does not commit; the caller's commit covers it.
+    """
+    if not names:
+        return []
+
+    unique_names = list(dict.fromkeys(names))
+    db.execute(
+        insert(MenuItem).values([{"name": name} for name in unique_names])
+        .on_conflict_do_nothing(index_elements=["name"])
+    )
+    rows = db.query(MenuItem.id, MenuItem.name).filter(MenuItem.name.in_(unique_names)).all()
+    ids_by_name = {row.name: row.id for row in rows}
+    return [ids_by_name[name] for name in names]
+
+
+def names_for_ids(db: Session, ids: Iterable[int]) -> dict[int, str]:
+    """Returns {id: name} for the given ids, only querying ids not seen before."""
+    wanted = set(ids)
+    missing = wanted.difference(_names_by_id)
+    if missing:
+        rows = db.query(MenuItem.id, MenuItem.name).filter(MenuItem.id.in_(missing)).all()
+        with _lock:
+            _names_by_id.update((row.id, row.name) for row in rows)
+    return {item_id: _names_by_id[item_id] for item_id in wanted if item_id in _names_by_id}
+
+
+def to_names(ids: list[int] | None, names_by_id: dict[int, str]) -> list[str] | None:
+    """Turns a stored id array back into the dish names the API exposes."""
+    if ids is None:
+        return None
+    return list(map(names_by_id.__getitem__, ids))
+
+
+def picks_to_ids(picks: list[str] | None, options: dict[str, int]) -> list[int | None] | None:
+    """
+    Maps a student's picked names to ids using {name: id} for the dishes
+    offered. Names that are not offered become None, so a subset check
+    against the menu's ids rejects them.
+    """
+    if picks is None:
+        return None
+    return [options.get(name) for name in picks]
+
+
+def menu_options(db: Session, menu) -> tuple[dict[str, int], dict[str, int]]:
+    """Returns ({name: id} for lunch, {name: id} for dinner) for a daily menu."""
+    names = names_for_ids(db, [*menu.lunch_item_ids, *menu.dinner_item_ids])
+    lunch = {names[item_id]: item_id for item_id in menu.lunch_item_ids}
+    dinner = {names[item_id]: item_id for item_id in menu.dinner_item_ids}
+    return lunch, dinner
+
+
+def menu_to_dict(db: Session, menu) -> dict:
+    """A daily menu in the shape of schemas.DailyMenuOut."""
+    names = names_for_ids(db, [*menu.lunch_item_ids, *menu.dinner_item_ids])
+    return {
+        "menu_date": menu.menu_date,
+        "lunch_options": to_names(menu.lunch_item_ids, names),
+        "dinner_options": to_names(menu.dinner_item_ids, names),
+        "set_by_user_id": menu.set_by_user_id,
+    }
+
+
+def booking_to_dict(db: Session, booking) -> dict:
+    """A meal booking in the shape of schemas.MealBookingOut."""
+    names = names_for_ids(db, [*(booking.lunch_item_ids or []), *(booking.dinner_item_ids or [])])
+    return {
+        "id": booking.id,
+        "user_id": booking.user_id,
+        "booking_date": booking.booking_date,
+        "lunch_pick": to_names(booking.lunch_item_ids, names),
+        "dinner_pick": to_names(booking.dinner_item_ids, names),
+        "created_at": booking.created_at,
+    }
+
+
+def cached_menu(db: Session, menu_date: date) -> dict | None:
+    """menu_to_dict() of the menu for menu_date, or None if none is set."""
+    menu_dict = _menus.get(menu_date)
+    if menu_dict is None:
+        menu = db.query(Menu).filter(Menu.menu_date == menu_date).first()
+        if menu is None:
+            return None
+        menu_dict = menu_to_dict(db, menu)
+        _menus.set(menu_date, menu_dict)
+    return menu_dict
+
+
+def preload_menus(db: Session, menu_dates: list[date]) -> int:
+    """Loads the menus for menu_dates into the cache in one query. Returns how many were set."""
+    menus = db.query(Menu).filter(Menu.menu_date.in_(menu_dates)).all()
+    for menu in menus:
+        _menus.set(menu.menu_date, menu_to_dict(db, menu))
+    return len(menus)
+
+
+def menus_in_range(db: Session, start: date, end: date) -> list[dict]:
+    """menu_to_dict() of every menu from start to end (inclusive), by date, from one range scan."""
+    menus = db.query(Menu).filter(Menu.menu_date.between(start, end)).order_by(Menu.menu_date).all()
+    names_for_ids(db, [item_id for menu in menus for item_id in (*menu.lunch_item_ids, *menu.dinner_item_ids)])
+    return [menu_to_dict(db, menu) for menu in menus]
@@ -0,0 +1,99 @@
+import time
+
+from anyio import to_thread
+from fastapi import Response
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+#------------------------------------------HTTP------------------------------------------#
+REQUEST_COUNT = Counter(
+    "http_requests_total", "Requests handled, by route template and status code.",
+    ["method", "route", "status"]
+)
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Time spent handling a request, by route template.",
+    ["method", "route"]
+)
+IN_FLIGHT = Gauge("http_requests_in_flight", "Requests currently being handled.")
+
+#--------------------------------------Thread Pool---------------------------------------#
+# Sync handlers and dependencies run on anyio's default thread limiter.
+THREADPOOL_BORROWED = Gauge("threadpool_tokens_borrowed", "Worker threads currently in use by sync handlers.")
+THREADPOOL_TOTAL = Gauge("threadpool_tokens_total", "Size of the worker thread pool.")
+
+#---------------------------------------Database-----------------------------------------#
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a connection from the pool.",
+    buckets=(.001, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30)
+)
+DB_POOL_CHECKED_OUT = Gauge("db_pool_connections_checked_out", "Pooled connections currently in use.")
+DB_POOL_OVERFLOW = Gauge("db_pool_overflow", "Connections opened beyond pool_size.")
+DB_READS = Counter("db_read_sessions_total", "Sessions opened by get_read_db, by the database they went to.", ["target"])
+
+#-------------------------------------Notifications--------------------------------------#
+FCM_BATCH_LATENCY = Histogram("fcm_batch_duration_seconds", "Time taken by one FCM send_each batch.")
+FCM_FAILURES = Counter(
+    "fcm_send_failures_total", "Failed FCM sends. reason is 'token' for per-token errors and 'batch' for whole-batch errors.",
+    ["reason"]
+)
+BROADCASTS_MERGED = Counter("broadcasts_merged_total", "Broadcasts merged into one already waiting to be sent.")
+BROADCASTS_DEFERRED = Counter("broadcasts_deferred_total", "Broadcasts held back until the end of quiet hours.")
+
+#-----------------------------------------Email------------------------------------------#
+EMAIL_LATENCY = Histogram("email_send_duration_seconds", "Time taken to hand an email to SendGrid.", ["kind"])
+EMAIL_FAILURES = Counter("email_send_failures_total", "Emails SendGrid did not accept.", ["kind"])
+
+
+class MetricsMiddleware:
+    """
+    Records request count, latency and in-flight requests.
+    Routes are labelled by their path template (e.g. /meallist/{booking_date})
+    so the label set stays small.
+    """
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            IN_FLIGHT.dec()
+            route = scope.get("route")
+            route_path = getattr(route, "path", "<unmatched>")
+            method = scope["method"]
+            REQUEST_COUNT.labels(method, route_path, str(status_code)).inc()
+            REQUEST_LATENCY.labels(method, route_path).observe(elapsed)
+
+
+def _update_sampled_gauges():
+    # Values that are cheaper to sample at scrape time than to track on every request
+    limiter = to_thread.current_default_thread_limiter()
+    THREADPOOL_BORROWED.set(limiter.borrowed_tokens)
+    THREADPOOL_TOTAL.set(limiter.total_tokens)
+
+    from .database import engine
+    pool = engine.pool if engine is not None else None
+    if hasattr(pool, "checkedout"):
+        DB_POOL_CHECKED_OUT.set(pool.checkedout())  # type: ignore
+        DB_POOL_OVERFLOW.set(max(pool.overflow(), 0))  # type: ignore
+
+
+async def render_metrics() -> Response:
+    """Must run on the event loop (async route) to read the thread limiter."""
+    _update_sampled_gauges()
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -1,7 +1,7 @@
-from sqlalchemy import Column, Boolean, ForeignKey, String, Integer, text, Text, Date, UniqueConstraint
+from sqlalchemy import Column, Boolean, ForeignKey, String, Integer, text, Text, Date, UniqueConstraint, Index, LargeBinary
 from sqlalchemy.orm import declarative_base
 from datetime import datetime, timezone
-from sqlalchemy.dialects.postgresql import ARRAY, TIMESTAMP
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, TIMESTAMP
 
 
 Base = declarative_base()
@@ -16,7 +16,7 @@ class User(Base):
     hashed_password = Column(Text, nullable=False)
     room_number = Column(Integer)
     # Use server_default to tell Alembic the database handles the default
-    role = Column(String(50), nullable=False, server_default='student')
+    role = Column(String(50), nullable=False, server_default='student', index=True)
     is_active = Column(Boolean, nullable=False, server_default=text("false"))
     is_mess_active = Column(Boolean, nullable=False, server_default=text("true"))
     created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"))
@@ -30,17 +30,27 @@ class Notice(Base):
     title = Column(String(255), nullable=False)
     content = Column(Text, nullable=False)
     posted_by_user_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
-    created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"))
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"), index=True)
     name = Column(String(255))
 
     
+class MenuItem(Base):
+    __tablename__ = "menu_items"
+    
+    # One row per dish name. Menus and bookings store these ids instead of
+    # repeating the names, so ids are never reused or renamed.
+    id = Column(Integer, primary_key=True)
+    name = Column(Text, nullable=False, unique=True)
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"))
+
+
 class Menu(Base):
     __tablename__ = "daily_menus"
     
     id = Column(Integer, primary_key=True)
     menu_date = Column(Date, unique=True, nullable=False, index=True)
-    lunch_options = Column(ARRAY(Text), nullable=False)
-    dinner_options = Column(ARRAY(Text), nullable=False)
+    lunch_item_ids = Column(ARRAY(Integer), nullable=False)
+    dinner_item_ids = Column(ARRAY(Integer), nullable=False)
     set_by_user_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
     created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"))
     
@@ -48,22 +58,87 @@ class Menu(Base):
 class Booking(Base):
     __tablename__ = "meal_bookings"
     
-    # __table_args__ to map the composite unique constraint
+    # The table is range-partitioned by month on booking_date (see the
+    # 666afc736a6b migration and app/partitions.py), so every unique key
+    # has to include booking_date.
     __table_args__ = (
         UniqueConstraint('user_id', 'booking_date', name='meal_bookings_user_id_booking_date_key'),
+        Index('ix_meal_bookings_booking_date', 'booking_date'),
     )
     
-    id = Column(Integer, primary_key=True)
+    id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     
     # Removed unique=True from here
-    booking_date = Column(Date, nullable=False) 
+    booking_date = Column(Date, primary_key=True, nullable=False) 
+    
+    # menu_items ids, in the order the student picked them
+    lunch_item_ids = Column(ARRAY(Integer))
+    dinner_item_ids = Column(ARRAY(Integer))
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"))
+    
+    
+    
+class MealBillingRollup(Base):
+    __tablename__ = "meal_billing_rollups"
+    
+    # Per-user meal counts for one month, built from meal_bookings by app/billing.py.
+    # billing_month is the first day of the month.
+    billing_month = Column(Date, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    lunch_count = Column(Integer, nullable=False, server_default=text("0"))
+    dinner_count = Column(Integer, nullable=False, server_default=text("0"))
+    # {"<menu_items id>": times picked}
+    lunch_item_counts = Column(JSONB, nullable=False, server_default=text("'{}'::jsonb"))
+    dinner_item_counts = Column(JSONB, nullable=False, server_default=text("'{}'::jsonb"))
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"))
+
+
+class RollupWatermark(Base):
+    __tablename__ = "rollup_watermarks"
+    
+    # Last booking_date folded into a rollup; NULL until the first refresh
+    rollup_name = Column(Text, primary_key=True)
+    rolled_up_through = Column(Date, nullable=True)
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"))
+    
     
-    lunch_pick = Column(ARRAY(Text))
-    dinner_pick = Column(ARRAY(Text))
+class MealListSnapshot(Base):
+    __tablename__ = "meal_list_snapshots"
+    
+    # The final meal list of a day, stored by app/snapshots.py once its last cutoff has passed
+    booking_date = Column(Date, primary_key=True)
+    # Exactly the bytes served by GET /meallist/{date} and /meallist/{date}/download
+    json_body = Column(LargeBinary, nullable=False)
+    csv_body = Column(LargeBinary, nullable=False)
+    json_etag = Column(Text, nullable=False)
+    csv_etag = Column(Text, nullable=False)
     created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"))
     
     
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+    
+    # sha256 of (Authorization header, method, path, Idempotency-Key), see app/idempotency.py
+    key_hash = Column(Text, primary_key=True)
+    # sha256 of the request body; the same key with a different body is rejected
+    request_hash = Column(Text, nullable=False)
+    # NULL while the first request is still running
+    response_status = Column(Integer, nullable=True)
+    response_headers = Column(JSONB, nullable=True)
+    response_body = Column(LargeBinary, nullable=True)
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"), index=True)
+    
+    
+class DeferredBroadcast(Base):
+    __tablename__ = "deferred_broadcasts"
+    
+    # Broadcasts held for quiet hours when the worker stopped; sent after the next start (app/broadcasts.py)
+    kind = Column(Text, primary_key=True)
+    title = Column(Text, nullable=False)
+    body = Column(Text, nullable=False)
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"))
+    
     
 class Cooldown(Base):
     __tablename__ = "system_cooldowns"
@@ -74,11 +149,17 @@ class Cooldown(Base):
     
 class IssueTicket(Base):
     __tablename__ = "issue_tickets"
+    __table_args__ = (
+        # GET /issues pages through the open tickets newest first; most tickets end up resolved
+        Index('ix_issue_tickets_unresolved_id', 'id', postgresql_where=text('is_resolved = false')),
+    )
     
     id = Column(Integer, primary_key=True)
     title = Column(String(255), nullable=False)
     description = Column(String(255), nullable=False)
     image_url = Column(Text, nullable=False)
+    # Filled in shortly after the upload, once the thumbnail has been made
+    thumbnail_url = Column(Text, nullable=True)
     
     
     # Tracking the reporter
@@ -5,8 +5,9 @@ from typing import Optional
 from . import schemas
 from .database import get_db
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from . import models
+from sqlalchemy.orm import Session, make_transient_to_detached
+from . import models, invalidation
+from .cache import TTLCache
 import os
 
 # This creates a dependency that will look for the token in the request's "Authorization" header
@@ -17,6 +18,14 @@ SECRET_KEY = os.getenv("SECRET_KEY","DEFAULT_KEY")
 ALGORITHM = os.getenv("ALGORITHM","HS256")
 ACCESS_TOKEN_EXPIRE_DAYS = 100
 
+# How long get_current_user serves a user from memory instead of querying.
+# Every write to a user row evicts it in every worker through app.invalidation.
+USER_CACHE_SECONDS = float(os.getenv("USER_CACHE_SECONDS", "300"))
+
+# user id -> detached copy of the User row
+_users = TTLCache(USER_CACHE_SECONDS, max_entries=5000, fallback_ttl_seconds=invalidation.CACHE_FALLBACK_SECONDS)
+invalidation.register("users", _users, int)
+
 
 def create_access_token(data:dict, expire_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -55,15 +64,27 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     )
 
     token_data = verify_access_token(token,credentials_exception)
-        
+
+    cached = _users.get(token_data.user_id)
+    if cached is not None:
+        # Attaches a copy to this request's session without a SELECT
+        return db.merge(cached, load=False)
+
     user = db.query(models.User).filter(models.User.id == token_data.user_id).first()
 
     if not user:
         raise HTTPException(status.HTTP_404_NOT_FOUND, detail="User not found")
-    
+
+    _users.set(user.id, _detached_copy(user))
     return user
 
 
+def _detached_copy(user: models.User) -> models.User:
+    copy = models.User(**{attr.key: getattr(user, attr.key) for attr in models.User.__mapper__.column_attrs})
+    make_transient_to_detached(copy)
+    return copy
+
+
 
 #------------------------------------Check for convenor---------------------------------------#
 def require_convenor_role(current_user: models.User = Depends(get_current_user)):
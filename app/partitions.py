@@ -0,0 +1,163 @@
+"""
+Maintenance for the month-partitioned meal_bookings table.
+
+    python -m app.partitions ensure --months-ahead 3
+    python -m app.partitions archive --keep-months 12 [--schema archive | --drop]
+
+Run `ensure` daily (cron or the host's scheduled jobs). It creates the
+partitions for the coming months and moves any rows that landed in
+meal_bookings_default into their proper partition.
+`archive` detaches partitions older than --keep-months and either moves
+them to the archive schema or drops them.
+"""
+import argparse
+import logging
+import os
+import re
+from datetime import date, datetime
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Connection
+
+logger = logging.getLogger(__name__)
+
+IST = ZoneInfo('Asia/Kolkata')
+PARENT_TABLE = "meal_bookings"
+DEFAULT_PARTITION = "meal_bookings_default"
+PARTITION_NAME = re.compile(r"^meal_bookings_(\d{4})_(\d{2})$")
+
+
+def add_months(month_start: date, months: int) -> date:
+    index = month_start.year * 12 + month_start.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month_start: date) -> str:
+    return f"{PARENT_TABLE}_{month_start:%Y_%m}"
+
+
+def list_partitions(conn: Connection) -> dict[str, date]:
+    """Returns {partition name: first day of its month} for the monthly partitions."""
+    rows = conn.execute(text("""
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = :parent
+    """), {"parent": PARENT_TABLE}).scalars().all()
+
+    partitions = {}
+    for name in rows:
+        match = PARTITION_NAME.match(name)
+        if match:
+            partitions[name] = date(int(match.group(1)), int(match.group(2)), 1)
+    return partitions
+
+
+def create_partition(conn: Connection, month_start: date):
+    """
+    Creates the partition for one month. Rows for that month sitting in the
+    default partition are moved into the new table before it is attached,
+    otherwise Postgres refuses the attach.
+    """
+    name = partition_name(month_start)
+    bounds = {"start": month_start, "end": add_months(month_start, 1)}
+
+    has_default = conn.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": DEFAULT_PARTITION}).scalar()
+    stray_rows = has_default and conn.execute(text(
+        f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE booking_date >= :start AND booking_date < :end)"
+    ), bounds).scalar()
+
+    if not stray_rows:
+        conn.execute(text(
+            f"CREATE TABLE {name} PARTITION OF {PARENT_TABLE} FOR VALUES FROM ('{bounds['start']}') TO ('{bounds['end']}')"
+        ))
+        logger.info(f"Created partition {name}")
+        return
+
+    conn.execute(text(f"CREATE TABLE {name} (LIKE {PARENT_TABLE} INCLUDING DEFAULTS)"))
+    moved = conn.execute(text(f"""
+        WITH moved AS (
+            DELETE FROM {DEFAULT_PARTITION} WHERE booking_date >= :start AND booking_date < :end RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+    """), bounds).rowcount
+    conn.execute(text(
+        f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {name} FOR VALUES FROM ('{bounds['start']}') TO ('{bounds['end']}')"
+    ))
+    logger.info(f"Created partition {name} and moved {moved} rows out of {DEFAULT_PARTITION}")
+
+
+def ensure_future_partitions(conn: Connection, months_ahead: int = 3, today: date | None = None) -> list[str]:
+    """Creates any missing partitions from the current month to `months_ahead` months from now."""
+    today = today or datetime.now(IST).date()
+    current_month = today.replace(day=1)
+    existing = set(list_partitions(conn).values())
+
+    created = []
+    for offset in range(months_ahead + 1):
+        month_start = add_months(current_month, offset)
+        if month_start not in existing:
+            create_partition(conn, month_start)
+            created.append(partition_name(month_start))
+    return created
+
+
+def archive_old_partitions(conn: Connection, keep_months: int = 12, schema: str | None = "archive",
+                           today: date | None = None) -> list[str]:
+    """
+    Detaches partitions that end more than `keep_months` months ago.
+    They are moved to `schema` (kept queryable for audits) or dropped when
+    schema is None.
+    """
+    today = today or datetime.now(IST).date()
+    cutoff = add_months(today.replace(day=1), -keep_months)
+
+    archived = []
+    for name, month_start in sorted(list_partitions(conn).items(), key=lambda item: item[1]):
+        if month_start >= cutoff:
+            continue
+        conn.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}"))
+        if schema:
+            conn.execute(text(f'CREATE SCHEMA IF NOT EXISTS "{schema}"'))
+            conn.execute(text(f'ALTER TABLE {name} SET SCHEMA "{schema}"'))
+            logger.info(f"Archived partition {name} to schema {schema}")
+        else:
+            conn.execute(text(f"DROP TABLE {name}"))
+            logger.info(f"Dropped partition {name}")
+        archived.append(name)
+    return archived
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ensure = commands.add_parser("ensure", help="create partitions for the coming months")
+    ensure.add_argument("--months-ahead", type=int, default=3)
+
+    archive = commands.add_parser("archive", help="detach old partitions")
+    archive.add_argument("--keep-months", type=int, default=12)
+    target = archive.add_mutually_exclusive_group()
+    target.add_argument("--schema", default="archive", help="schema the detached partitions are moved to")
+    target.add_argument("--drop", action="store_true", help="drop detached partitions instead of keeping them")
+
+    args = parser.parse_args()
+    if not args.database_url:
+        parser.error("--database-url or DATABASE_URL is required")
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    engine = create_engine(args.database_url)
+    with engine.begin() as conn:
+        if args.command == "ensure":
+            created = ensure_future_partitions(conn, args.months_ahead)
+            print(f"Created {len(created)} partition(s): {', '.join(created) or '-'}")
+        else:
+            archived = archive_old_partitions(conn, args.keep_months, None if args.drop else args.schema)
+            print(f"Detached {len(archived)} partition(s): {', '.join(archived) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
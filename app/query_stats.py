@@ -0,0 +1,93 @@
+import contextvars
+import logging
+import os
+from collections import Counter
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+# Statements slower than this (milliseconds) are logged; their parameters only in DEBUG mode
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+# The same statement running this many times in one request is flagged as a possible N+1
+REPEATED_QUERY_THRESHOLD = int(os.getenv("REPEATED_QUERY_THRESHOLD", "3"))
+# Debug mode adds Server-Timing / X-DB-Queries headers to every response
+DEBUG = os.getenv("DEBUG", "false").lower() in ("1", "true", "yes")
+
+
+class QueryStats:
+    """Statements executed while handling a single request."""
+    def __init__(self, scope: Scope):
+        self.scope = scope
+        self.count = 0
+        self.total_seconds = 0.0
+        self.statements: Counter = Counter()
+
+    @property
+    def route(self) -> str:
+        # The route is only known after routing, so read it lazily from the scope
+        route = self.scope.get("route")
+        return getattr(route, "path", self.scope.get("path", "-"))
+
+
+_current_stats: contextvars.ContextVar[QueryStats | None] = contextvars.ContextVar("query_stats", default=None)
+
+
+def record_query(statement: str, parameters, elapsed: float, failed: bool = False):
+    """
+    Called from the engine's after_cursor_execute hook in app/database.py,
+    and from its handle_error hook (failed=True) for statements that raise.
+    Sync handlers run in the thread pool with a copy of the request's context,
+    so they still see the QueryStats object created by the middleware.
+    """
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.count += 1
+        stats.total_seconds += elapsed
+        stats.statements[statement] += 1
+
+    elapsed_ms = elapsed * 1000
+    if elapsed_ms >= SLOW_QUERY_MS:
+        route = stats.route if stats is not None else "-"
+        # Parameters carry user data (emails, password hashes), so they stay out of production logs
+        params = f" | params={parameters!r:.500}" if DEBUG else ""
+        outcome = "Slow failed query" if failed else "Slow query"
+        logger.warning(f"{outcome} ({elapsed_ms:.1f} ms) on {route}: {statement}{params}")
+
+
+def _report_repeated_statements(stats: QueryStats):
+    for statement, times in stats.statements.items():
+        if times >= REPEATED_QUERY_THRESHOLD:
+            logger.warning(f"Possible N+1 on {stats.route}: statement ran {times} times in one request: {statement}")
+
+
+class QueryStatsMiddleware:
+    """
+    Counts and times the SQL statements of each request and flags statements
+    that repeat within it. In DEBUG mode the totals are also returned as
+    Server-Timing and X-DB-Queries response headers.
+    """
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats(scope)
+        token = _current_stats.set(stats)
+
+        async def send_wrapper(message: Message) -> None:
+            if DEBUG and message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", f'db;dur={stats.total_seconds * 1000:.2f};desc="{stats.count} queries"')
+                headers.append("X-DB-Queries", str(stats.count))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_stats.reset(token)
+            _report_repeated_statements(stats)
@@ -0,0 +1,75 @@
+import hashlib
+import os
+import threading
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# After a client writes, its reads go to the primary for this many seconds so
+# it sees its own change even if the replica is behind. Keep it above the
+# replica's usual replay lag.
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+# Expired entries are pruned once the table grows past this size
+MAX_TRACKED_WRITERS = 10000
+
+UNSAFE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+# sha256 of the Authorization header -> time.monotonic() until which reads stay on the primary.
+# The table is per process: with several workers, a read may land on a
+# worker that did not see the write, which is what the window's length covers.
+_recent_writers: dict[str, float] = {}
+_lock = threading.Lock()
+
+
+def writer_key(authorization: str | None) -> str | None:
+    if not authorization:
+        return None
+    return hashlib.sha256(authorization.encode()).hexdigest()
+
+
+def note_write(key: str):
+    until = time.monotonic() + READ_YOUR_WRITES_SECONDS
+    with _lock:
+        _recent_writers[key] = until
+        if len(_recent_writers) > MAX_TRACKED_WRITERS:
+            now = time.monotonic()
+            for stale in [k for k, expires in _recent_writers.items() if expires <= now]:
+                del _recent_writers[stale]
+
+
+def wrote_recently(key: str | None) -> bool:
+    if key is None:
+        return False
+    return _recent_writers.get(key, 0.0) > time.monotonic()
+
+
+class ReadYourWritesMiddleware:
+    """
+    Remembers which clients (by bearer token) sent a POST/PUT/PATCH/DELETE
+    recently, so app.database.get_read_db can keep their reads on the primary.
+    The window is started when the write arrives, so a read racing an
+    in-flight write also goes to the primary, and restarted when the
+    response is sent, after the write has committed.
+    """
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in UNSAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        authorization = dict(scope["headers"]).get(b"authorization")
+        key = writer_key(authorization.decode("latin-1") if authorization else None)
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+
+        note_write(key)
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                note_write(key)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
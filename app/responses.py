@@ -0,0 +1,62 @@
+import hashlib
+from typing import Any, Iterable, Type
+
+import orjson
+from fastapi import Request, Response, status
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+from .compression import ENCODED_ETAG_CODINGS
+
+
+def fast_json(content: Any, status_code: int = 200, headers: dict | None = None) -> ORJSONResponse:
+    """
+    Returns pre-built data straight through orjson.
+    FastAPI skips response_model validation for Response objects, so only use
+    this for data we built ourselves from trusted database rows.
+    The response_model on the route is still used for the OpenAPI docs.
+    """
+    return ORJSONResponse(content=content, status_code=status_code, headers=headers)
+
+
+def rows_to_dicts(rows: Iterable[Any], schema: Type[BaseModel]) -> list[dict]:
+    """
+    Copies the fields declared on `schema` out of ORM rows without
+    running Pydantic validation on every row.
+    """
+    fields = tuple(schema.model_fields)
+    return [{field: getattr(row, field) for field in fields} for row in rows]
+
+
+def _opaque_tag(etag: str) -> str:
+    """The tag without W/ and without the suffix CompressionMiddleware adds to strong tags."""
+    tag = etag.strip().removeprefix("W/")
+    for coding in ENCODED_ETAG_CODINGS:
+        if tag.endswith(f'-{coding}"'):
+            return tag[:-len(coding) - 2] + '"'
+    return tag
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Weak comparison of `etag` against the request's If-None-Match header."""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    wanted = _opaque_tag(etag)
+    return any(_opaque_tag(tag) == wanted for tag in if_none_match.split(","))
+
+
+def cached_json(request: Request, content: Any, cache_control: str = "private, no-cache") -> Response:
+    """
+    Like fast_json(), plus an ETag computed from the serialized body. A client
+    that sends the same ETag back in If-None-Match gets an empty 304.
+    The tag is weak because the compression middleware may re-encode the body.
+    """
+    body = orjson.dumps(content)
+    etag = f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
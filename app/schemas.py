@@ -1,5 +1,5 @@
 from pydantic import BaseModel,EmailStr
-from typing import Optional,List
+from typing import Optional,List,Literal
 from datetime import datetime,date
 from enum import Enum
 
@@ -116,15 +116,97 @@ class MealListItem(BaseModel):
     lunch_pick: Optional[List[str]] = None
     dinner_pick: Optional[List[str]] = None
 
+# Query parameters of the meal list endpoints. Without any, the full list is returned.
+class MealListQuery(BaseModel):
+    summary_only: bool = False
+    meal: Optional[Literal["lunch", "dinner"]] = None
+    # Only bookings whose pick includes this dish (by name)
+    item: Optional[str] = None
+    room_from: Optional[int] = None
+    room_to: Optional[int] = None
+    sort: Literal["name", "room"] = "name"
+
 # This is the final, complete response model for the meal list endpoints.
 # It includes the detailed list of bookings and a helpful summary of item counts.
+# The fields of a meal left out with ?meal=, and bookings with ?summary_only=true, are omitted.
 class MealListOut(BaseModel):
     booking_date: date
-    total_lunch_bookings: int
-    total_dinner_bookings: int
+    total_lunch_bookings: Optional[int] = None
+    total_dinner_bookings: Optional[int] = None
+    lunch_item_counts: Optional[dict] = None
+    dinner_item_counts: Optional[dict] = None
+    bookings: Optional[List[MealListItem]] = None
+
+    class Config:
+        from_attributes = True
+
+
+#------------------------------------FORECAST-------------------------------------#
+class ItemForecast(BaseModel):
+    booked: int
+    expected: int
+
+# expected = bookings so far plus what usually still arrives before the cutoff.
+# closed: the cutoff has passed, so expected == booked.
+# similar_days: the past days (same weekday) the forecast is based on.
+class MealForecast(BaseModel):
+    booked: int
+    expected: int
+    closed: bool
+    similar_days: int
+    item_counts: dict[str, ItemForecast]
+
+class MealForecastOut(BaseModel):
+    booking_date: date
+    lunch: MealForecast
+    dinner: MealForecast
+
+
+#--------------------------------------BILLING------------------------------------#
+# One student's meals for the month
+class BillingUserOut(BaseModel):
+    user_id: int
+    user_name: str
+    room_number: Optional[int] = None
+    lunch_count: int
+    dinner_count: int
     lunch_item_counts: dict
     dinner_item_counts: dict
-    bookings: List[MealListItem]
+
+# rolled_up_through is the last day included; days after it are still open for booking
+class MonthlyBillOut(BaseModel):
+    billing_month: date
+    rolled_up_through: Optional[date] = None
+    total_lunch: int
+    total_dinner: int
+    users: List[BillingUserOut]
+
+
+#---------------------------------------HOME---------------------------------------#
+# Everything the app shows on launch. A part that failed to load is null
+# (or empty for notices) and has a message under its name in `errors`.
+class HomeOut(BaseModel):
+    user: UserOut
+    menu: Optional[DailyMenuOut] = None
+    booking: Optional[MealListItem] = None
+    notices: List[NoticeOut]
+    errors: dict
+
+
+#--------------------------------------ISSUES--------------------------------------#
+# Created from a multipart form (title, description, image), so there is no IssueCreate.
+# thumbnail_url is null until the thumbnail has been made, a moment after the upload.
+class IssueOut(BaseModel):
+    id: int
+    title: str
+    description: str
+    image_url: str
+    thumbnail_url: Optional[str] = None
+    posted_by: Optional[int] = None
+    created_at: datetime
+    is_resolved: bool
+    resolved_at: Optional[datetime] = None
+    resolved_by: Optional[int] = None
 
     class Config:
         from_attributes = True
@@ -1,12 +1,32 @@
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail
 from pydantic import EmailStr
 import os
+import time
+
+from .metrics import EMAIL_LATENCY, EMAIL_FAILURES
 
 # We will need the MAIL_FROM address from our environment
 MAIL_FROM = os.getenv("MAIL_FROM", "default@example.com") 
 SENDGRID_API_KEY = os.getenv("SENDGRID_API_KEY")
 
+# The sendgrid SDK is imported and the client built on the first email, not at
+# startup: most requests never send one, so a cold start should not pay for it.
+_client = None
+
+
+def get_email_client():
+    global _client
+    if _client is None:
+        from sendgrid import SendGridAPIClient
+        _client = SendGridAPIClient(SENDGRID_API_KEY)
+    return _client
+
+
+def close_email_client():
+    """Called from the app's lifespan on shutdown."""
+    global _client
+    _client = None
+
+
 def send_verification_email(email: EmailStr, name: str, token: str):
     """
     Sends the account verification email to a new user using SendGrid.
@@ -22,17 +42,22 @@ def send_verification_email(email: EmailStr, name: str, token: str):
         <a href="https://hostel-mess-backend.onrender.com/auth/verifyemail?token={token}">Verify Your Email</a>
     </body></html>
     """
+    from sendgrid.helpers.mail import Mail
     message = Mail(
         from_email=MAIL_FROM,
         to_emails=email,
         subject='Hostel Mess: Verify Your Email',
         html_content=html_content
     )
+    start = time.perf_counter()
     try:
-        sg = SendGridAPIClient(SENDGRID_API_KEY)
+        sg = get_email_client()
         sg.send(message)
     except Exception as e:
+        EMAIL_FAILURES.labels("verification").inc()
         print(f"Error sending email via SendGrid: {e}")
+    finally:
+        EMAIL_LATENCY.labels("verification").observe(time.perf_counter() - start)
 
 
 def send_password_reset_email(email: EmailStr, name: str, token: str):
@@ -60,6 +85,7 @@ def send_password_reset_email(email: EmailStr, name: str, token: str):
     </body>
     </html>
     """
+    from sendgrid.helpers.mail import Mail
     message = Mail(
         from_email=MAIL_FROM,
         to_emails=email,
@@ -73,9 +99,13 @@ def send_password_reset_email(email: EmailStr, name: str, token: str):
         print(f"DEBUG: Using API Key: {masked_key}")
         print(f"DEBUG: Key Length: {len(SENDGRID_API_KEY)}")
         
+    start = time.perf_counter()
     try:
-        sg = SendGridAPIClient(SENDGRID_API_KEY)
+        sg = get_email_client()
         sg.send(message)
         print(f"Password reset email sent to {email}.")
     except Exception as e:
-        print(f"FATAL: Error sending password reset email via SendGrid: {e}")
\ No newline at end of file
+        EMAIL_FAILURES.labels("password_reset").inc()
+        print(f"FATAL: Error sending password reset email via SendGrid: {e}")
+    finally:
+        EMAIL_LATENCY.labels("password_reset").observe(time.perf_counter() - start)
\ No newline at end of file
@@ -0,0 +1,131 @@
+"""
+Frozen meal lists for days whose booking has closed.
+
+Once a day's last cutoff (TODAY_CUTOFF_HOUR, for dinner) has passed, its
+bookings cannot change any more (see Routers/booking.validate_booking_time).
+The meal list and its CSV download are then built one last time and
+stored in meal_list_snapshots. From then on GET /meallist/today,
+/meallist/{date} and /meallist/{date}/download serve the stored bytes
+with a strong ETag and a Cache-Control that lets clients keep them.
+
+Each worker runs run_at_cutoff(), which stores today's snapshot
+SNAPSHOT_GRACE_SECONDS after the cutoff, leaving time for bookings that
+were accepted just before it to commit. A closed day without a snapshot
+(e.g. the host was asleep at the cutoff) gets one on its first read.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+from datetime import date, datetime, timedelta
+from typing import Callable
+from zoneinfo import ZoneInfo
+
+import orjson
+from fastapi import Request, Response
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from . import database, models
+from .cache import TTLCache
+from .responses import etag_matches
+from .Routers.booking import TODAY_CUTOFF_HOUR
+
+logger = logging.getLogger(__name__)
+
+IST = ZoneInfo('Asia/Kolkata')
+
+SNAPSHOT_GRACE_SECONDS = float(os.getenv("SNAPSHOT_GRACE_SECONDS", "60"))
+# Snapshots never change, so the entries only expire to bound memory
+SNAPSHOT_CACHE_SECONDS = float(os.getenv("SNAPSHOT_CACHE_SECONDS", "3600"))
+# Authenticated, so private; a year is the longest max-age clients honour
+IMMUTABLE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+# booking_date -> {"json_body", "json_etag", "csv_body", "csv_etag"}
+_snapshots = TTLCache(SNAPSHOT_CACHE_SECONDS, max_entries=32)
+
+
+def frozen_from(booking_date: date) -> datetime:
+    """When the meal list of `booking_date` stops changing."""
+    cutoff = datetime(booking_date.year, booking_date.month, booking_date.day, TODAY_CUTOFF_HOUR, tzinfo=IST)
+    return cutoff + timedelta(seconds=SNAPSHOT_GRACE_SECONDS)
+
+
+def is_frozen(booking_date: date, now: datetime | None = None) -> bool:
+    return (now or datetime.now(IST)) >= frozen_from(booking_date)
+
+
+def _strong_etag(body: bytes) -> str:
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def _to_dict(row: models.MealListSnapshot) -> dict:
+    return {"json_body": row.json_body, "json_etag": row.json_etag, "csv_body": row.csv_body, "csv_etag": row.csv_etag}
+
+
+def get(db: Session, booking_date: date) -> dict | None:
+    snapshot = _snapshots.get(booking_date)
+    if snapshot is None:
+        row = db.get(models.MealListSnapshot, booking_date)
+        if row is None:
+            return None
+        snapshot = _to_dict(row)
+        _snapshots.set(booking_date, snapshot)
+    return snapshot
+
+
+def store(db: Session, booking_date: date, payload: dict, csv_body: bytes) -> dict:
+    """
+    Stores the snapshot of `booking_date` unless another worker already has,
+    and returns whichever was stored first. Does not commit.
+    """
+    json_body = orjson.dumps(payload)
+    db.execute(insert(models.MealListSnapshot).values(
+        booking_date=booking_date,
+        json_body=json_body, json_etag=_strong_etag(json_body),
+        csv_body=csv_body, csv_etag=_strong_etag(csv_body),
+    ).on_conflict_do_nothing(index_elements=["booking_date"]))
+    row = db.query(models.MealListSnapshot).filter(models.MealListSnapshot.booking_date == booking_date).one()
+    return _to_dict(row)
+
+
+def respond(request: Request, snapshot: dict, kind: str, media_type: str, headers: dict | None = None) -> Response:
+    """Serves snapshot[f"{kind}_body"], or an empty 304 when the client already has it."""
+    headers = {**(headers or {}), "ETag": snapshot[f"{kind}_etag"], "Cache-Control": IMMUTABLE_CACHE_CONTROL}
+    if etag_matches(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=snapshot[f"{kind}_body"], media_type=media_type, headers=headers)
+
+
+def respond_json(request: Request, content: dict) -> Response:
+    """
+    Serves something else built from a closed day's bookings (such as a
+    filtered meal list) with the same strong ETag and Cache-Control as a snapshot.
+    """
+    body = orjson.dumps(content)
+    return respond(request, {"json_body": body, "json_etag": _strong_etag(body)}, "json", "application/json")
+
+
+def clear_cache():
+    _snapshots.clear()
+
+
+async def run_at_cutoff(freeze: Callable[[Session, date], dict | None]):
+    """
+    Calls freeze(db, today) with a new session on the primary once today's
+    meal list is frozen, every day, until cancelled from the app's lifespan.
+    """
+    while True:
+        now = datetime.now(IST)
+        day = now.date() if not is_frozen(now.date(), now) else now.date() + timedelta(days=1)
+        await asyncio.sleep((frozen_from(day) - now).total_seconds())
+        try:
+            await run_in_threadpool(_freeze_with_session, freeze, day)
+        except Exception:
+            logger.exception(f"Could not store the meal list snapshot for {day}")
+
+
+def _freeze_with_session(freeze: Callable[[Session, date], dict | None], day: date):
+    with database.SessionLocal() as db:
+        freeze(db, day)
@@ -0,0 +1,72 @@
+"""
+Thumbnails for uploaded photos, made in a separate process pool so that
+decoding and resizing a phone photo never holds up the event loop or the
+request threads. Needs Pillow; without it no thumbnails are made.
+
+The pool's processes read the photo from the blob store and write the
+thumbnail back themselves, so the photo is never copied into, or pickled
+out of, the web worker. They are spawned and import this module again,
+which is why it only imports the standard library and app.blob_store.
+"""
+import asyncio
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from importlib.util import find_spec
+from typing import BinaryIO
+
+from . import blob_store
+
+# Longest side of a thumbnail, in pixels
+THUMBNAIL_SIZE = int(os.getenv("THUMBNAIL_SIZE", "320"))
+THUMBNAIL_WORKERS = int(os.getenv("THUMBNAIL_WORKERS", "1"))
+THUMBNAIL_QUALITY = 80
+
+_pool: ProcessPoolExecutor | None = None
+
+
+def available() -> bool:
+    return find_spec("PIL") is not None
+
+
+def make_thumbnail(source: BinaryIO, size: int) -> bytes:
+    """Returns a JPEG no larger than size x size."""
+    from PIL import Image, ImageOps
+
+    with Image.open(source) as image:
+        # Phone cameras store the rotation in EXIF instead of rotating the pixels
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((size, size))
+        out = io.BytesIO()
+        image.convert("RGB").save(out, "JPEG", quality=THUMBNAIL_QUALITY)
+    return out.getvalue()
+
+
+def thumbnail_blob(image_key: str, thumbnail_key: str, size: int):
+    """Runs in a pool process."""
+    store = blob_store.get_blob_store()
+    with store.open(image_key) as source:
+        thumbnail = make_thumbnail(source, size)
+    store.save(thumbnail_key, io.BytesIO(thumbnail))
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # Spawned rather than forked: the worker has threads and open connections
+        _pool = ProcessPoolExecutor(max_workers=THUMBNAIL_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+async def render(image_key: str, thumbnail_key: str):
+    """Stores a thumbnail of blob `image_key` as `thumbnail_key`."""
+    await asyncio.get_running_loop().run_in_executor(_get_pool(), thumbnail_blob, image_key, thumbnail_key, THUMBNAIL_SIZE)
+
+
+def shutdown_pool():
+    """Called from the app's lifespan on shutdown."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
@@ -1,9 +1,15 @@
-from passlib.context import CryptContext
+from functools import lru_cache
 
-pwd_context = CryptContext(schemes=["bcrypt"],deprecated="auto")
+
+# passlib (and its bcrypt backend) is imported on the first password check
+# rather than at startup; most requests authenticate with a JWT only.
+@lru_cache(maxsize=None)
+def get_pwd_context():
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"],deprecated="auto")
 
 def hash_password(password:str):
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 def verify_password(plain_password:str , hashed_password:str):
-    return pwd_context.verify(plain_password,hashed_password)
\ No newline at end of file
+    return get_pwd_context().verify(plain_password,hashed_password)
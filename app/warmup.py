@@ -0,0 +1,95 @@
+"""
+Startup warm-up, so the first requests a worker serves do not pay for
+opening database connections, loading the bcrypt backend or reading the
+day's menus. GET /ready reports 503 until run_warmup() has finished.
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+
+from . import database, invalidation, menu_items, utils
+
+logger = logging.getLogger(__name__)
+
+IST = ZoneInfo('Asia/Kolkata')
+
+# Connections opened per engine before the worker reports ready. Capped at the pool's size,
+# since connections beyond it are closed as soon as they are returned.
+WARMUP_CONNECTIONS = int(os.getenv("WARMUP_CONNECTIONS", "5"))
+# If a warm-up step fails (e.g. the database is still starting), it is retried after this many seconds
+WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", "5"))
+# Menus are preloaded once the cache invalidation listener is connected, so
+# they get the normal cache TTL instead of the short fallback one
+WARMUP_LISTENER_WAIT_SECONDS = 5
+
+_ready = False
+
+
+def is_ready() -> bool:
+    return _ready
+
+
+def reset():
+    global _ready
+    _ready = False
+
+
+def open_connections(engine, count: int) -> int:
+    """
+    Checks out `count` connections at the same time, so the pool has to
+    open that many, and runs a trivial query on each. They stay in the pool
+    when they are returned.
+    """
+    count = min(count, engine.pool.size())
+    connections = []
+    try:
+        for _ in range(count):
+            connection = engine.connect()
+            connections.append(connection)
+            connection.execute(text("SELECT 1"))
+    finally:
+        for connection in connections:
+            connection.close()
+    return len(connections)
+
+
+def load_password_hashing():
+    # The first bcrypt call imports passlib and selects/self-tests the backend
+    utils.hash_password("warm-up")
+
+
+def preload_todays_menus() -> int:
+    today = datetime.now(IST).date()
+    db = database.SessionLocal()
+    try:
+        return menu_items.preload_menus(db, [today, today + timedelta(days=1)])
+    finally:
+        db.close()
+
+
+def warm_up():
+    engines = [database.engine, database.replica_engine]
+    opened = sum(open_connections(engine, WARMUP_CONNECTIONS) for engine in engines if engine is not None)
+    load_password_hashing()
+    invalidation.wait_until_connected(WARMUP_LISTENER_WAIT_SECONDS)
+    menus = preload_todays_menus()
+    logger.info(f"Warm-up done: {opened} connection(s) opened, {menus} menu(s) preloaded")
+
+
+async def run_warmup():
+    """Started as a task from the app's lifespan. Retries until warm-up succeeds."""
+    global _ready
+    while True:
+        try:
+            await run_in_threadpool(warm_up)
+        except Exception as e:
+            logger.warning(f"Warm-up failed, retrying in {WARMUP_RETRY_SECONDS}s: {e}")
+            await asyncio.sleep(WARMUP_RETRY_SECONDS)
+        else:
+            _ready = True
+            return
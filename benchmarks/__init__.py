@@ -0,0 +1,7 @@
+"""
+Load-test and benchmark suite.
+
+    python -m benchmarks.seed --users 500 --days 30      # synthetic hostel data
+    python -m benchmarks.run --base-url http://localhost:8000
+    python -m benchmarks.compare OLD.json NEW.json
+"""
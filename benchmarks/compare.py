@@ -0,0 +1,38 @@
+"""
+Compares two result files written by benchmarks.run.
+
+    python -m benchmarks.compare benchmarks/results/OLD.json benchmarks/results/NEW.json
+"""
+import argparse
+import json
+from pathlib import Path
+
+METRICS = ["rps", "p50_ms", "p95_ms", "p99_ms", "errors"]
+
+
+def change(old: float, new: float) -> str:
+    if not old:
+        return "    n/a"
+    return f"{(new - old) / old * 100:+6.1f}%"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("old", type=Path)
+    parser.add_argument("new", type=Path)
+    args = parser.parse_args()
+
+    old = json.loads(args.old.read_text())
+    new = json.loads(args.new.read_text())
+    print(f"{old['revision']} -> {new['revision']}")
+
+    for name in sorted(set(old["scenarios"]) & set(new["scenarios"])):
+        print(f"\n{name}")
+        for metric in METRICS:
+            before = old["scenarios"][name][metric]
+            after = new["scenarios"][name][metric]
+            print(f"  {metric:8s} {before:10.2f} -> {after:10.2f}  {change(before, after)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Benchmark for GET /meallist/{date}/forecast (app/forecast.py).
+
+Seeds --days of booking history for --users students inside a transaction
+that is rolled back at the end, then times:
+
+  * loading the whole history with the one aggregate query,
+  * the daily incremental refresh (one new closed day),
+  * the vectorized forecast for tomorrow's dinner,
+  * a row-by-row Python version of the same forecast, for comparison.
+
+    python -m benchmarks.forecast --users 600 --days 730
+"""
+import argparse
+import os
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+import numpy as np
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from app import forecast, partitions
+
+IST = forecast.IST
+
+
+def seed(session: Session, users: int, days: int, today: date):
+    connection = session.connection()
+    is_partitioned = connection.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'meal_bookings'::regclass)"
+    )).scalar()
+    if is_partitioned:
+        existing = set(partitions.list_partitions(connection).values())
+        month = (today - timedelta(days=days)).replace(day=1)
+        while month <= today:
+            if month not in existing:
+                partitions.create_partition(connection, month)
+            month = partitions.add_months(month, 1)
+
+    connection.execute(text("""
+        INSERT INTO users (name, email, hashed_password, room_number, is_active)
+        SELECT 'Forecast User ' || g, 'forecast_user_' || g || '@example.com', 'not-a-hash', 100 + g % 400, true
+        FROM generate_series(1, :users) AS g
+    """), {"users": users})
+    connection.execute(text("""
+        INSERT INTO menu_items (name) SELECT 'Forecast Dish ' || g FROM generate_series(1, 12) AS g ON CONFLICT DO NOTHING
+    """))
+    dishes = connection.execute(text("SELECT id FROM menu_items WHERE name LIKE 'Forecast Dish %' ORDER BY id")).scalars().all()
+    # Weekends are quieter; bookings arrive over the four days before each cutoff, most of them late
+    connection.execute(text("""
+        INSERT INTO meal_bookings (user_id, booking_date, lunch_item_ids, dinner_item_ids, created_at)
+        SELECT u.id, d.day,
+               CASE WHEN random() < 0.8 THEN ARRAY[(CAST(:dishes AS integer[]))[1 + (u.id + d.n) % 6], (CAST(:dishes AS integer[]))[7]] END,
+               CASE WHEN random() < 0.9 THEN ARRAY[(CAST(:dishes AS integer[]))[8 + (u.id + d.n) % 5]] END,
+               (d.day + interval '7 hours') AT TIME ZONE 'Asia/Kolkata' - power(random(), 2) * interval '96 hours'
+        FROM users u
+        CROSS JOIN (SELECT CAST(:today AS date) - n AS day, n FROM generate_series(1, :days) AS n) AS d
+        WHERE u.email LIKE 'forecast_user_%'
+          AND random() < CASE WHEN extract(isodow FROM d.day) >= 6 THEN 0.6 ELSE 0.85 END
+    """), {"users": users, "days": days, "today": today, "dishes": dishes})
+    return dishes
+
+
+def row_by_row(session: Session, target: date, lead_hours: float, start: date) -> float:
+    """The same dinner total as forecast_meal, from raw rows in Python loops."""
+    rows = session.execute(text("""
+        SELECT booking_date, created_at FROM meal_bookings
+        WHERE booking_date >= :start AND booking_date < :target AND cardinality(dinner_item_ids) > 0
+          AND extract(isodow FROM booking_date) = :isodow
+    """), {"start": start, "target": target, "isodow": target.isoweekday()}).all()
+    final, in_by_now = defaultdict(int), defaultdict(int)
+    for booking_date, created_at in rows:
+        cutoff = datetime(booking_date.year, booking_date.month, booking_date.day, forecast.CUTOFF_HOURS[1], tzinfo=IST)
+        final[booking_date] += 1
+        lead = (cutoff - created_at).total_seconds() / 3600
+        bucket = int(np.searchsorted(forecast.LEAD_EDGES_HOURS, lead, side="right"))
+        if forecast.LEAD_LOWER_EDGES[bucket] >= lead_hours:
+            in_by_now[booking_date] += 1
+    weights = {day: 0.5 ** ((target - day).days / 7 / forecast.FORECAST_HALF_LIFE_WEEKS) for day in final}
+    weighted_final = sum(weights[day] * final[day] for day in final)
+    level = weighted_final / sum(weights.values())
+    return level * (1 - sum(weights[day] * in_by_now[day] for day in final) / weighted_final)
+
+
+def timed(fn, repeat: int = 1) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--users", type=int, default=600)
+    parser.add_argument("--days", type=int, default=730)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    if not args.database_url:
+        parser.error("--database-url or DATABASE_URL is required")
+
+    engine = create_engine(args.database_url)
+    connection = engine.connect()
+    transaction = connection.begin()
+    session = Session(bind=connection)
+    try:
+        today = datetime.now(IST).date()
+        start = time.perf_counter()
+        seed(session, args.users, args.days, today)
+        connection.execute(text("ANALYZE meal_bookings"))
+        bookings = connection.execute(text("SELECT count(*) FROM meal_bookings WHERE booking_date < :today"), {"today": today}).scalar()
+        print(f"Seeded {bookings} bookings over {args.days} days in {time.perf_counter() - start:.1f}s")
+
+        yesterday = today - timedelta(days=1)
+        history = forecast.BookingHistory(args.days)
+        print(f"full load ({args.days} days, one query):  {timed(lambda: history.refresh(session, yesterday - timedelta(days=1))):8.1f} ms")
+        print(f"incremental refresh (1 new day):     {timed(lambda: history.refresh(session, yesterday)):8.1f} ms")
+        print(f"history arrays: {(history.bookings.nbytes + history.picks.nbytes) / 1024:.0f} KiB")
+
+        target = today + timedelta(days=1)
+        now = datetime.now(IST)
+        lead_hours = (datetime(target.year, target.month, target.day, forecast.CUTOFF_HOURS[1], tzinfo=IST) - now).total_seconds() / 3600
+        item_ids = history.item_ids[-5:]
+        booked_picks = np.zeros(len(item_ids), dtype=np.int64)
+        vectorized = lambda: forecast.forecast_meal(history, 1, target, lead_hours, 0, booked_picks, item_ids)  # noqa: E731
+        print(f"vectorized forecast (dinner):        {timed(vectorized, args.repeat):8.3f} ms")
+        slow = lambda: row_by_row(session, target, lead_hours, history.start)  # noqa: E731
+        print(f"row-by-row forecast (dinner):        {timed(slow, 3):8.1f} ms")
+        print(f"expected remaining dinners: vectorized {vectorized()[0]:.1f}, row-by-row {slow():.1f}")
+    finally:
+        session.close()
+        transaction.rollback()
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
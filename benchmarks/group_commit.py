@@ -0,0 +1,76 @@
+"""
+Benchmark for the booking write batcher (app/booking_batcher.py).
+
+Runs the booking_rush scenario against a running server and reports, besides
+the latency percentiles, how many transactions the database committed and how
+many times it flushed its WAL to disk while the rush lasted (from
+pg_stat_database and pg_stat_wal). Run it once against a server without
+and once with BOOKING_BATCH_WINDOW_MS:
+
+    uvicorn app.main:app --workers 4 &
+    python -m benchmarks.group_commit --label per-request
+    BOOKING_BATCH_WINDOW_MS=5 uvicorn app.main:app --workers 4 &
+    python -m benchmarks.group_commit --label batched
+
+The counters cover the whole database, so nothing else should be using it.
+"""
+import argparse
+import asyncio
+import os
+
+import httpx
+from sqlalchemy import create_engine, text
+
+from .run import load_users, summarize
+from .scenarios import ScenarioContext, booking_rush
+
+COUNTERS_SQL = text("""
+    SELECT (SELECT xact_commit FROM pg_stat_database WHERE datname = current_database()) AS commits,
+           (SELECT wal_sync FROM pg_stat_wal) AS wal_syncs
+""")
+
+
+def read_counters(engine) -> dict:
+    with engine.connect() as conn:
+        # Statistics are cached for the rest of a transaction; start from fresh ones
+        conn.execute(text("SELECT pg_stat_clear_snapshot()"))
+        return dict(conn.execute(COUNTERS_SQL).one()._mapping)
+
+
+async def rush(args, students, admins):
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        ctx = ScenarioContext(client, students, admins, args.concurrency, args.requests)
+        return await booking_rush(ctx)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--label", default="")
+    args = parser.parse_args()
+    if not args.database_url:
+        parser.error("--database-url or DATABASE_URL is required")
+
+    students, admins = load_users(args.database_url)
+    engine = create_engine(args.database_url)
+    before = read_counters(engine)
+    samples, duration = asyncio.run(rush(args, students, admins))
+    after = read_counters(engine)
+    engine.dispose()
+
+    summary = summarize(samples, duration)
+    commits = after["commits"] - before["commits"]
+    wal_syncs = after["wal_syncs"] - before["wal_syncs"]
+    print(f"{args.label or 'booking_rush':14s} requests={summary['requests']}  rps={summary['rps']:.1f}  "
+          f"p50={summary['p50_ms']:.1f}ms  p99={summary['p99_ms']:.1f}ms  errors={summary['errors']}")
+    print(f"{'':14s} commits={commits} ({commits / summary['requests']:.2f}/request)  "
+          f"wal_syncs={wal_syncs} ({wal_syncs / summary['requests']:.2f}/request)")
+
+
+if __name__ == "__main__":
+    main()
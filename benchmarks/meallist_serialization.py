@@ -0,0 +1,83 @@
+"""
+Benchmark for the /meallist/{date} response path.
+
+Compares the old path (Pydantic response_model validation + stdlib json)
+with the orjson path, and prints the body size on the wire for identity,
+gzip and brotli encodings.
+
+    python -m benchmarks.meallist_serialization --students 800 --repeat 200
+"""
+import argparse
+import gzip
+import json
+import random
+import time
+from datetime import date
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+
+from app import schemas
+from app.Routers.meallist import process_meal_list_results
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+LUNCH_ITEMS = ["Rice", "Dal", "Paneer Butter Masala", "Roti", "Salad", "Curd"]
+DINNER_ITEMS = ["Rice", "Chicken Curry", "Egg Curry", "Roti", "Mixed Veg", "Kheer"]
+
+
+class Row:
+    def __init__(self, user_name, room_number, lunch_pick, dinner_pick):
+        self.user_name = user_name
+        self.room_number = room_number
+        self.lunch_pick = lunch_pick
+        self.dinner_pick = dinner_pick
+
+
+def fake_rows(students: int) -> list:
+    rng = random.Random(42)
+    rows = []
+    for i in range(students):
+        lunch = rng.sample(LUNCH_ITEMS, rng.randint(0, 3)) or None
+        dinner = rng.sample(DINNER_ITEMS, rng.randint(0, 3)) or None
+        rows.append(Row(f"Student {i:04d}", 100 + i % 400, lunch, dinner))
+    return rows
+
+
+def timed(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, default=800)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    payload = process_meal_list_results(fake_rows(args.students), date.today())
+
+    def old_path():
+        validated = schemas.MealListOut.model_validate(payload)
+        return json.dumps(jsonable_encoder(validated), ensure_ascii=False, separators=(",", ":")).encode()
+
+    def new_path():
+        return orjson.dumps(payload)
+
+    body = new_path()
+    print(f"students: {args.students}")
+    print(f"validate + json : {timed(old_path, args.repeat):8.3f} ms")
+    print(f"orjson          : {timed(new_path, args.repeat):8.3f} ms")
+    print(f"identity bytes  : {len(body):8d}")
+    print(f"gzip bytes      : {len(gzip.compress(body, compresslevel=6)):8d}")
+    if brotli is not None:
+        print(f"brotli bytes    : {len(brotli.compress(body, quality=4)):8d}")
+
+
+if __name__ == "__main__":
+    main()
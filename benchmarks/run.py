@@ -0,0 +1,138 @@
+"""
+Runs the load-test scenarios against a running server and stores the
+results as JSON so runs can be compared across commits.
+
+    uvicorn app.main:app --workers 4 &
+    python -m benchmarks.run --base-url http://localhost:8000 --scenario all
+
+Tokens are minted locally with app.oauth2, so SECRET_KEY/ALGORITHM must
+match the server's. Seed the database first with `python -m benchmarks.seed`.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+from sqlalchemy import create_engine, select
+
+from app import models, oauth2
+from .scenarios import SCENARIOS, BenchUser, ScenarioContext
+from .seed import bench_users_filter
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(samples, duration: float) -> dict:
+    latencies = sorted(sample.latency * 1000 for sample in samples)
+    errors = sum(1 for sample in samples if sample.status == 0 or sample.status >= 500)
+    status_counts: dict[str, int] = {}
+    for sample in samples:
+        status_counts[str(sample.status)] = status_counts.get(str(sample.status), 0) + 1
+
+    return {
+        "requests": len(samples),
+        "duration_s": round(duration, 3),
+        "rps": round(len(samples) / duration, 2) if duration else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "max_ms": round(latencies[-1], 2) if latencies else 0.0,
+        "errors": errors,
+        "status_counts": status_counts,
+    }
+
+
+def load_users(database_url: str) -> tuple[list[BenchUser], list[BenchUser]]:
+    engine = create_engine(database_url)
+    with engine.connect() as conn:
+        rows = conn.execute(
+            select(models.User.id, models.User.email, models.User.role)
+            .where(bench_users_filter(), models.User.is_mess_active == True)
+            .order_by(models.User.id)
+        ).all()
+    engine.dispose()
+
+    users = [BenchUser(row.id, row.email, row.role, oauth2.create_access_token({"user_id": row.id})) for row in rows]
+    students = [user for user in users if user.role == "student"]
+    admins = [user for user in users if user.role in ("convenor", "mess_committee")]
+    if not students or not admins:
+        raise SystemExit("No seeded bench users found. Run `python -m benchmarks.seed --reset` first.")
+    return students, admins
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def run_scenarios(args, students, admins) -> dict:
+    results = {}
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        for name in args.scenarios:
+            ctx = ScenarioContext(client, students, admins, args.concurrency, args.requests)
+            samples, duration = await SCENARIOS[name](ctx)
+            results[name] = summarize(samples, duration)
+            summary = results[name]
+            print(f"{name:18s} rps={summary['rps']:8.1f}  p50={summary['p50_ms']:8.1f}ms  "
+                  f"p95={summary['p95_ms']:8.1f}ms  p99={summary['p99_ms']:8.1f}ms  errors={summary['errors']}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--scenario", action="append", choices=[*SCENARIOS, "all"], help="repeatable; default all")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=1000, help="requests per scenario")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--label", default="", help="free-form note stored with the results")
+    parser.add_argument("--out", type=Path, default=RESULTS_DIR)
+    args = parser.parse_args()
+
+    if not args.database_url:
+        parser.error("--database-url or DATABASE_URL is required to look up the seeded users")
+    if not args.scenario or "all" in args.scenario:
+        args.scenarios = list(SCENARIOS)
+    else:
+        args.scenarios = args.scenario
+
+    students, admins = load_users(args.database_url)
+    results = asyncio.run(run_scenarios(args, students, admins))
+
+    revision = git_revision()
+    report = {
+        "revision": revision,
+        "label": args.label,
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "base_url": args.base_url,
+        "concurrency": args.concurrency,
+        "requests_per_scenario": args.requests,
+        "users": len(students) + len(admins),
+        "python": platform.python_version(),
+        "scenarios": results,
+    }
+    args.out.mkdir(parents=True, exist_ok=True)
+    out_file = args.out / f"{time.strftime('%Y%m%d-%H%M%S')}-{revision}.json"
+    out_file.write_text(json.dumps(report, indent=2))
+    print(f"Results written to {out_file}")
+
+
+if __name__ == "__main__":
+    main()
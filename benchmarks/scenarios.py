@@ -0,0 +1,130 @@
+"""
+Load-test scenarios. Each scenario is an async function that takes a
+ScenarioContext and returns the latency samples it collected.
+"""
+import asyncio
+import random
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import httpx
+
+from .seed import BENCH_PASSWORD
+
+IST = ZoneInfo('Asia/Kolkata')
+
+
+@dataclass
+class BenchUser:
+    id: int
+    email: str
+    role: str
+    token: str
+
+
+@dataclass
+class ScenarioContext:
+    client: httpx.AsyncClient
+    students: list[BenchUser]
+    admins: list[BenchUser]
+    concurrency: int
+    requests: int
+    rng: random.Random = field(default_factory=lambda: random.Random(7))
+
+
+@dataclass
+class Sample:
+    latency: float
+    status: int
+
+
+def auth(user: BenchUser) -> dict:
+    return {"Authorization": f"Bearer {user.token}"}
+
+
+async def run_requests(ctx: ScenarioContext, make_request) -> tuple[list[Sample], float]:
+    """
+    Runs ctx.requests calls of make_request(i) with at most ctx.concurrency in
+    flight. Returns the samples and the wall-clock duration of the run.
+    """
+    semaphore = asyncio.Semaphore(ctx.concurrency)
+    samples: list[Sample] = []
+
+    async def one(i: int):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await make_request(i)
+                status = response.status_code
+            except httpx.HTTPError:
+                status = 0
+            samples.append(Sample(time.perf_counter() - start, status))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(ctx.requests)))
+    return samples, time.perf_counter() - start
+
+
+#-------------------------------------Lunch Cut-off Booking Rush-------------------------------------#
+async def booking_rush(ctx: ScenarioContext):
+    """Every student upserts tomorrow's booking at once, like the minutes before the cut-off."""
+    tomorrow = (datetime.now(IST).date() + timedelta(days=1)).isoformat()
+    menu = (await ctx.client.get(f"/menus/{tomorrow}", headers=auth(ctx.admins[0]))).json()
+
+    def make_request(i: int):
+        user = ctx.students[i % len(ctx.students)]
+        body = {
+            "booking_date": tomorrow,
+            "lunch_pick": ctx.rng.sample(menu["lunch_options"], 2),
+            "dinner_pick": ctx.rng.sample(menu["dinner_options"], 2),
+        }
+        return ctx.client.post("/bookings/", json=body, headers=auth(user))
+
+    return await run_requests(ctx, make_request)
+
+
+#------------------------------------Meal List Refresh Storm-----------------------------------------#
+async def meallist_storm(ctx: ScenarioContext):
+    """Mess staff hammering the refresh button on today's and tomorrow's meal list."""
+    tomorrow = (datetime.now(IST).date() + timedelta(days=1)).isoformat()
+    paths = ["/meallist/today", f"/meallist/{tomorrow}"]
+
+    def make_request(i: int):
+        admin = ctx.admins[i % len(ctx.admins)]
+        return ctx.client.get(paths[i % len(paths)], headers=auth(admin))
+
+    return await run_requests(ctx, make_request)
+
+
+#-----------------------------------------Notice Broadcast-------------------------------------------#
+async def notice_broadcast(ctx: ScenarioContext):
+    """A few notices get posted (each one broadcasts) while students read the notice board."""
+    def make_request(i: int):
+        if i % 50 == 0:
+            admin = ctx.admins[i % len(ctx.admins)]
+            body = {"title": f"Bench notice {i}", "content": "Synthetic notice posted by the load test."}
+            return ctx.client.post("/notices/", json=body, headers=auth(admin))
+        user = ctx.students[i % len(ctx.students)]
+        return ctx.client.get("/notices/", headers=auth(user))
+
+    return await run_requests(ctx, make_request)
+
+
+#---------------------------------------------Login Burst--------------------------------------------#
+async def login_burst(ctx: ScenarioContext):
+    """Everyone opening the app and signing in at the same time (bcrypt bound)."""
+    def make_request(i: int):
+        user = ctx.students[i % len(ctx.students)]
+        return ctx.client.post("/auth/login", data={"username": user.email, "password": BENCH_PASSWORD})
+
+    return await run_requests(ctx, make_request)
+
+
+SCENARIOS = {
+    "booking_rush": booking_rush,
+    "meallist_storm": meallist_storm,
+    "notice_broadcast": notice_broadcast,
+    "login_burst": login_burst,
+}
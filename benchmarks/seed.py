@@ -0,0 +1,134 @@
+"""
+Seeds a local Postgres with synthetic hostel data for the load tests.
+
+    python -m benchmarks.seed --users 500 --days 30 --reset
+
+Every seeded user has an email like bench_user_00042@example.com and the
+password BENCH_PASSWORD, so the login burst scenario can sign in as them.
+"""
+import argparse
+import os
+import random
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import create_engine, delete, insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app import models, utils
+
+IST = ZoneInfo('Asia/Kolkata')
+BENCH_EMAIL_DOMAIN = "example.com"
+BENCH_EMAIL_PREFIX = "bench_user_"
+BENCH_PASSWORD = "bench-password"
+
+LUNCH_ITEMS = ["Rice", "Dal", "Rajma", "Paneer Butter Masala", "Aloo Gobi", "Roti", "Salad", "Curd", "Papad"]
+DINNER_ITEMS = ["Rice", "Chicken Curry", "Egg Curry", "Dal Makhani", "Roti", "Mixed Veg", "Kheer", "Fish Fry"]
+
+
+def bench_email(index: int) -> str:
+    return f"{BENCH_EMAIL_PREFIX}{index:05d}@{BENCH_EMAIL_DOMAIN}"
+
+
+def bench_users_filter():
+    return models.User.email.like(f"{BENCH_EMAIL_PREFIX}%@{BENCH_EMAIL_DOMAIN}")
+
+
+def seed(database_url: str, users: int, days: int, booking_rate: float, reset: bool, seed_value: int):
+    rng = random.Random(seed_value)
+    engine = create_engine(database_url)
+    today = datetime.now(IST).date()
+    # Most of the window is history; the last two days are today and tomorrow
+    menu_dates = [today - timedelta(days=offset) for offset in range(days - 2, -2, -1)]
+
+    # bcrypt is slow on purpose, so every bench user shares one hash
+    hashed_password = utils.hash_password(BENCH_PASSWORD)
+
+    with engine.begin() as conn:
+        if reset:
+            conn.execute(delete(models.User.__table__).where(bench_users_filter()))
+            conn.execute(delete(models.Menu.__table__).where(models.Menu.menu_date.in_(menu_dates)))
+
+        user_rows = []
+        for i in range(users):
+            # A handful of admins, everyone else is a student
+            role = "mess_committee" if i == 0 else "convenor" if i <= 3 else "student"
+            user_rows.append({
+                "name": f"Bench Student {i:05d}",
+                "email": bench_email(i),
+                "hashed_password": hashed_password,
+                "room_number": 100 + i % 400,
+                "role": role,
+                "is_active": True,
+                "is_mess_active": rng.random() > 0.05,
+                "push_token": f"bench-token-{i:05d}",
+            })
+        conn.execute(insert(models.User.__table__), user_rows)
+        user_ids = conn.execute(select(models.User.id).where(bench_users_filter())).scalars().all()
+        convenor_id = user_ids[1] if len(user_ids) > 1 else None
+
+        conn.execute(
+            pg_insert(models.MenuItem.__table__).on_conflict_do_nothing(index_elements=["name"]),
+            [{"name": name} for name in LUNCH_ITEMS + DINNER_ITEMS],
+        )
+        item_ids = dict(conn.execute(select(models.MenuItem.name, models.MenuItem.id)).all())
+
+        menu_rows = []
+        menus = {}
+        for menu_date in menu_dates:
+            lunch = [item_ids[name] for name in rng.sample(LUNCH_ITEMS, 5)]
+            dinner = [item_ids[name] for name in rng.sample(DINNER_ITEMS, 5)]
+            menus[menu_date] = (lunch, dinner)
+            menu_rows.append({
+                "menu_date": menu_date,
+                "lunch_item_ids": lunch,
+                "dinner_item_ids": dinner,
+                "set_by_user_id": convenor_id,
+            })
+        # Overwrite menus that already exist in the window so bookings match them
+        menu_insert = pg_insert(models.Menu.__table__)
+        conn.execute(menu_insert.on_conflict_do_update(
+            index_elements=["menu_date"],
+            set_={"lunch_item_ids": menu_insert.excluded.lunch_item_ids, "dinner_item_ids": menu_insert.excluded.dinner_item_ids},
+        ), menu_rows)
+
+        booking_rows = []
+        for menu_date, (lunch, dinner) in menus.items():
+            # Leave tomorrow empty so the booking rush has something to do
+            if menu_date > today:
+                continue
+            for user_id in user_ids:
+                if rng.random() > booking_rate:
+                    continue
+                lunch_pick = rng.sample(lunch, rng.randint(1, 3)) if rng.random() < 0.8 else None
+                dinner_pick = rng.sample(dinner, rng.randint(1, 3)) if rng.random() < 0.9 else None
+                booking_rows.append({
+                    "user_id": user_id,
+                    "booking_date": menu_date,
+                    "lunch_item_ids": lunch_pick,
+                    "dinner_item_ids": dinner_pick,
+                })
+        if booking_rows:
+            conn.execute(insert(models.Booking.__table__), booking_rows)
+
+    print(f"Seeded {len(user_rows)} users, {len(menu_rows)} menus and {len(booking_rows)} bookings.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--days", type=int, default=30, help="days of menus, ending tomorrow")
+    parser.add_argument("--booking-rate", type=float, default=0.85, help="chance a user books on a given day")
+    parser.add_argument("--reset", action="store_true", help="delete previously seeded bench data first")
+    parser.add_argument("--seed", type=int, default=42, help="random seed, for reproducible data")
+    args = parser.parse_args()
+
+    if not args.database_url:
+        parser.error("--database-url or DATABASE_URL is required")
+
+    seed(args.database_url, args.users, args.days, args.booking_rate, args.reset, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+from datetime import date
+
+from app import billing, menu_items, models
+
+
+def add_booking(db, user, day, lunch, dinner):
+    db.add(models.Booking(user_id=user.id, booking_date=day, lunch_item_ids=lunch, dinner_item_ids=dinner))
+    db.flush()
+
+
+def rollup_for(db, user, month):
+    return db.query(models.MealBillingRollup).filter(
+        models.MealBillingRollup.user_id == user.id,
+        models.MealBillingRollup.billing_month == month
+    ).one()
+
+
+def test_refresh_only_adds_newly_closed_days(get_test_db):
+    db = get_test_db
+    user = models.User(name="Bill Student", email="bill_student@example.com", hashed_password="x", room_number=7)
+    db.add(user)
+    db.flush()
+    rice, dal, roti = menu_items.ids_for_names(db, ["Bill Rice", "Bill Dal", "Bill Roti"])
+
+    # Far enough ahead that no real bookings share these months
+    month = date(2031, 1, 1)
+    add_booking(db, user, date(2031, 1, 30), [rice, dal], [roti])
+    add_booking(db, user, date(2031, 1, 31), [rice], None)
+    add_booking(db, user, date(2031, 2, 1), [], [roti, roti])
+
+    # Only the 30th has closed
+    assert billing.refresh_rollups(db, today=date(2031, 1, 31)) == date(2031, 1, 30)
+    rollup = rollup_for(db, user, month)
+    assert (rollup.lunch_count, rollup.dinner_count) == (1, 1)
+
+    # The next refresh adds the 31st and February without re-reading the 30th
+    assert billing.refresh_rollups(db, today=date(2031, 2, 2)) == date(2031, 2, 1)
+    db.refresh(rollup)
+    assert (rollup.lunch_count, rollup.dinner_count) == (2, 1)
+    assert rollup.lunch_item_counts == {str(rice): 2, str(dal): 1}
+    assert rollup.dinner_item_counts == {str(roti): 1}
+
+    february = rollup_for(db, user, date(2031, 2, 1))
+    assert (february.lunch_count, february.dinner_count) == (0, 1)
+    assert february.dinner_item_counts == {str(roti): 2}
+
+    # Nothing new has closed
+    assert billing.refresh_rollups(db, today=date(2031, 2, 2)) == date(2031, 2, 1)
+    db.refresh(rollup)
+    assert rollup.lunch_count == 2
+
+    # A rebuild recomputes the month from the bookings
+    db.query(models.Booking).filter(
+        models.Booking.user_id == user.id, models.Booking.booking_date == date(2031, 1, 31)
+    ).delete()
+    assert billing.rebuild_month(db, month) == 1
+    db.expire_all()
+    assert rollup_for(db, user, month).lunch_item_counts == {str(rice): 1, str(dal): 1}
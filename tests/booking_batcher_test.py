@@ -0,0 +1,90 @@
+import threading
+from datetime import date
+
+import pytest   # type: ignore
+from sqlalchemy.orm import Session
+
+from app import menu_items, models
+from app.booking_batcher import BookingBatcher, Upsert
+
+
+def test_concurrent_upserts_share_one_commit(get_test_db):
+    db = get_test_db
+    day = date(2031, 8, 1)
+    rice, dal = menu_items.ids_for_names(db, ["Batch Rice", "Batch Dal"])
+    users = [models.User(name=f"Batch {i}", email=f"batch_{i}@example.com", hashed_password="x", room_number=i) for i in range(3)]
+    db.add_all(users)
+    db.flush()
+    db.add(models.Booking(user_id=users[0].id, booking_date=day, lunch_item_ids=[rice], dinner_item_ids=None))
+    db.flush()
+
+    connection = db.connection()
+    # Savepoints, so that the batch's own commit and rollback stay inside the test's transaction
+    batcher = BookingBatcher(lambda: Session(bind=connection, join_transaction_mode="create_savepoint"), window_seconds=0.2)
+    upserts = [
+        Upsert(users[0].id, day, [dal], [rice]),
+        Upsert(users[1].id, day, [rice, dal], None),
+        Upsert(users[1].id, day, [rice], [dal]),
+        # No such user: only this upsert fails
+        Upsert(users[2].id + 1000, day, [rice], None),
+    ]
+    results: dict[int, object] = {}
+
+    def send(i: int):
+        try:
+            results[i] = batcher.upsert(upserts[i])
+        except Exception as e:
+            results[i] = e
+    threads = [threading.Thread(target=send, args=(i,)) for i in range(len(upserts))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    batcher.close()
+
+    assert batcher.commits == 1
+    assert (results[0].old_lunch, results[0].old_dinner) == ([rice], None)
+    assert (results[0].booking.lunch_item_ids, results[0].booking.dinner_item_ids) == ([dal], [rice])
+    # The later of the two upserts of one booking wins, and sees the first as its old picks
+    first, later = (1, 2) if results[1].old_lunch is None else (2, 1)
+    assert (results[later].old_lunch, results[later].old_dinner) == (upserts[first].lunch_item_ids, upserts[first].dinner_item_ids)
+    assert results[later].booking.lunch_item_ids == upserts[later].lunch_item_ids
+    assert isinstance(results[3], Exception)
+
+    stored = db.query(models.Booking).filter(models.Booking.booking_date == day).order_by(models.Booking.user_id).all()
+    assert [(b.user_id, b.lunch_item_ids) for b in stored] == [(users[0].id, [dal]), (users[1].id, upserts[later].lunch_item_ids)]
+
+    # Without a bad row the batch is one statement; both upserts of the booking get its final row
+    batcher = BookingBatcher(lambda: Session(bind=connection, join_transaction_mode="create_savepoint"), window_seconds=0.2)
+    upserts = [Upsert(users[2].id, day, [dal], None), Upsert(users[2].id, day, [rice], None)]
+    results = {}
+    threads = [threading.Thread(target=send, args=(i,)) for i in range(len(upserts))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    batcher.close()
+    assert batcher.commits == 1
+    assert results[0].booking == results[1].booking
+    assert len({results[0].old_lunch is None, results[1].old_lunch is None}) == 2
+
+
+def test_batcher_survives_a_batch_without_a_session(get_test_db):
+    connection = get_test_db.connection()
+    sessions = iter([None])
+
+    def open_session():
+        # The first batch cannot get a connection, the next one can
+        if next(sessions, "ok") is None:
+            raise ConnectionError("pool exhausted")
+        return Session(bind=connection, join_transaction_mode="create_savepoint")
+
+    batcher = BookingBatcher(open_session, window_seconds=0)
+    user = models.User(name="Batch Survivor", email="batch_survivor@example.com", hashed_password="x", room_number=1)
+    get_test_db.add(user)
+    get_test_db.flush()
+
+    with pytest.raises(ConnectionError):
+        batcher.upsert(Upsert(user.id, date(2031, 8, 2), None, None))
+    assert batcher.upsert(Upsert(user.id, date(2031, 8, 2), None, None)).booking.user_id == user.id
+    batcher.close()
@@ -0,0 +1,130 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+import pytest   # type: ignore
+from sqlalchemy.orm import Session
+
+from app import broadcasts, database, models, oauth2
+
+
+def test_edits_in_quick_succession_are_sent_once(monkeypatch):
+    monkeypatch.setattr(broadcasts, "BROADCAST_WINDOW_SECONDS", 0.05)
+    monkeypatch.setattr(broadcasts, "BROADCAST_MAX_DELAY_SECONDS", 1)
+    monkeypatch.setattr(broadcasts, "QUIET_HOURS", None)
+    sent = []
+
+    async def send(title, body):
+        sent.append((title, body))
+    monkeypatch.setattr(broadcasts, "_send", send)
+
+    async def edits():
+        for typo in ("Paner", "Panir", "Paneer"):
+            await broadcasts.schedule("menu:2031-01-01", "Menu Updated !!!", typo)
+            await asyncio.sleep(0.01)
+        await broadcasts.schedule("notice", "New Notice: Water", "No water till noon")
+        await asyncio.sleep(0.2)
+        # A later edit starts a new burst
+        await broadcasts.schedule("menu:2031-01-01", "Menu Updated !!!", "Paneer, Rice")
+        await broadcasts.flush()
+
+    asyncio.run(edits())
+    assert sent == [
+        ("Menu Updated !!!", "Paneer"),
+        ("New Notice: Water", "No water till noon"),
+        ("Menu Updated !!!", "Paneer, Rice"),
+    ]
+
+
+def test_failed_or_held_broadcasts_do_not_block_later_ones(monkeypatch):
+    monkeypatch.setattr(broadcasts, "BROADCAST_WINDOW_SECONDS", 0.01)
+    sent = []
+
+    async def send(title, body):
+        sent.append(body)
+    monkeypatch.setattr(broadcasts, "_send", send)
+
+    def broken_quiet_hours(now):
+        raise RuntimeError("broken")
+
+    async def scenario():
+        monkeypatch.setattr(broadcasts, "quiet_hours_end", broken_quiet_hours)
+        await broadcasts.schedule("notice", "New Notice", "lost")
+        await asyncio.sleep(0.05)
+        assert "notice" not in broadcasts._pending
+
+        # Held back for quiet hours until an urgent broadcast of the same kind comes in
+        monkeypatch.setattr(broadcasts, "quiet_hours_end", lambda now: now + timedelta(hours=8))
+        await broadcasts.schedule("notice", "New Notice", "quiet")
+        await asyncio.sleep(0.05)
+        assert sent == []
+        await broadcasts.schedule("notice", "New Notice", "urgent", urgent=True)
+        await asyncio.sleep(0.05)
+
+    asyncio.run(scenario())
+    assert sent == ["urgent"] and broadcasts._pending == {}
+
+
+def test_broadcasts_held_for_quiet_hours_survive_a_restart(monkeypatch, get_test_db):
+    connection = get_test_db.connection()
+    monkeypatch.setattr(database, "SessionLocal", lambda: Session(bind=connection, join_transaction_mode="create_savepoint"))
+    monkeypatch.setattr(broadcasts, "BROADCAST_WINDOW_SECONDS", 0.01)
+    sent = []
+
+    async def send(title, body):
+        sent.append(body)
+    monkeypatch.setattr(broadcasts, "_send", send)
+
+    async def before_shutdown():
+        monkeypatch.setattr(broadcasts, "quiet_hours_end", lambda now: now + timedelta(hours=8))
+        await broadcasts.schedule("notice:1", "New Notice: Water", "No water till noon")
+        await asyncio.sleep(0.05)
+        await broadcasts.flush()
+
+    async def after_start():
+        monkeypatch.setattr(broadcasts, "quiet_hours_end", lambda now: None)
+        await broadcasts.resume()
+        await asyncio.sleep(0.05)
+
+    asyncio.run(before_shutdown())
+    assert sent == []
+    assert get_test_db.query(models.DeferredBroadcast.kind).all() == [("notice:1",)]
+    asyncio.run(after_start())
+    assert sent == ["No water till noon"]
+    assert get_test_db.query(models.DeferredBroadcast).count() == 0
+
+
+def test_notices_posted_back_to_back_are_both_sent(monkeypatch, client, get_test_db):
+    monkeypatch.setattr(broadcasts, "BROADCAST_WINDOW_SECONDS", 0.05)
+    monkeypatch.setattr(broadcasts, "QUIET_HOURS", None)
+    sent = []
+
+    async def send(title, body):
+        sent.append(title)
+    monkeypatch.setattr(broadcasts, "_send", send)
+    admin = models.User(name="Notice Convenor", email="notice_convenor@example.com", hashed_password="x", room_number=1, role="convenor")
+    get_test_db.add(admin)
+    get_test_db.flush()
+    headers = {"Authorization": f"Bearer {oauth2.create_access_token({'user_id': admin.id})}"}
+
+    for title in ("Water", "Power"):
+        assert client.post("/notices/", json={"title": title, "content": "Till noon"}, headers=headers).status_code == 201
+    # The broadcasts run on the app's event loop, in the client's thread
+    deadline = time.monotonic() + 2
+    while len(sent) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert sorted(sent) == ["New Notice: Power", "New Notice: Water"]
+
+
+def test_quiet_hours_end():
+    night = "22:00-07:00"
+    assert broadcasts.quiet_hours_end(datetime(2031, 1, 1, 23, 30, tzinfo=broadcasts.IST), night) == \
+        datetime(2031, 1, 2, 7, 0, tzinfo=broadcasts.IST)
+    assert broadcasts.quiet_hours_end(datetime(2031, 1, 2, 6, 59, tzinfo=broadcasts.IST), night) == \
+        datetime(2031, 1, 2, 7, 0, tzinfo=broadcasts.IST)
+    assert broadcasts.quiet_hours_end(datetime(2031, 1, 2, 7, 0, tzinfo=broadcasts.IST), night) is None
+    assert broadcasts.quiet_hours_end(datetime(2031, 1, 2, 14, 0, tzinfo=broadcasts.IST), "13:00-15:00") == \
+        datetime(2031, 1, 2, 15, 0, tzinfo=broadcasts.IST)
+    assert broadcasts.quiet_hours_end(datetime(2031, 1, 2, 23, 0, tzinfo=broadcasts.IST), "") is None
+    with pytest.raises(ValueError):
+        broadcasts.parse_quiet_hours("10pm-6am")
@@ -0,0 +1,48 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.compression import CompressionMiddleware
+
+
+def make_client():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=100)
+
+    @app.get("/big")
+    def big():
+        return {"items": ["Paneer"] * 200}
+
+    @app.get("/small")
+    def small():
+        return {"ok": True}
+
+    return TestClient(app)
+
+
+def test_large_response_is_compressed():
+    client = make_client()
+
+    response = client.get("/big", headers={"Accept-Encoding": "br, gzip"})
+    assert response.headers["content-encoding"] == "br"
+    assert response.json()["items"][0] == "Paneer"
+
+    response = client.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+
+
+def test_small_response_is_not_compressed():
+    response = make_client().get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+
+
+def test_codings_with_zero_quality_are_not_used():
+    client = make_client()
+
+    response = client.get("/big", headers={"Accept-Encoding": "br;q=0, gzip;q=0.8"})
+    assert response.headers["content-encoding"] == "gzip"
+
+    response = client.get("/big", headers={"Accept-Encoding": "gzip;q=0, identity"})
+    assert "content-encoding" not in response.headers
+
+    response = client.get("/big", headers={"Accept-Encoding": "*;q=0.5, br;q=0"})
+    assert response.headers["content-encoding"] == "gzip"
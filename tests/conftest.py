@@ -5,7 +5,7 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
 from app.main import app
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.models import Base
 
 
@@ -45,6 +45,9 @@ def get_test_db():
 def client(get_test_db):
     
     app.dependency_overrides[get_db] = lambda: get_test_db
-    yield TestClient(app)
+    app.dependency_overrides[get_read_db] = lambda: get_test_db
+    # Entering the client runs the app's lifespan (engines, Firebase, email client)
+    with TestClient(app) as test_client:
+        yield test_client
     app.dependency_overrides.clear()
     
@@ -0,0 +1,76 @@
+import csv
+import io
+from datetime import date
+
+import pytest   # type: ignore
+from sqlalchemy.orm import Session
+
+from app import export, menu_items, models, oauth2
+from app.database import get_read_sessions
+from app.main import app
+
+
+@pytest.fixture
+def export_client(client, get_test_db):
+    # The export opens its own sessions; give it ones on the test's connection
+    connection = get_test_db.connection()
+    app.dependency_overrides[get_read_sessions] = lambda: (lambda: Session(bind=connection))
+    return client
+
+
+def seed(db) -> dict:
+    students = [models.User(name=name, email=f"export_{name.lower()}@example.com", hashed_password="x", room_number=room)
+                for name, room in [("Bina", 12), ("Asha", 7)]]
+    admin = models.User(name="Export Convenor", email="export_convenor@example.com", hashed_password="x", room_number=1, role="convenor")
+    db.add_all([*students, admin])
+    dal, rice = menu_items.ids_for_names(db, ["Dal, tadka", "Export Rice"])
+    db.flush()
+    db.add_all([
+        models.Booking(user_id=students[0].id, booking_date=date(2031, 5, 1), lunch_item_ids=[rice, dal], dinner_item_ids=None),
+        models.Booking(user_id=students[1].id, booking_date=date(2031, 5, 1), lunch_item_ids=[], dinner_item_ids=[rice]),
+        models.Booking(user_id=students[1].id, booking_date=date(2031, 5, 2), lunch_item_ids=[dal], dinner_item_ids=[dal]),
+        models.Booking(user_id=students[1].id, booking_date=date(2031, 5, 3), lunch_item_ids=[dal], dinner_item_ids=None),
+    ])
+    db.flush()
+    return {
+        "student": {"Authorization": f"Bearer {oauth2.create_access_token({'user_id': students[0].id})}"},
+        "admin": {"Authorization": f"Bearer {oauth2.create_access_token({'user_id': admin.id})}"},
+    }
+
+
+def test_csv_export(export_client, get_test_db):
+    headers = seed(get_test_db)
+    params = {"from": "2031-05-01", "to": "2031-05-02"}
+
+    response = export_client.get("/meallist/export", params=params, headers=headers["admin"])
+    assert response.status_code == 200
+    assert response.headers["content-disposition"] == "attachment; filename=meal_bookings_2031-05-01_2031-05-02.csv"
+    assert list(csv.reader(io.StringIO(response.text))) == [
+        ["booking_date", "student_name", "room_number", "lunch_selection", "dinner_selection"],
+        ["2031-05-01", "Asha", "7", "", "Export Rice"],
+        ["2031-05-01", "Bina", "12", "Export Rice, Dal, tadka", ""],
+        ["2031-05-02", "Asha", "7", "Dal, tadka", "Dal, tadka"],
+    ]
+
+    assert export_client.get("/meallist/export", params=params, headers=headers["student"]).status_code == 403
+    backwards = {"from": "2031-05-02", "to": "2031-05-01"}
+    assert export_client.get("/meallist/export", params=backwards, headers=headers["admin"]).status_code == 400
+
+
+def test_parquet_export_in_row_groups(export_client, get_test_db, monkeypatch):
+    pq = pytest.importorskip("pyarrow.parquet")
+    headers = seed(get_test_db)
+    monkeypatch.setattr(export, "EXPORT_ROW_GROUP_ROWS", 3)
+
+    response = export_client.get("/meallist/export", params={"from": "2031-05-01", "to": "2031-05-03", "format": "parquet"},
+                                 headers=headers["admin"])
+    assert response.status_code == 200
+    parquet = pq.ParquetFile(io.BytesIO(response.content))
+    assert [parquet.metadata.row_group(i).num_rows for i in range(parquet.num_row_groups)] == [3, 1]
+
+    rows = parquet.read().to_pylist()
+    assert rows[0] == {"booking_date": date(2031, 5, 1), "student_name": "Asha", "room_number": 7,
+                       "lunch_selection": "", "dinner_selection": "Export Rice"}
+    # A meal that was not booked is null, not an empty string
+    assert rows[1]["dinner_selection"] is None
+    assert [row["booking_date"].day for row in rows] == [1, 1, 2, 3]
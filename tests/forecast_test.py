@@ -0,0 +1,47 @@
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from app import forecast, menu_items, models
+
+IST = ZoneInfo('Asia/Kolkata')
+
+
+def test_forecast_adds_what_usually_arrives_later(get_test_db):
+    db = get_test_db
+    forecast.clear_cache()
+    users = [models.User(name=f"Forecast {i}", email=f"forecast_{i}@example.com", hashed_password="x", room_number=i) for i in range(10)]
+    db.add_all(users)
+    dal, rice, kheer = menu_items.ids_for_names(db, ["Forecast Dal", "Forecast Rice", "Forecast Kheer"])
+
+    # Four past Mondays with 10 dinners each: 6 booked days ahead, 4 in the last hour before the cutoff
+    target = date(2031, 3, 10)
+    for weeks in range(1, 5):
+        day = target - timedelta(weeks=weeks)
+        for i, user in enumerate(users):
+            db.flush()
+            created = datetime(day.year, day.month, day.day, 17, 30, tzinfo=IST) - (timedelta(days=3) if i < 6 else timedelta())
+            db.add(models.Booking(user_id=user.id, booking_date=day, dinner_item_ids=[dal, rice] if i % 2 == 0 else [dal], created_at=created))
+    # Three dinners booked so far for the target Monday, whose menu also has a new dish
+    for user in users[:3]:
+        db.add(models.Booking(user_id=user.id, booking_date=target, dinner_item_ids=[dal], created_at=datetime(2031, 3, 7, 12, tzinfo=IST)))
+    db.add(models.Menu(menu_date=target, lunch_item_ids=[], dinner_item_ids=[dal, rice, kheer]))
+    db.flush()
+
+    result = forecast.forecast(db, target, now=datetime(2031, 3, 9, 18, tzinfo=IST))
+
+    dinner = result["dinner"]
+    # 24 hours before the cutoff, 6 of a typical 10 bookings are in: 4 more are expected
+    assert (dinner["booked"], dinner["expected"], dinner["closed"], dinner["similar_days"]) == (3, 7, False, 4)
+    # Dal is always picked; rice by half the students; kheer is new and gets the average rate (0.75)
+    assert dinner["item_counts"] == {
+        "Forecast Dal": {"booked": 3, "expected": 7},
+        "Forecast Rice": {"booked": 0, "expected": 2},
+        "Forecast Kheer": {"booked": 0, "expected": 3},
+    }
+    assert result["lunch"] == {"booked": 0, "expected": 0, "closed": False, "similar_days": 0, "item_counts": {}}
+
+    # After the cutoff the forecast is the actual count
+    forecast.clear_cache()
+    closed = forecast.forecast(db, target, now=datetime(2031, 3, 10, 19, tzinfo=IST))["dinner"]
+    assert (closed["booked"], closed["expected"], closed["closed"]) == (3, 3, True)
+    forecast.clear_cache()
@@ -0,0 +1,38 @@
+from app import models, oauth2
+from app.database import get_read_sessions
+from app.main import app
+from app.Routers import home
+
+
+class FakeSession:
+    def close(self):
+        pass
+
+
+def failing_loader(db, user, today):
+    raise RuntimeError("database is down")
+
+
+def test_home_returns_the_parts_that_loaded(client, get_test_db, monkeypatch):
+    db = get_test_db
+    user = models.User(name="Home Student", email="home_student@example.com", hashed_password="x", room_number=12)
+    db.add(user)
+    db.flush()
+
+    menu = {"menu_date": "2031-04-01", "lunch_options": ["Rice"], "dinner_options": ["Roti"], "set_by_user_id": None}
+    monkeypatch.setattr(home, "HOME_PARTS", {
+        "menu": (lambda db, user, today: menu, None),
+        "booking": (lambda db, user, today: None, None),
+        "notices": (failing_loader, []),
+    })
+    app.dependency_overrides[get_read_sessions] = lambda: FakeSession
+
+    response = client.get("/home", headers={"Authorization": f"Bearer {oauth2.create_access_token({'user_id': user.id})}"})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["user"]["email"] == "home_student@example.com"
+    assert body["menu"] == menu
+    assert body["booking"] is None
+    assert body["notices"] == []
+    assert body["errors"] == {"notices": "Could not load notices."}
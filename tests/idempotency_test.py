@@ -0,0 +1,84 @@
+import os
+import threading
+import time
+import uuid
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+
+from app import database, idempotency
+from app.idempotency import IdempotencyMiddleware
+
+engine = create_engine(os.environ["DATABASE_URL"])
+
+
+def make_client(monkeypatch, calls):
+    monkeypatch.setattr(database, "engine", engine)
+    app = FastAPI()
+    app.add_middleware(IdempotencyMiddleware)
+
+    @app.post("/bookings/book", status_code=201)
+    def book(payload: dict):
+        time.sleep(0.3)
+        calls.append(payload)
+        return {"call": len(calls)}
+
+    return TestClient(app)
+
+
+def test_retry_is_replayed_without_running_the_route(monkeypatch):
+    calls = []
+    client = make_client(monkeypatch, calls)
+    headers = {"Authorization": "Bearer alice", "Idempotency-Key": str(uuid.uuid4())}
+
+    first = client.post("/bookings/book", json={"lunch": ["Rice"]}, headers=headers)
+    retry = client.post("/bookings/book", json={"lunch": ["Rice"]}, headers=headers)
+
+    assert (first.status_code, first.json()) == (201, {"call": 1})
+    assert (retry.status_code, retry.json()) == (201, {"call": 1})
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert len(calls) == 1
+
+    # Same key, different body
+    assert client.post("/bookings/book", json={"lunch": ["Dal"]}, headers=headers).status_code == 422
+    # Keys are per caller
+    other_user = client.post("/bookings/book", json={"lunch": ["Rice"]}, headers={**headers, "Authorization": "Bearer bob"})
+    assert other_user.json() == {"call": 2}
+
+
+def test_concurrent_duplicate_waits_for_the_first(monkeypatch):
+    calls = []
+    client = make_client(monkeypatch, calls)
+    headers = {"Authorization": "Bearer carol", "Idempotency-Key": str(uuid.uuid4())}
+    responses = []
+
+    def post():
+        responses.append(client.post("/bookings/book", json={"dinner": ["Roti"]}, headers=headers))
+
+    threads = [threading.Thread(target=post) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert [r.json() for r in responses] == [{"call": 1}] * 3
+
+
+def test_response_is_sent_when_it_cannot_be_stored(monkeypatch, caplog):
+    calls = []
+    client = make_client(monkeypatch, calls)
+    headers = {"Authorization": "Bearer dave", "Idempotency-Key": str(uuid.uuid4())}
+
+    def broken_complete(*args):
+        raise RuntimeError("database went away")
+    monkeypatch.setattr(idempotency, "_complete", broken_complete)
+
+    first = client.post("/bookings/book", json={"lunch": ["Rice"]}, headers=headers)
+    assert (first.status_code, first.json()) == (201, {"call": 1})
+    assert "Could not store the response" in caplog.text
+
+    # The key was released, so a retry runs instead of getting a 409
+    retry = client.post("/bookings/book", json={"lunch": ["Rice"]}, headers=headers)
+    assert (retry.status_code, retry.json()) == (201, {"call": 2})
@@ -0,0 +1,43 @@
+"""
+Cold-start guard. `import app.main` runs in a fresh interpreter and must
+stay under IMPORT_TIME_BUDGET seconds (best of a few runs, so one slow run
+on a busy CI box does not fail the build). It also must not import the SDKs
+that are only needed to send a notification or an email, or for
+forecasts, thumbnails and Parquet exports.
+"""
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+IMPORT_TIME_BUDGET = float(os.getenv("IMPORT_TIME_BUDGET", "2.0"))
+RUNS = 3
+LAZY_MODULES = ["firebase_admin", "sendgrid", "passlib", "pytz", "numpy", "PIL", "pyarrow"]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import app.main
+print(json.dumps({"seconds": time.perf_counter() - start, "modules": sorted(sys.modules)}))
+"""
+
+
+def import_app_main() -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=Path(__file__).resolve().parent.parent,
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_import_stays_within_budget():
+    fastest = min(import_app_main()["seconds"] for _ in range(RUNS))
+    assert fastest <= IMPORT_TIME_BUDGET, f"import app.main took {fastest:.2f}s, budget {IMPORT_TIME_BUDGET}s"
+
+
+def test_heavy_sdks_are_imported_lazily():
+    modules = set(import_app_main()["modules"])
+    eager = [name for name in LAZY_MODULES if name in modules]
+    assert not eager, f"imported at startup: {eager}"
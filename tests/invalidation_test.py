@@ -0,0 +1,42 @@
+import os
+import time
+
+from sqlalchemy import create_engine, text
+
+from app import invalidation
+from app.cache import TTLCache
+
+engine = create_engine(os.environ["DATABASE_URL"])
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return condition()
+
+
+def test_notifications_from_other_workers_evict_keys():
+    cache = TTLCache(300, fallback_ttl_seconds=5)
+    invalidation.register("invalidation_test", cache, int)
+    listener = invalidation.InvalidationListener(engine)
+    listener.start()
+    try:
+        assert listener.connected.wait(10)
+        assert not cache.degraded
+
+        cache.set(1, "one")
+        cache.set(2, "two")
+        # What another worker's publish() sends when its transaction commits
+        with engine.begin() as connection:
+            connection.execute(text("SELECT pg_notify(:channel, 'invalidation_test:1')"), {"channel": invalidation.CHANNEL})
+
+        assert wait_for(lambda: cache.get(1) is None)
+        assert cache.get(2) == "two"
+    finally:
+        listener.stop()
+        invalidation._caches.pop("invalidation_test")
+
+    # Without a listener, nothing evicts entries, so they only live for the fallback TTL
+    assert cache.degraded
+    assert cache.get(2) is None
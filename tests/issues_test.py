@@ -0,0 +1,92 @@
+import io
+import os
+
+import pytest   # type: ignore
+
+from app import blob_store, models, oauth2, thumbnails
+from app.Routers import issues
+
+
+@pytest.fixture
+def local_store(tmp_path, monkeypatch):
+    store = blob_store.LocalBlobStore(str(tmp_path), "/uploads")
+    monkeypatch.setattr(blob_store, "_store", store)
+    # Thumbnails are covered by test_make_thumbnail; the background task uses its own session
+    monkeypatch.setattr(thumbnails, "available", lambda: False)
+    return store
+
+
+def auth_headers(db, email: str, role: str = "student") -> tuple[int, dict]:
+    user = models.User(name=email.split("@")[0], email=email, hashed_password="x", room_number=7, role=role)
+    db.add(user)
+    db.flush()
+    return user.id, {"Authorization": f"Bearer {oauth2.create_access_token({'user_id': user.id})}"}
+
+
+def report(client, headers, title: str, image: bytes = b"\x89PNG fake image", content_type: str = "image/png"):
+    return client.post("/issues/", data={"title": title, "description": "Seen in the dining hall"},
+                       files={"image": ("photo", image, content_type)}, headers=headers)
+
+
+def test_local_blob_store_streams_in_chunks(tmp_path, monkeypatch):
+    store = blob_store.LocalBlobStore(str(tmp_path), "/uploads")
+    monkeypatch.setattr(blob_store, "CHUNK_SIZE", 4)
+    assert store.save("a/b.bin", io.BytesIO(b"0123456789")) == 10
+    with store.open("a/b.bin") as f:
+        assert f.read() == b"0123456789"
+    assert store.key_for_url(store.url("a/b.bin")) == "a/b.bin"
+
+    with pytest.raises(blob_store.BlobTooLarge):
+        store.save("a/c.bin", io.BytesIO(b"0123456789"), max_bytes=6)
+    # Neither the target nor the partial upload is left behind
+    assert os.listdir(tmp_path / "a") == ["b.bin"]
+
+    with pytest.raises(ValueError):
+        store.save("../escape.bin", io.BytesIO(b"x"))
+
+    store.delete("a/b.bin")
+    store.delete("a/b.bin")
+    assert os.listdir(tmp_path / "a") == []
+
+
+def test_issue_lifecycle(client, get_test_db, local_store, monkeypatch):
+    db = get_test_db
+    student_id, student = auth_headers(db, "issue_student@example.com")
+    _, admin = auth_headers(db, "issue_convenor@example.com", role="convenor")
+
+    created = [report(client, student, f"Broken tap {n}").json() for n in range(3)]
+    assert created[0]["image_url"].startswith("/uploads/issues/")
+    assert created[0]["posted_by"] == student_id
+    with local_store.open(local_store.key_for_url(created[0]["image_url"])) as f:
+        assert f.read() == b"\x89PNG fake image"
+
+    assert report(client, student, "Not a photo", content_type="text/plain").status_code == 415
+    monkeypatch.setattr(issues, "ISSUE_IMAGE_MAX_BYTES", 4)
+    assert report(client, student, "Too big").status_code == 413
+    assert len(os.listdir(local_store.root + "/issues")) == 3
+
+    # Keyset pages, newest first
+    first_page = client.get("/issues/", params={"limit": 2}, headers=student).json()
+    assert [i["id"] for i in first_page] == [created[2]["id"], created[1]["id"]]
+    second_page = client.get("/issues/", params={"limit": 2, "before": first_page[-1]["id"]}, headers=student).json()
+    assert [i["id"] for i in second_page] == [created[0]["id"]]
+
+    assert client.patch(f"/issues/{created[1]['id']}/resolve", headers=student).status_code == 403
+    resolved = client.patch(f"/issues/{created[1]['id']}/resolve", headers=admin).json()
+    assert resolved["is_resolved"] and resolved["resolved_at"] is not None
+    assert [i["id"] for i in client.get("/issues/", headers=student).json()] == [created[2]["id"], created[0]["id"]]
+    assert [i["id"] for i in client.get("/issues/", params={"resolved": True}, headers=student).json()] == [created[1]["id"]]
+
+    assert client.delete(f"/issues/{created[0]['id']}", headers=student).status_code == 204
+    assert not os.path.exists(local_store.root + "/" + local_store.key_for_url(created[0]["image_url"]))
+
+
+def test_make_thumbnail():
+    Image = pytest.importorskip("PIL.Image")
+    photo = io.BytesIO()
+    Image.new("RGB", (1200, 900), "red").save(photo, "PNG")
+    photo.seek(0)
+
+    thumbnail = Image.open(io.BytesIO(thumbnails.make_thumbnail(photo, 320)))
+    assert thumbnail.format == "JPEG"
+    assert thumbnail.size == (320, 240)
@@ -0,0 +1,43 @@
+import asyncio
+
+from app import meal_feed, menu_items
+from app.broadcaster import RESYNC, Broadcaster
+
+
+def test_booking_change_is_published_as_a_delta(get_test_db):
+    db = get_test_db
+    rice, dal, roti = menu_items.ids_for_names(db, ["Feed Rice", "Feed Dal", "Feed Roti"])
+    today = meal_feed.today_ist()
+
+    async def listen():
+        subscription = meal_feed.broadcaster.subscribe()
+        try:
+            # Booking routes are sync and publish from a worker thread
+            await asyncio.to_thread(meal_feed.publish_booking_change, db, today, [rice, dal], [roti], [rice], None)
+            return await asyncio.wait_for(subscription.get(), 5)
+        finally:
+            meal_feed.broadcaster.unsubscribe(subscription)
+
+    assert asyncio.run(listen()) == {
+        "booking_date": today,
+        "total_lunch_bookings": 0,
+        "total_dinner_bookings": -1,
+        "lunch_item_counts": {"Feed Dal": -1},
+        "dinner_item_counts": {"Feed Roti": -1},
+    }
+
+
+def test_slow_subscriber_gets_a_single_resync():
+    broadcaster = Broadcaster(max_queued=3)
+
+    async def fall_behind():
+        subscription = broadcaster.subscribe()
+        for n in range(10):
+            broadcaster.publish(n)
+        await asyncio.sleep(0)
+        first = await subscription.get()
+        broadcaster.publish("after")
+        await asyncio.sleep(0)
+        return first, await subscription.get()
+
+    assert asyncio.run(fall_behind()) == (RESYNC, "after")
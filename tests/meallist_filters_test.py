@@ -0,0 +1,51 @@
+from datetime import date
+
+from app import menu_items, models, oauth2
+
+
+def test_filtered_and_summary_meal_lists(client, get_test_db):
+    db = get_test_db
+    day = date(2031, 6, 2)
+    rice, dal, roti = menu_items.ids_for_names(db, ["Filter Rice", "Filter Dal", "Filter Roti"])
+    students = [models.User(name=name, email=f"filter_{name.lower()}@example.com", hashed_password="x", room_number=room)
+                for name, room in [("Chetan", 5), ("Asha", 30), ("Bina", 12)]]
+    db.add_all(students)
+    db.flush()
+    db.add_all([
+        models.Booking(user_id=students[0].id, booking_date=day, lunch_item_ids=[rice, dal], dinner_item_ids=[roti]),
+        models.Booking(user_id=students[1].id, booking_date=day, lunch_item_ids=[rice], dinner_item_ids=None),
+        models.Booking(user_id=students[2].id, booking_date=day, lunch_item_ids=None, dinner_item_ids=[roti, dal]),
+    ])
+    db.flush()
+    headers = {"Authorization": f"Bearer {oauth2.create_access_token({'user_id': students[0].id})}"}
+
+    def meal_list(**params):
+        response = client.get(f"/meallist/{day}", params=params, headers=headers)
+        assert response.status_code == 200
+        return response.json()
+
+    assert meal_list(summary_only=True) == {
+        "booking_date": str(day), "total_lunch_bookings": 2, "total_dinner_bookings": 2,
+        "lunch_item_counts": {"Filter Rice": 2, "Filter Dal": 1}, "dinner_item_counts": {"Filter Roti": 2, "Filter Dal": 1},
+    }
+    # The same counts as the full list
+    full = meal_list()
+    assert {key: full[key] for key in meal_list(summary_only=True)} == meal_list(summary_only=True)
+
+    lunch = meal_list(meal="lunch", sort="room")
+    assert "dinner_item_counts" not in lunch and "total_dinner_bookings" not in lunch
+    assert lunch["bookings"] == [
+        {"user_name": "Chetan", "room_number": 5, "lunch_pick": ["Filter Rice", "Filter Dal"]},
+        {"user_name": "Asha", "room_number": 30, "lunch_pick": ["Filter Rice"]},
+    ]
+
+    dal_eaters = meal_list(item="Filter Dal", room_to=20)
+    assert [row["user_name"] for row in dal_eaters["bookings"]] == ["Bina", "Chetan"]
+    assert dal_eaters["bookings"][1]["dinner_pick"] is None
+    assert meal_list(item="Filter Dal", room_to=20, summary_only=True) == {
+        "booking_date": str(day), "total_lunch_bookings": 1, "total_dinner_bookings": 1,
+        "lunch_item_counts": {"Filter Rice": 1, "Filter Dal": 1}, "dinner_item_counts": {"Filter Roti": 1, "Filter Dal": 1},
+    }
+
+    assert meal_list(item="Nobody's Dish", meal="dinner")["bookings"] == []
+    assert client.get(f"/meallist/{day}", params={"room_from": 9, "room_to": 3}, headers=headers).status_code == 400
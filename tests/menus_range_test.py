@@ -0,0 +1,28 @@
+from datetime import date
+
+from app import menu_items, models, oauth2
+
+
+def test_menus_in_range_with_etag(client, get_test_db):
+    db = get_test_db
+    user = models.User(name="Week Viewer", email="week_viewer@example.com", hashed_password="x", room_number=3)
+    db.add(user)
+    db.flush()
+    for day, lunch in ((date(2031, 3, 2), ["Poha"]), (date(2031, 3, 4), ["Idli", "Poha"])):
+        db.add(models.Menu(menu_date=day, lunch_item_ids=menu_items.ids_for_names(db, lunch), dinner_item_ids=[], set_by_user_id=user.id))
+    db.flush()
+
+    headers = {"Authorization": f"Bearer {oauth2.create_access_token({'user_id': user.id})}"}
+    week = {"from": "2031-03-01", "to": "2031-03-07"}
+    response = client.get("/menus", params=week, headers=headers)
+
+    assert response.status_code == 200
+    assert [(m["menu_date"], m["lunch_options"]) for m in response.json()] == [("2031-03-02", ["Poha"]), ("2031-03-04", ["Idli", "Poha"])]
+
+    etag = response.headers["etag"]
+    not_modified = client.get("/menus", params=week, headers={**headers, "If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.headers["etag"] == etag
+
+    too_long = client.get("/menus", params={"from": "2031-03-01", "to": "2031-06-01"}, headers=headers)
+    assert too_long.status_code == 400
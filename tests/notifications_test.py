@@ -0,0 +1,71 @@
+import asyncio
+import threading
+from datetime import date
+from types import SimpleNamespace
+
+import pytest   # type: ignore
+
+from app import fcm_manager, menu_items, models
+from app.Routers.reminder import personal_reminders
+
+
+def test_personal_reminders_from_one_query(get_test_db):
+    db = get_test_db
+    day = date(2031, 7, 4)
+    paneer, rice = menu_items.ids_for_names(db, ["Reminder Paneer", "Reminder Rice"])
+    users = [models.User(name=f"Reminder {i}", email=f"reminder_{i}@example.com", hashed_password="x", room_number=i, is_active=True,
+                         push_token=f"reminder-token-{i}" if i < 3 else None) for i in range(4)]
+    db.add_all(users)
+    db.flush()
+    db.add_all([
+        models.Booking(user_id=users[0].id, booking_date=day, lunch_item_ids=[paneer, rice], dinner_item_ids=None),
+        models.Booking(user_id=users[1].id, booking_date=day, lunch_item_ids=[], dinner_item_ids=[rice]),
+        models.Booking(user_id=users[3].id, booking_date=day, lunch_item_ids=[rice], dinner_item_ids=[rice]),
+    ])
+    db.flush()
+
+    messages = {token: (title, body, data) for token, title, body, data in personal_reminders(db, day)
+                if token.startswith("reminder-token-")}
+    assert messages["reminder-token-0"] == (
+        "Your meals for Friday", "Your lunch: Reminder Paneer, Reminder Rice. You haven't booked dinner.",
+        {"type": "meal_reminder", "booking_date": "2031-07-04"},
+    )
+    assert messages["reminder-token-1"][1] == "Your lunch: no dishes picked. Your dinner: Reminder Rice."
+    assert messages["reminder-token-2"][1] == "You haven't booked lunch. You haven't booked dinner."
+    # No token, no message
+    assert len(messages) == 3
+
+
+def test_personalized_messages_are_sent_in_concurrent_batches(monkeypatch):
+    messaging = pytest.importorskip("firebase_admin.messaging")
+    monkeypatch.setattr(fcm_manager, "init_firebase", lambda: True)
+    monkeypatch.setattr(fcm_manager, "FCM_BATCH_SIZE", 2)
+    monkeypatch.setattr(fcm_manager, "FCM_CONCURRENT_BATCHES", 2)
+
+    batches, in_flight, most_in_flight = [], [0], [0]
+    lock = threading.Lock()
+    both_started = threading.Barrier(2, timeout=5)
+
+    def send_each(batch):
+        with lock:
+            batches.append([(message.token, message.notification.body) for message in batch])
+            in_flight[0] += 1
+            most_in_flight[0] = max(most_in_flight[0], in_flight[0])
+        if len(batches) <= 2:
+            both_started.wait()
+        responses = [SimpleNamespace(success=message.token != "gone",
+                                     exception=None if message.token != "gone" else messaging.UnregisteredError("gone"))
+                     for message in batch]
+        with lock:
+            in_flight[0] -= 1
+        failures = sum(not r.success for r in responses)
+        return SimpleNamespace(success_count=len(batch) - failures, failure_count=failures, responses=responses)
+
+    monkeypatch.setattr(messaging, "send_each", send_each)
+    messages = [(f"token-{i}", "Tomorrow", f"Body {i}", None) for i in range(4)] + [("gone", "Tomorrow", "Body 4", None)]
+
+    result = asyncio.run(fcm_manager.send_personalized(messages))
+    assert result == {"success": 4, "failure": 1, "invalid_tokens": ["gone"]}
+    assert sorted(len(batch) for batch in batches) == [1, 2, 2]
+    assert ("token-3", "Body 3") in [message for batch in batches for message in batch]
+    assert most_in_flight[0] == 2
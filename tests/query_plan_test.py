@@ -0,0 +1,213 @@
+"""
+Query-plan regression tests.
+
+Seeds a realistically sized data set (inside a transaction that is rolled
+back), then runs EXPLAIN (ANALYZE, BUFFERS) on the queries the routers issue.
+A test fails when a plan falls back to a sequential scan that reads more
+than SEQ_SCAN_ROW_LIMIT rows, or goes over its cost budget.
+Sequential scans of tiny tables (a few dozen menus, empty future
+partitions) are what the planner should pick, so they are not flagged.
+
+PLAN_TEST_USERS and PLAN_TEST_DAYS control the size of the data set.
+Execution times depend on the machine, so their budgets are only checked
+with PLAN_TEST_CHECK_TIMING=1.
+"""
+import json
+import os
+from datetime import date, timedelta
+
+import pytest   # type: ignore
+from sqlalchemy import create_engine, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+
+from app import models, partitions
+
+
+USERS = int(os.getenv("PLAN_TEST_USERS", "3000"))
+DAYS = int(os.getenv("PLAN_TEST_DAYS", "60"))
+NOTICES = 2000
+ISSUES = 5000
+SEQ_SCAN_ROW_LIMIT = 1000
+CHECK_TIMING = os.getenv("PLAN_TEST_CHECK_TIMING", "false").lower() in ("1", "true", "yes")
+
+engine = create_engine(os.environ["DATABASE_URL"])
+
+
+@pytest.fixture(scope="module")
+def seeded_session():
+    connection = engine.connect()
+    transaction = connection.begin()
+    session = Session(bind=connection)
+    today = date.today()
+
+    # Give every seeded month its own partition, like production after `app.partitions ensure`
+    is_partitioned = connection.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'meal_bookings'::regclass)"
+    )).scalar()
+    if is_partitioned:
+        existing = set(partitions.list_partitions(connection).values())
+        month = (today - timedelta(days=DAYS)).replace(day=1)
+        while month <= today:
+            if month not in existing:
+                partitions.create_partition(connection, month)
+            month = partitions.add_months(month, 1)
+
+    connection.execute(text("""
+        INSERT INTO users (name, email, hashed_password, room_number, role, is_active, push_token)
+        SELECT 'Plan User ' || g, 'plan_user_' || g || '@example.com', 'not-a-hash', 100 + g % 400,
+               CASE WHEN g <= 3 THEN 'convenor' WHEN g <= 5 THEN 'mess_committee' ELSE 'student' END,
+               true, 'token-' || g
+        FROM generate_series(1, :users) AS g
+    """), {"users": USERS})
+    connection.execute(text("""
+        INSERT INTO menu_items (name) VALUES ('Plan Rice'), ('Plan Dal'), ('Plan Paneer'), ('Plan Roti')
+    """))
+    items = dict(connection.execute(text("SELECT name, id FROM menu_items WHERE name LIKE 'Plan %'")).all())
+    lunch = [items["Plan Rice"], items["Plan Dal"], items["Plan Paneer"]]
+    dinner = [items["Plan Roti"]]
+    connection.execute(text("""
+        INSERT INTO daily_menus (menu_date, lunch_item_ids, dinner_item_ids)
+        SELECT CAST(:today AS date) + d, CAST(:lunch AS integer[]), CAST(:dinner AS integer[])
+        FROM generate_series(-:days, 1) AS d
+    """), {"today": today, "days": DAYS, "lunch": lunch, "dinner": dinner})
+    # About 6 in 7 users book on any given day
+    connection.execute(text("""
+        INSERT INTO meal_bookings (user_id, booking_date, lunch_item_ids, dinner_item_ids)
+        SELECT u.id, CAST(:today AS date) + d, CAST(:lunch AS integer[]), CAST(:dinner AS integer[])
+        FROM users u CROSS JOIN generate_series(-:days, 0) AS d
+        WHERE u.email LIKE 'plan_user_%' AND (u.id + d) % 7 <> 0
+    """), {"today": today, "days": DAYS, "lunch": lunch[:2], "dinner": dinner})
+    connection.execute(text("""
+        INSERT INTO notices (title, content, name, created_at)
+        SELECT 'Notice ' || g, 'Seeded notice body', 'Plan User', now() - g * interval '1 hour'
+        FROM generate_series(1, :notices) AS g
+    """), {"notices": NOTICES})
+    # Most tickets have been dealt with; one in fifty is still open
+    connection.execute(text("""
+        INSERT INTO issue_tickets (title, description, image_url, is_resolved)
+        SELECT 'Issue ' || g, 'Seeded issue', '/uploads/issues/' || g || '.jpg', g % 50 <> 0
+        FROM generate_series(1, :issues) AS g
+    """), {"issues": ISSUES})
+    connection.execute(text("ANALYZE users, menu_items, daily_menus, meal_bookings, notices, issue_tickets"))
+
+    yield session
+
+    session.close()
+    transaction.rollback()
+    connection.close()
+
+
+def explain(session: Session, query) -> dict:
+    # An ORM query, or a text() statement with its parameters bound
+    statement = getattr(query, "statement", query)
+    compiled = statement.compile(dialect=postgresql.dialect())
+    result = session.connection().exec_driver_sql(
+        f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {compiled}", compiled.params
+    ).scalar()
+    if isinstance(result, str):
+        result = json.loads(result)
+    return result[0]
+
+
+def plan_nodes(node: dict):
+    yield node
+    for child in node.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+def seq_scanned_tables(plan: dict) -> set[str]:
+    tables = set()
+    for node in plan_nodes(plan["Plan"]):
+        if node["Node Type"] != "Seq Scan":
+            continue
+        rows_read = node["Actual Rows"] * node["Actual Loops"] + node.get("Rows Removed by Filter", 0)
+        if rows_read >= SEQ_SCAN_ROW_LIMIT:
+            relation = node["Relation Name"]
+            # Partitions (meal_bookings_2026_10) count as their parent table
+            tables.add("meal_bookings" if relation.startswith("meal_bookings") else relation)
+    return tables
+
+
+def assert_plan_within_budget(plan: dict, max_cost: float, max_ms: float, allow_seq_scan: tuple = ()):
+    scanned = seq_scanned_tables(plan) - set(allow_seq_scan)
+    assert not scanned, f"Sequential scan on {sorted(scanned)}:\n{json.dumps(plan['Plan'], indent=1)}"
+    assert plan["Plan"]["Total Cost"] <= max_cost, f"Plan cost {plan['Plan']['Total Cost']} over budget {max_cost}"
+    if CHECK_TIMING:
+        assert plan["Execution Time"] <= max_ms, f"Execution took {plan['Execution Time']} ms, budget {max_ms} ms"
+
+
+def some_user_id(session: Session) -> int:
+    return session.query(models.User.id).filter(models.User.email == "plan_user_42@example.com").scalar()
+
+
+#----------------------------------------------Auth-----------------------------------------------#
+def test_current_user_lookup_plan(seeded_session):
+    query = seeded_session.query(models.User).filter(models.User.id == some_user_id(seeded_session))
+    assert_plan_within_budget(explain(seeded_session, query), max_cost=20, max_ms=20)
+
+
+def test_login_lookup_plan(seeded_session):
+    query = seeded_session.query(models.User).filter(models.User.email == "plan_user_42@example.com")
+    assert_plan_within_budget(explain(seeded_session, query), max_cost=20, max_ms=20)
+
+
+#---------------------------------------------Menus-----------------------------------------------#
+def test_daily_menu_plan(seeded_session):
+    query = seeded_session.query(models.Menu).filter(models.Menu.menu_date == date.today())
+    assert_plan_within_budget(explain(seeded_session, query), max_cost=20, max_ms=20)
+
+
+#--------------------------------------------Bookings---------------------------------------------#
+def test_booking_lookup_plan(seeded_session):
+    query = seeded_session.query(models.Booking).filter(
+        models.Booking.user_id == some_user_id(seeded_session),
+        models.Booking.booking_date == date.today()
+    )
+    assert_plan_within_budget(explain(seeded_session, query), max_cost=20, max_ms=20)
+
+
+def test_my_bookings_plan(seeded_session):
+    query = seeded_session.query(models.Booking).filter(
+        models.Booking.user_id == some_user_id(seeded_session)
+    ).order_by(models.Booking.booking_date.desc())
+    assert_plan_within_budget(explain(seeded_session, query), max_cost=500, max_ms=50)
+
+
+def test_wake_convenor_lookup_plan(seeded_session):
+    query = seeded_session.query(models.User).filter(models.User.role == 'convenor')
+    assert_plan_within_budget(explain(seeded_session, query), max_cost=50, max_ms=20)
+
+
+#-------------------------------------------Meal List---------------------------------------------#
+def test_meal_list_plan(seeded_session):
+    from app.Routers.meallist import meal_list_query
+    query = meal_list_query(seeded_session, date.today())
+    # Joining most of the users table is cheaper as one scan than as index probes
+    assert_plan_within_budget(explain(seeded_session, query), max_cost=5000, max_ms=200, allow_seq_scan=("users",))
+
+
+def test_meal_list_summary_plan(seeded_session):
+    from app import schemas
+    from app.Routers.meallist import meal_list_summary_statement
+    # Only the day's bookings are read; users is not joined without a room filter
+    statement = meal_list_summary_statement(date.today(), schemas.MealListQuery(summary_only=True), None)
+    # The planner guesses 10 elements per unnest, so the cost is overestimated
+    assert_plan_within_budget(explain(seeded_session, statement), max_cost=10000, max_ms=100)
+
+
+#---------------------------------------------Notices---------------------------------------------#
+def test_latest_notices_plan(seeded_session):
+    query = seeded_session.query(models.Notice).order_by(models.Notice.created_at.desc()).limit(10)
+    assert_plan_within_budget(explain(seeded_session, query), max_cost=50, max_ms=20)
+
+
+#---------------------------------------------Issues----------------------------------------------#
+def test_open_issues_page_plan(seeded_session):
+    from app.Routers.issues import ISSUES_PAGE_DEFAULT, issues_page, issues_page_query
+    newest_open = issues_page(seeded_session, False, None, 1)[0].id
+    # A later page, as GET /issues/?resolved=false&before=... reads it
+    query = issues_page_query(seeded_session, False, newest_open, ISSUES_PAGE_DEFAULT)
+    plan = explain(seeded_session, query)
+    assert_plan_within_budget(plan, max_cost=50, max_ms=20)
+    assert any(node.get("Index Name") == "ix_issue_tickets_unresolved_id" for node in plan_nodes(plan["Plan"]))
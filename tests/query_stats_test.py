@@ -0,0 +1,73 @@
+import logging
+import os
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from app import database, query_stats
+from app.query_stats import QueryStatsMiddleware
+
+engine = database._create_engine(os.environ["DATABASE_URL"])
+
+
+def make_client():
+    app = FastAPI()
+    app.add_middleware(QueryStatsMiddleware)
+
+    @app.get("/users/{user_id}")
+    def read_user(user_id: int):
+        with engine.connect() as conn:
+            for i in range(3):
+                conn.execute(text("SELECT :secret AS secret"), {"secret": f"hunter{i}"})
+        return {}
+
+    return TestClient(app)
+
+
+def test_queries_are_counted_and_repeats_flagged(monkeypatch, caplog):
+    monkeypatch.setattr(query_stats, "DEBUG", True)
+    with caplog.at_level(logging.WARNING, logger="app.query_stats"):
+        response = make_client().get("/users/1")
+
+    assert response.headers["X-DB-Queries"] == "3"
+    assert "Possible N+1 on /users/{user_id}: statement ran 3 times in one request" in caplog.text
+
+
+def test_slow_query_log_leaves_out_parameters(monkeypatch, caplog):
+    monkeypatch.setattr(query_stats, "SLOW_QUERY_MS", 0)
+    with caplog.at_level(logging.WARNING, logger="app.query_stats"):
+        make_client().get("/users/1")
+
+    assert "Slow query" in caplog.text
+    assert "hunter" not in caplog.text
+
+    caplog.clear()
+    monkeypatch.setattr(query_stats, "DEBUG", True)
+    with caplog.at_level(logging.WARNING, logger="app.query_stats"):
+        make_client().get("/users/1")
+    assert "params=" in caplog.text and "hunter" in caplog.text
+
+
+def test_failed_queries_are_counted_and_logged(monkeypatch, caplog):
+    monkeypatch.setattr(query_stats, "DEBUG", True)
+    monkeypatch.setattr(query_stats, "SLOW_QUERY_MS", 0)
+    app = FastAPI()
+    app.add_middleware(QueryStatsMiddleware)
+
+    @app.get("/broken")
+    def broken():
+        with engine.connect() as conn:
+            # Cancelled by the server, like a slow statement hitting statement_timeout
+            conn.execute(text("SET statement_timeout = 10"))
+            try:
+                conn.execute(text("SELECT pg_sleep(1)"))
+            except Exception:
+                pass
+        return {}
+
+    with caplog.at_level(logging.WARNING, logger="app.query_stats"):
+        response = TestClient(app).get("/broken")
+
+    assert response.headers["X-DB-Queries"] == "2"
+    assert "Slow failed query" in caplog.text and "pg_sleep" in caplog.text
@@ -0,0 +1,65 @@
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from app import database, read_routing
+from app.read_routing import ReadYourWritesMiddleware
+
+
+class FakeSession:
+    def __init__(self, target):
+        self.target = target
+
+    def close(self):
+        pass
+
+
+def make_client(monkeypatch):
+    monkeypatch.setattr(database, "SessionLocal", lambda: FakeSession("primary"))
+    monkeypatch.setattr(database, "ReplicaSessionLocal", lambda: FakeSession("replica"))
+
+    app = FastAPI()
+    app.add_middleware(ReadYourWritesMiddleware)
+
+    @app.get("/read")
+    def read(db=Depends(database.get_read_db)):
+        return {"target": db.target}
+
+    @app.post("/write")
+    def write():
+        return {"ok": True}
+
+    return TestClient(app)
+
+
+def test_reads_stay_on_primary_right_after_a_write(monkeypatch):
+    client = make_client(monkeypatch)
+    alice = {"Authorization": "Bearer alice"}
+    bob = {"Authorization": "Bearer bob"}
+
+    assert client.get("/read", headers=alice).json()["target"] == "replica"
+
+    client.post("/write", headers=alice)
+    assert client.get("/read", headers=alice).json()["target"] == "primary"
+    # Other clients are not affected by alice's write
+    assert client.get("/read", headers=bob).json()["target"] == "replica"
+
+
+def test_reads_return_to_replica_after_the_window(monkeypatch):
+    monkeypatch.setattr(read_routing, "READ_YOUR_WRITES_SECONDS", 0)
+    client = make_client(monkeypatch)
+    carol = {"Authorization": "Bearer carol"}
+
+    client.post("/write", headers=carol)
+    assert client.get("/read", headers=carol).json()["target"] == "replica"
+
+
+def test_primary_reads_share_the_request_session(monkeypatch):
+    monkeypatch.setattr(database, "SessionLocal", lambda: FakeSession("primary"))
+    monkeypatch.setattr(database, "ReplicaSessionLocal", None)
+    app = FastAPI()
+
+    @app.get("/both")
+    def both(db=Depends(database.get_db), read_db=Depends(database.get_read_db)):
+        return {"shared": db is read_db}
+
+    assert TestClient(app).get("/both").json() == {"shared": True}
@@ -0,0 +1,15 @@
+import time
+
+from app import warmup
+
+
+def test_ready_after_warmup(client):
+    deadline = time.monotonic() + 30
+    response = client.get("/ready")
+    while response.status_code == 503 and time.monotonic() < deadline:
+        assert response.json() == {"status": "warming up"}
+        time.sleep(0.1)
+        response = client.get("/ready")
+
+    assert response.status_code == 200
+    assert warmup.is_ready()
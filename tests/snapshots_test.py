@@ -0,0 +1,53 @@
+import csv
+import io
+from datetime import date, datetime
+
+from app import menu_items, models, oauth2, snapshots
+
+
+def test_closed_day_is_served_from_its_snapshot(client, get_test_db):
+    db = get_test_db
+    snapshots.clear_cache()
+    day = date(2024, 1, 10)
+    rice, dal = menu_items.ids_for_names(db, ["Snapshot Rice", "Snapshot Dal"])
+    users = [models.User(name=f"Snapshot {i:03}", email=f"snapshot_{i}@example.com", hashed_password="x", room_number=i) for i in range(60)]
+    db.add_all(users)
+    db.flush()
+    db.add_all(models.Booking(user_id=user.id, booking_date=day, lunch_item_ids=[rice, dal], dinner_item_ids=[dal]) for user in users)
+    db.flush()
+    headers = {"Authorization": f"Bearer {oauth2.create_access_token({'user_id': users[0].id})}", "Accept-Encoding": "gzip"}
+
+    response = client.get(f"/meallist/{day}", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["total_lunch_bookings"] == 60
+    assert response.headers["cache-control"] == snapshots.IMMUTABLE_CACHE_CONTROL
+    etag = response.headers["etag"]
+    # Strong, and tagged with the content coding since the body was compressed
+    assert not etag.startswith("W/") and etag.endswith('-gzip"')
+
+    # A change made directly in the database after the day closed does not show up
+    db.query(models.Booking).filter(models.Booking.user_id == users[0].id).delete()
+    db.flush()
+    assert client.get(f"/meallist/{day}", headers=headers).json()["total_lunch_bookings"] == 60
+    snapshots.clear_cache()
+    assert client.get(f"/meallist/{day}", headers=headers).json()["total_lunch_bookings"] == 60
+
+    not_modified = client.get(f"/meallist/{day}", headers={**headers, "If-None-Match": etag})
+    assert not_modified.status_code == 304 and not_modified.content == b""
+
+    download = client.get(f"/meallist/{day}/download", headers=headers)
+    assert download.headers["content-disposition"] == f"attachment; filename=meal_list_{day}.csv"
+    rows = list(csv.reader(io.StringIO(download.text)))
+    assert rows[2] == ["Total Lunch Bookings:", "60"]
+    assert rows[6] == ["Snapshot 000", "0", "Snapshot Rice, Snapshot Dal", "Snapshot Dal"]
+    assert download.headers["etag"] != etag
+
+    assert client.get("/meallist/2024-01-11", headers=headers).status_code == 404
+    snapshots.clear_cache()
+
+
+def test_day_freezes_after_dinner_cutoff():
+    day = date(2031, 3, 10)
+    assert not snapshots.is_frozen(day, datetime(2031, 3, 10, 17, 59, tzinfo=snapshots.IST))
+    assert not snapshots.is_frozen(day, datetime(2031, 3, 10, 18, 0, tzinfo=snapshots.IST))
+    assert snapshots.is_frozen(day, datetime(2031, 3, 10, 18, 5, tzinfo=snapshots.IST))